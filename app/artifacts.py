@@ -0,0 +1,206 @@
+# geoincra_worker/app/artifacts.py
+"""
+Artefatos de diagnóstico em disco (screenshots, HTML, traces).
+
+Cada job grava numa pasta própria, DEBUG_DIR/<automação>/<job_id>/, com
+nomes que não colidem entre execuções do mesmo job:
+
+    pasta = PastaDoJob("solicitar", job_id)
+    png, html = pasta.arquivos("erro", "png", "html.gz")
+    # .../solicitar/<job>/003_erro_k3f9a1.png e .html.gz
+    gravar_html(html, page.content())          # HTML sempre comprimido
+    pasta.relatorio()                          # {"arquivos": 2, "bytes": 81234}
+
+Uma thread de limpeza (iniciar_limpeza) apaga as pastas de job mais
+velhas que ARTEFATOS_MAX_HORAS e, se o total passar de ARTEFATOS_MAX_MB,
+as mais antigas até voltar à cota. Arquivos soltos do formato antigo
+(DEBUG_DIR/<label>_<ts>.png, trace.zip, RI_DIGITAL_DIR/debug_*.png) entram
+na mesma conta.
+"""
+import gzip
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import metrics
+from settings import (
+    ARTEFATOS_LIMPEZA_S,
+    ARTEFATOS_MAX_HORAS,
+    ARTEFATOS_MAX_MB,
+    DEBUG_DIR,
+    RI_DIGITAL_DIR,
+)
+
+# pasta escrita há menos que isso pode ser do job em andamento:
+# a cota de tamanho não a apaga
+_PROTECAO_S = 15 * 60
+
+
+def _fmt_bytes(n: int) -> str:
+    if n >= 1024 * 1024:
+        return f"{n / (1024 * 1024):.1f} MB"
+    return f"{n / 1024:.0f} KB"
+
+
+def gravar_html(path: Path, html: str) -> None:
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(html)
+
+
+# =========================================================
+# PASTA DO JOB
+# =========================================================
+
+class PastaDoJob:
+    def __init__(self, automacao: str, job_id, raiz: str | Path = DEBUG_DIR):
+        self.automacao = automacao
+        self.dir = Path(raiz) / automacao / str(job_id)
+        # distingue execuções do mesmo job (retentativas) na mesma pasta
+        self._execucao = uuid.uuid4().hex[:6]
+        self._n = 0
+
+    def arquivos(self, nome: str, *extensoes: str) -> tuple[Path, ...]:
+        """
+        Caminhos NNN_<nome>_<execução>.<ext> com o mesmo número para
+        todas as extensões (NNN = ordem no job). Cria a pasta.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._n += 1
+        base = f"{self._n:03d}_{nome}_{self._execucao}"
+        return tuple(self.dir / f"{base}.{ext}" for ext in extensoes)
+
+    def arquivo(self, nome: str, extensao: str) -> Path:
+        return self.arquivos(nome, extensao)[0]
+
+    def relatorio(self) -> dict:
+        """Tamanho da pasta; imprime e alimenta a métrica por automação."""
+        arquivos, total = 0, 0
+        if self.dir.is_dir():
+            for f in self.dir.iterdir():
+                try:
+                    total += f.stat().st_size
+                    arquivos += 1
+                except FileNotFoundError:
+                    pass
+
+        metrics.DEBUG_JOB_ARTIFACTS_BYTES.observe(total, automation=self.automacao)
+        if arquivos:
+            print(f"[DEBUG] Artefatos do job: {arquivos} arquivo(s), {_fmt_bytes(total)} em {self.dir}")
+
+        return {"arquivos": arquivos, "bytes": total}
+
+    def remover_se_vazia(self) -> None:
+        try:
+            self.dir.rmdir()
+        except OSError:
+            pass  # não existe ou tem arquivos
+
+
+# =========================================================
+# LIMPEZA
+# =========================================================
+
+def _medir(caminho: Path) -> tuple[int, float]:
+    """(bytes, mtime mais recente) de um arquivo ou pasta de job."""
+    if caminho.is_file():
+        st = caminho.stat()
+        return st.st_size, st.st_mtime
+
+    total, recente = 0, caminho.stat().st_mtime
+    for f in caminho.iterdir():
+        try:
+            st = f.stat()
+        except FileNotFoundError:
+            continue
+        total += st.st_size
+        recente = max(recente, st.st_mtime)
+    return total, recente
+
+
+def _unidades() -> list[tuple[Path, int, float]]:
+    """Pastas de job e arquivos soltos do formato antigo: (caminho, bytes, mtime)."""
+    candidatos: list[Path] = []
+
+    raiz = Path(DEBUG_DIR)
+    if raiz.is_dir():
+        for item in raiz.iterdir():
+            if item.is_dir():
+                candidatos.extend(item.iterdir())  # <automação>/<job_id>
+            else:
+                candidatos.append(item)
+
+    ri_digital = Path(RI_DIGITAL_DIR)
+    if ri_digital.is_dir():
+        candidatos.extend(ri_digital.glob("debug_*.png"))
+
+    unidades = []
+    for c in candidatos:
+        try:
+            unidades.append((c, *_medir(c)))
+        except FileNotFoundError:
+            pass  # apagado no meio da varredura
+    return unidades
+
+
+def _apagar(caminho: Path, motivo: str) -> None:
+    if caminho.is_dir():
+        shutil.rmtree(caminho, ignore_errors=True)
+    else:
+        caminho.unlink(missing_ok=True)
+    metrics.DEBUG_ARTIFACTS_REMOVED.inc(reason=motivo)
+
+
+def limpar(agora: float | None = None) -> dict:
+    """Aplica idade e cota uma vez. Devolve {"removidos", "bytes"} (bytes restantes)."""
+    agora = agora or time.time()
+    unidades = sorted(_unidades(), key=lambda u: u[2])  # mais antigas primeiro
+    removidos = 0
+
+    if ARTEFATOS_MAX_HORAS > 0:
+        limite = agora - ARTEFATOS_MAX_HORAS * 3600
+        restantes = []
+        for caminho, tamanho, mtime in unidades:
+            if mtime < limite:
+                _apagar(caminho, "idade")
+                removidos += 1
+            else:
+                restantes.append((caminho, tamanho, mtime))
+        unidades = restantes
+
+    total = sum(u[1] for u in unidades)
+
+    if ARTEFATOS_MAX_MB > 0:
+        cota = ARTEFATOS_MAX_MB * 1024 * 1024
+        for caminho, tamanho, mtime in unidades:
+            if total <= cota:
+                break
+            if mtime > agora - _PROTECAO_S:
+                continue
+            _apagar(caminho, "cota")
+            removidos += 1
+            total -= tamanho
+
+    metrics.DEBUG_ARTIFACTS_BYTES.set(total)
+
+    if removidos:
+        print(f"🧹 Artefatos: {removidos} removido(s), {_fmt_bytes(total)} restantes")
+
+    return {"removidos": removidos, "bytes": total}
+
+
+def _laco_limpeza() -> None:
+    while True:
+        try:
+            limpar()
+        except Exception as e:
+            print(f"⚠ Falha na limpeza de artefatos: {e}")
+        time.sleep(ARTEFATOS_LIMPEZA_S)
+
+
+def iniciar_limpeza() -> None:
+    if ARTEFATOS_LIMPEZA_S <= 0:
+        return
+
+    threading.Thread(target=_laco_limpeza, name="artefatos-limpeza", daemon=True).start()
@@ -0,0 +1,171 @@
+# geoincra_worker/app/cache.py
+"""
+Cache em processo com TTL e tamanho máximo para leituras que se repetem
+entre jobs (credenciais por usuário, prompts de OCR).
+
+Invalidação: triggers em external_credentials/ocr_prompts (migração 7)
+emitem NOTIFY no canal worker_cache com "<tabela>:<chave>"; uma thread
+em LISTEN remove a entrada correspondente. Se a conexão de LISTEN cair,
+tudo é descartado (notificações podem ter sido perdidas) e o TTL segue
+valendo como limite.
+
+Os valores nunca são impressos (credenciais), só o nome do cache e a chave.
+"""
+import copy
+import functools
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from settings import CACHE_MAX_ITEMS, CACHE_TTL_SECONDS
+
+CANAL_NOTIFY = "worker_cache"
+
+
+class CacheTTL:
+    def __init__(self, nome: str, ttl: float = CACHE_TTL_SECONDS, max_itens: int = CACHE_MAX_ITEMS):
+        self.nome = nome
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<CacheTTL {self.nome} itens={len(self._itens)}>"
+
+    def obter(self, chave):
+        """Retorna (True, valor) ou (False, None) se ausente/expirado."""
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return False, None
+
+            expira_em, valor = item
+            if expira_em <= agora:
+                del self._itens[chave]
+                return False, None
+
+            self._itens.move_to_end(chave)
+            return True, valor
+
+    def guardar(self, chave, valor) -> None:
+        if self.ttl <= 0 or self.max_itens <= 0:
+            return
+
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave) -> None:
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+
+# tabela notificada -> cache afetado
+_CACHES: dict[str, CacheTTL] = {}
+
+
+def cache_ttl(tabela: str):
+    """
+    Decorator para funções de leitura com um único argumento-chave
+    (ex.: user_id, prompt_id). Resultados None não são guardados.
+    O valor devolvido é uma cópia, para o chamador não alterar o cache.
+    """
+    def decorator(func):
+        cache = CacheTTL(func.__name__)
+        _CACHES[tabela] = cache
+
+        @functools.wraps(func)
+        def wrapper(chave):
+            chave_norm = str(chave)
+
+            achou, valor = cache.obter(chave_norm)
+            if achou:
+                metrics.CACHE_LOOKUPS.inc(cache=cache.nome, outcome="hit")
+                return copy.copy(valor)
+
+            metrics.CACHE_LOOKUPS.inc(cache=cache.nome, outcome="miss")
+            valor = func(chave)
+            if valor is not None:
+                cache.guardar(chave_norm, valor)
+            return copy.copy(valor)
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def _aplicar_notificacao(payload: str) -> None:
+    tabela, _, chave = payload.partition(":")
+    cache = _CACHES.get(tabela)
+    if cache is None:
+        return
+
+    if chave:
+        cache.invalidar(chave)
+    else:
+        cache.limpar()
+    print(f"♻️ Cache {cache.nome} invalidado ({tabela}:{chave or '*'})")
+
+
+def _limpar_todos() -> None:
+    for cache in _CACHES.values():
+        cache.limpar()
+
+
+# =========================================================
+# LISTEN (THREAD DE INVALIDAÇÃO)
+# =========================================================
+
+def _escutar() -> None:
+    from db import get_connection
+
+    espera = 1
+    while True:
+        conn = None
+        try:
+            conn = get_connection()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CANAL_NOTIFY}")
+
+            # o que foi lido antes do LISTEN pode estar desatualizado
+            _limpar_todos()
+            espera = 1
+
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _aplicar_notificacao(conn.notifies.pop(0).payload)
+
+        except Exception as e:
+            print(f"⚠ LISTEN {CANAL_NOTIFY} caiu ({type(e).__name__}), cache descartado")
+            _limpar_todos()
+            time.sleep(espera)
+            espera = min(espera * 2, 60)
+
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def iniciar_listener() -> None:
+    if CACHE_TTL_SECONDS <= 0:
+        return
+
+    threading.Thread(target=_escutar, name="cache-listen", daemon=True).start()
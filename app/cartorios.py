@@ -0,0 +1,191 @@
+# geoincra_worker/app/cartorios.py
+"""
+Catálogo de cidades e cartórios do wizard de Certidão Digital.
+
+Os dropdowns #Cartorio_ddlCidade / #Cartorio_ddlCartorio mudam pouco.
+O catálogo guarda as opções (label + value) por UF em
+ri_digital_cidades / ri_digital_cartorios, e o worker resolve a entrada
+do payload antes de abrir o browser:
+
+    catalogo = Catalogo.carregar("RO")
+    catalogo.resolver("Porto Velho", "1")
+    # {"cidade_value": "1100205", "cartorio_value": "2663", "cartorio_label": "..."}
+
+Com o catálogo em dia, cidade ou cartório inexistente vira erro na hora
+(sem login nem wizard) e o wizard seleciona direto pelo value. Vencido
+(RI_DIGITAL_CATALOGO_TTL_HORAS) ou sem a cidade, o wizard lê os
+dropdowns, casa com o mesmo matcher e atualiza o catálogo.
+"""
+import re
+import unicodedata
+from datetime import datetime, timedelta, timezone
+
+from db import fetch_catalogo_cartorios, save_catalogo_cartorios, save_catalogo_cidades
+from settings import RI_DIGITAL_CATALOGO_TTL_HORAS
+
+# símbolos removidos antes da decomposição (NFKD transforma "º" em "o")
+_RE_SIMBOLOS = re.compile(r"[º°ª\-–/]")
+_RE_ESPACOS = re.compile(r"\s+")
+_RE_NUMERO = re.compile(r"^0*(\d+)\b")
+
+# name das <a> do #svg-map-brasil no wizard
+ESTADOS = {
+    "AC": "Acre", "AL": "Alagoas", "AM": "Amazonas", "AP": "Amapá", "BA": "Bahia",
+    "CE": "Ceará", "DF": "Distrito Federal", "ES": "Espírito Santo", "GO": "Goiás",
+    "MA": "Maranhão", "MG": "Minas Gerais", "MS": "Mato Grosso do Sul",
+    "MT": "Mato Grosso", "PA": "Pará", "PB": "Paraíba", "PE": "Pernambuco",
+    "PI": "Piauí", "PR": "Paraná", "RJ": "Rio de Janeiro", "RN": "Rio Grande do Norte",
+    "RO": "Rondônia", "RR": "Roraima", "RS": "Rio Grande do Sul",
+    "SC": "Santa Catarina", "SE": "Sergipe", "SP": "São Paulo", "TO": "Tocantins",
+}
+
+
+def nome_estado(uf) -> str:
+    """ "ro" -> "Rondônia"; UF desconhecida levanta Exception. """
+    nome = ESTADOS.get(str(uf or "").strip().upper())
+    if not nome:
+        raise Exception(f"UF '{uf}' inválida")
+    return nome
+
+
+def normalizar(texto) -> str:
+    """ "01º Ofício - Ji-Paraná" -> "01 oficio ji parana" """
+    texto = _RE_SIMBOLOS.sub(" ", str(texto or "").lower())
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _RE_ESPACOS.sub(" ", texto).strip()
+
+
+class Opcoes:
+    """Opções de um <select> com os rótulos já normalizados."""
+
+    def __init__(self, opcoes: list[dict]):
+        # "(Selecione)" tem value -1
+        self.opcoes = [o for o in opcoes if o.get("value") and o["value"] != "-1"]
+        self._rotulos = [normalizar(o["label"]) for o in self.opcoes]
+        self._numeros = [
+            int(m.group(1)) if (m := _RE_NUMERO.match(r)) else None
+            for r in self._rotulos
+        ]
+
+    def __len__(self) -> int:
+        return len(self.opcoes)
+
+    def por_value(self, value) -> dict | None:
+        return next((o for o in self.opcoes if o["value"] == str(value)), None)
+
+    def cidade(self, entrada: str) -> dict | None:
+        """Rótulo igual à entrada; senão o primeiro que a contém."""
+        alvo = normalizar(entrada)
+        if not alvo:
+            return None
+
+        for o, rotulo in zip(self.opcoes, self._rotulos):
+            if rotulo == alvo:
+                return o
+        for o, rotulo in zip(self.opcoes, self._rotulos):
+            if alvo in rotulo:
+                return o
+        return None
+
+    def cartorio(self, entrada) -> dict | None:
+        """
+        Opção única: ela. Senão, em ordem: value exato ("2663"), número
+        do ofício ("1" -> "01º Ofício...") e texto contido no rótulo.
+        """
+        if len(self.opcoes) == 1:
+            return self.opcoes[0]
+
+        bruto = str(entrada or "").strip()
+        if not bruto:
+            return None
+
+        opcao = self.por_value(bruto)
+        if opcao:
+            return opcao
+
+        if bruto.isdigit():
+            for o, numero in zip(self.opcoes, self._numeros):
+                if numero == int(bruto):
+                    return o
+
+        alvo = normalizar(bruto)
+        for o, rotulo in zip(self.opcoes, self._rotulos):
+            if alvo in rotulo:
+                return o
+        return None
+
+
+def _em_dia(opcoes: list[dict]) -> bool:
+    if not opcoes:
+        return False
+    limite = datetime.now(timezone.utc) - timedelta(hours=RI_DIGITAL_CATALOGO_TTL_HORAS)
+    return min(o["updated_at"] for o in opcoes) >= limite
+
+
+class Catalogo:
+    def __init__(self, uf: str, cidades: list[dict], cartorios: dict[str, list[dict]]):
+        self.uf = uf
+        self._cidades = cidades
+        self._cartorios = cartorios
+
+    @classmethod
+    def carregar(cls, uf: str) -> "Catalogo":
+        try:
+            cidades, cartorios = fetch_catalogo_cartorios(uf)
+        except Exception as e:
+            # sem catálogo o wizard só volta a casar pelos dropdowns
+            print(f"⚠ Catálogo de cartórios indisponível ({e})")
+            cidades, cartorios = [], {}
+        return cls(uf, cidades, cartorios)
+
+    def resolver(self, cidade: str, cartorio) -> dict:
+        """
+        Values conhecidos para a entrada do payload (None onde o catálogo
+        não sabe ou está vencido). Levanta Exception se o catálogo em dia
+        não tem a cidade/cartório.
+        """
+        resolvido = {"cidade_value": None, "cartorio_value": None, "cartorio_label": None}
+
+        if not _em_dia(self._cidades):
+            return resolvido
+
+        opcao_cidade = Opcoes(self._cidades).cidade(cidade)
+        if not opcao_cidade:
+            raise Exception(f"Cidade '{cidade}' não encontrada ({self.uf})")
+        resolvido["cidade_value"] = opcao_cidade["value"]
+
+        opcoes_cartorio = self._cartorios.get(opcao_cidade["value"]) or []
+        if not _em_dia(opcoes_cartorio):
+            return resolvido
+
+        opcao_cartorio = Opcoes(opcoes_cartorio).cartorio(cartorio)
+        if not opcao_cartorio:
+            raise Exception(
+                f"Cartório '{cartorio}' não encontrado em {opcao_cidade['label']}"
+            )
+        resolvido["cartorio_value"] = opcao_cartorio["value"]
+        resolvido["cartorio_label"] = opcao_cartorio["label"]
+
+        return resolvido
+
+    def registrar_cidades(self, opcoes: list[dict]) -> None:
+        """Atualiza o catálogo com as opções lidas agora do dropdown."""
+        validas = Opcoes(opcoes).opcoes
+        try:
+            save_catalogo_cidades(self.uf, validas)
+        except Exception as e:
+            print(f"⚠ Falha ao atualizar catálogo de cidades: {e}")
+            return
+        agora = datetime.now(timezone.utc)
+        self._cidades = [{**o, "updated_at": agora} for o in validas]
+
+    def registrar_cartorios(self, cidade_value: str, opcoes: list[dict]) -> None:
+        validas = Opcoes(opcoes).opcoes
+        try:
+            save_catalogo_cartorios(self.uf, cidade_value, validas)
+        except Exception as e:
+            print(f"⚠ Falha ao atualizar catálogo de cartórios: {e}")
+            return
+        agora = datetime.now(timezone.utc)
+        self._cartorios[cidade_value] = [{**o, "updated_at": agora} for o in validas]
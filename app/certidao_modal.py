@@ -0,0 +1,116 @@
+# geoincra_worker/app/certidao_modal.py
+"""
+Modal de detalhes (#popContent) de um item de certidão em
+lstConsultaPedidos.aspx.
+
+Usado pelo Consultar Certidão (metadados de cada item) e pela
+reconciliação do Solicitar Certidão (achar a matrícula de um pedido
+que pode ter sido concluído numa execução anterior).
+
+    detalhes = capturar_detalhes(page, linha, deadline)
+    detalhes["matricula"], detalhes["protocolo_modal"], ...
+"""
+import re
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from deadline import Deadline
+
+# Rótulos do modal de detalhes, na ordem em que aparecem -> campo.
+# Um valor vai do seu rótulo até o próximo rótulo *posterior* na ordem;
+# rótulos anteriores que aparecem dentro do texto (ex.: "status" numa
+# resposta) fazem parte do valor.
+_ROTULOS_MODAL = (
+    ("Nº Protocolo", "protocolo_modal"),
+    ("Tipo de Certidão", "tipo_certidao"),
+    ("Pedido Por", "pedido_por"),
+    ("Cartório / Cidade", "cartorio_cidade_modal"),
+    ("Status", "status_modal"),
+    ("Resposta", "resposta_modal"),
+    ("Dados da Solicitação", "dados_solicitacao"),
+    ("Tipo de Finalidade", "finalidade"),
+)
+
+_ORDEM_ROTULO = {rotulo.lower(): n for n, (rotulo, _) in enumerate(_ROTULOS_MODAL)}
+
+_RE_ROTULOS_MODAL = re.compile(
+    "|".join(
+        re.escape(rotulo)
+        for rotulo in sorted(_ORDEM_ROTULO, key=len, reverse=True)
+    ),
+    re.IGNORECASE,
+)
+
+_RE_MATRICULA = re.compile(r"Matr[íi]cula\s*[:\-]?\s*([^\n\r]+)", re.IGNORECASE)
+
+
+def _limpar_valor(valor: str) -> str | None:
+    return " ".join(valor.split()) or None
+
+
+def parse_modal_detalhes(texto_modal: str) -> dict[str, str | None]:
+    """Todos os campos do modal numa única varredura do texto."""
+    brutos: dict[str, str] = {}
+
+    atual = -1
+    inicio_valor = 0
+    for m in _RE_ROTULOS_MODAL.finditer(texto_modal):
+        ordem = _ORDEM_ROTULO[m.group(0).lower()]
+        if ordem <= atual:
+            continue
+
+        if atual >= 0:
+            brutos[_ROTULOS_MODAL[atual][1]] = texto_modal[inicio_valor:m.start()]
+        atual, inicio_valor = ordem, m.end()
+
+    if atual >= 0:
+        brutos[_ROTULOS_MODAL[atual][1]] = texto_modal[inicio_valor:]
+
+    detalhes = {campo: _limpar_valor(brutos.get(campo, "")) for _, campo in _ROTULOS_MODAL}
+
+    # no texto bruto: a matrícula vai só até o fim da linha
+    # ("Matrícula: 12.345\nLivro: 2")
+    matricula = None
+    match = _RE_MATRICULA.search(brutos.get("dados_solicitacao", ""))
+    if match:
+        matricula = _limpar_valor(match.group(1))
+
+    return {"matricula": matricula, **detalhes}
+
+
+def capturar_detalhes(page, linha, deadline: Deadline) -> dict[str, str | None]:
+    """
+    Abre o modal do item (link na primeira <td> da linha), lê os campos
+    e fecha. Erros sobem para o chamador.
+    """
+    print("➡ Abrindo detalhes do pedido")
+
+    link_detalhes = linha.locator("td").nth(0).locator("a")
+
+    # click() já rola até o link e espera ele ficar estável
+    try:
+        link_detalhes.click(timeout=deadline.timeout(30000))
+    except PlaywrightTimeoutError:
+        link_detalhes.click(force=True, timeout=deadline.timeout(30000))
+
+    modal = page.wait_for_selector(
+        "#popContent", state="visible", timeout=deadline.timeout(60000)
+    )
+    print("✔ Modal carregado")
+
+    detalhes = parse_modal_detalhes(modal.inner_text())
+
+    # espera o modal sumir em vez de uma pausa fixa: o próximo item
+    # só abre depois que este fechou (e não lê o texto antigo)
+    fechar_btn = page.locator("#popContent input[value='Fechar']")
+    if fechar_btn.count() > 0:
+        try:
+            fechar_btn.click(timeout=deadline.timeout(15000))
+        except PlaywrightTimeoutError:
+            fechar_btn.click(force=True, timeout=deadline.timeout(15000))
+
+        page.wait_for_selector(
+            "#popContent", state="hidden", timeout=deadline.timeout(15000)
+        )
+
+    return detalhes
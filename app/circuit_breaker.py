@@ -0,0 +1,179 @@
+# geoincra_worker/app/circuit_breaker.py
+import threading
+import time
+
+import requests
+
+from db import JOB_TYPES
+from settings import (
+    RI_DIGITAL_BASE_URL,
+    CIRCUIT_COOLDOWN_SECONDS,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_PROBE_TIMEOUT_SECONDS,
+)
+
+
+FECHADO = "FECHADO"
+ABERTO = "ABERTO"
+MEIO_ABERTO = "MEIO_ABERTO"
+
+# Trechos de mensagem que indicam portal fora do ar / inalcançável.
+# As automações reembrulham exceções em Exception(str), então a
+# classificação é feita pelo texto. Timeout do Playwright só conta quando
+# é de navegação (page.goto / "Navigation timeout"); esperar seletor ou
+# função é falha do job, não do portal.
+_MARCADORES_CONECTIVIDADE = (
+    "net::err_",
+    "navigation timeout",
+    "page.goto:",
+    "navigating to",
+    "connecttimeout",
+    "read timed out",
+    "econnrefused",
+    "econnreset",
+    "connection refused",
+    "connection reset",
+    "name or service not known",
+    "temporary failure in name resolution",
+    "502 bad gateway",
+    "503 service unavailable",
+    "504 gateway",
+)
+
+
+def eh_falha_de_conectividade(exc: BaseException) -> bool:
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+
+    texto = f"{type(exc).__name__} {exc}".lower()
+    return any(m in texto for m in _MARCADORES_CONECTIVIDADE)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de um portal externo.
+
+    FECHADO     -> jobs fluem normalmente.
+    ABERTO      -> jobs do portal ficam PENDING (nem são reivindicados).
+    MEIO_ABERTO -> após o cooldown um probe HTTP barato passou;
+                   libera um job de teste que fecha ou reabre o circuito.
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        probe_url: str,
+        limite_falhas: int = CIRCUIT_FAILURE_THRESHOLD,
+        cooldown: int = CIRCUIT_COOLDOWN_SECONDS,
+    ):
+        self.nome = nome
+        self.probe_url = probe_url
+        self.limite_falhas = limite_falhas
+        self.cooldown = cooldown
+
+        self.estado = FECHADO
+        self.falhas_consecutivas = 0
+        self.aberto_em = 0.0
+
+        self._lock = threading.Lock()
+
+    def _abrir(self) -> None:
+        self.estado = ABERTO
+        self.aberto_em = time.monotonic()
+        print(
+            f"⛔ Circuito {self.nome} ABERTO "
+            f"({self.falhas_consecutivas} falha(s) de conectividade)"
+        )
+
+    def _probe(self) -> bool:
+        try:
+            resp = requests.head(
+                self.probe_url,
+                timeout=CIRCUIT_PROBE_TIMEOUT_SECONDS,
+                allow_redirects=True,
+            )
+            return resp.status_code < 500
+        except requests.RequestException:
+            return False
+
+    def permite(self) -> bool:
+        with self._lock:
+            if self.estado == FECHADO or self.estado == MEIO_ABERTO:
+                return True
+
+            if time.monotonic() - self.aberto_em < self.cooldown:
+                return False
+
+            if self._probe():
+                self.estado = MEIO_ABERTO
+                print(f"🟡 Circuito {self.nome} MEIO_ABERTO (probe OK)")
+                return True
+
+            self.aberto_em = time.monotonic()
+            return False
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            if self.estado != FECHADO:
+                print(f"✅ Circuito {self.nome} FECHADO")
+            self.estado = FECHADO
+            self.falhas_consecutivas = 0
+
+    def registrar_falha(self, exc: BaseException) -> None:
+        with self._lock:
+            if not eh_falha_de_conectividade(exc):
+                # Portal respondeu; a falha é do job, não da disponibilidade.
+                if self.estado == MEIO_ABERTO:
+                    print(f"✅ Circuito {self.nome} FECHADO")
+                self.estado = FECHADO
+                self.falhas_consecutivas = 0
+                return
+
+            self.falhas_consecutivas += 1
+
+            if (
+                self.estado == MEIO_ABERTO
+                or self.falhas_consecutivas >= self.limite_falhas
+            ):
+                self._abrir()
+
+
+# =========================================================
+# REGISTRO DE PORTAIS
+# =========================================================
+
+RI_DIGITAL = CircuitBreaker("RI_DIGITAL", f"{RI_DIGITAL_BASE_URL}/Acesso.aspx")
+
+_BREAKER_POR_TIPO = {
+    "RI_DIGITAL_MATRICULA": RI_DIGITAL,
+    "RI_DIGITAL_SOLICITAR_CERTIDAO": RI_DIGITAL,
+    "RI_DIGITAL_CONSULTAR_CERTIDAO": RI_DIGITAL,
+}
+
+
+def breaker_do_tipo(job_type: str) -> CircuitBreaker | None:
+    return _BREAKER_POR_TIPO.get(job_type)
+
+
+def tipos_liberados(job_types=JOB_TYPES) -> tuple[str, ...]:
+    """
+    Tipos que o loop pode reivindicar agora. Cada breaker é consultado
+    uma única vez por ciclo (o probe, se houver, roda só uma vez).
+    """
+    decisao: dict[str, bool] = {}
+    liberados = []
+
+    for job_type in job_types:
+        breaker = breaker_do_tipo(job_type)
+
+        if breaker is None:
+            liberados.append(job_type)
+            continue
+
+        if breaker.nome not in decisao:
+            decisao[breaker.nome] = breaker.permite()
+
+        if decisao[breaker.nome]:
+            liberados.append(job_type)
+
+    return tuple(liberados)
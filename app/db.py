@@ -1,50 +1,84 @@
 import psycopg2
 from psycopg2.extras import Json, RealDictCursor
 
+from cache import cache_ttl
 from settings import DATABASE_URL
+from timing import span
 
 
 def get_connection():
     return psycopg2.connect(DATABASE_URL)
 
 
-def fetch_pending_job():
+JOB_TYPES = (
+    "RI_DIGITAL_MATRICULA",
+    "RI_DIGITAL_SOLICITAR_CERTIDAO",
+    "RI_DIGITAL_CONSULTAR_CERTIDAO",
+    "OCR_DOCUMENT",
+)
+
+
+# Também usada por benchmarks/bench_queue.py para EXPLAIN ANALYZE
+SQL_FETCH_PENDING_JOB = """
+    UPDATE automation_jobs
+    SET status = 'PROCESSING',
+        started_at = NOW()
+    WHERE id = (
+        SELECT id
+        FROM automation_jobs
+        WHERE status = 'PENDING'
+          AND type = ANY(%s)
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *
+"""
+
+
+@span("db.fetch_pending_job")
+def fetch_pending_job(job_types=JOB_TYPES):
     """
     Pega o próximo job pendente (FIFO) dos tipos suportados pelo worker,
     já marcando como PROCESSING e started_at.
+
+    job_types permite ao loop excluir tipos temporariamente (ex.: portal
+    com circuit breaker aberto); esses jobs continuam PENDING.
     """
+    if not job_types:
+        return None
+
     with get_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(SQL_FETCH_PENDING_JOB, (list(job_types),))
+            job = cur.fetchone()
+            conn.commit()
+            return job
+
+
+def count_pending_jobs() -> dict[str, int]:
+    """
+    Profundidade da fila por tipo (usado pelo endpoint de métricas).
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
             cur.execute(
                 """
-                UPDATE automation_jobs
-                SET status = 'PROCESSING',
-                    started_at = NOW()
-                WHERE id = (
-                    SELECT id
-                    FROM automation_jobs
-                    WHERE status = 'PENDING'
-                      AND type IN (
-                          'RI_DIGITAL_MATRICULA',
-                          'RI_DIGITAL_SOLICITAR_CERTIDAO',
-                          'RI_DIGITAL_CONSULTAR_CERTIDAO',
-                          'OCR_DOCUMENT'
-                      )
-                    ORDER BY created_at
-                    LIMIT 1
-                    FOR UPDATE SKIP LOCKED
-                )
-                RETURNING *
+                SELECT type, COUNT(*)
+                FROM automation_jobs
+                WHERE status = 'PENDING'
+                GROUP BY type
                 """
             )
-            job = cur.fetchone()
-            conn.commit()
-            return job
+            return {row[0]: row[1] for row in cur.fetchall()}
 
 
+@cache_ttl("external_credentials")
+@span("db.fetch_ri_digital_credentials")
 def fetch_ri_digital_credentials(user_id: int):
     """
     Credenciais RI Digital armazenadas em external_credentials.
+    Em cache por user_id (invalidado por NOTIFY, ver cache.py).
     """
     with get_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -61,6 +95,7 @@ def fetch_ri_digital_credentials(user_id: int):
             return cur.fetchone()
 
 
+@span("db.update_job_status")
 def update_job_status(job_id, status, error_message=None):
     """
     Atualiza status do job e finaliza timestamps quando COMPLETED/FAILED.
@@ -83,6 +118,7 @@ def update_job_status(job_id, status, error_message=None):
             conn.commit()
 
 
+@span("db.create_document")
 def create_document(project_id, filename, file_path):
     """
     Salva o PDF como Document do projeto (tabela documents).
@@ -119,34 +155,580 @@ def create_document(project_id, filename, file_path):
             return doc["id"] if doc else None
 
 
-def insert_result(job_id, data: dict):
+@span("db.insert_result")
+def insert_result(job_id, data: dict, row_key: str | None = None):
     """
     Insere resultado genérico na automation_results.
     Usa .get defensivo para evitar crash por campo ausente.
+
+    Com row_key vira upsert idempotente: a chave fica em
+    metadata_json->>'row_key' e um reprocessamento da mesma linha
+    atualiza o resultado existente em vez de duplicá-lo.
+    """
+    metadata = dict(data.get("metadata_json") or {})
+
+    valores = (
+        data.get("protocolo"),
+        data.get("matricula"),
+        data.get("cartorio"),
+        data.get("data_pedido"),
+        data.get("file_path"),
+    )
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            if row_key is None:
+                cur.execute(
+                    """
+                    INSERT INTO automation_results (
+                        job_id,
+                        protocolo,
+                        matricula,
+                        cartorio,
+                        data_pedido,
+                        file_path,
+                        metadata_json
+                    )
+                    VALUES (%s,%s,%s,%s,%s,%s,%s)
+                    """,
+                    (job_id, *valores, Json(metadata)),
+                )
+            else:
+                metadata["row_key"] = row_key
+                cur.execute(
+                    """
+                    WITH atualizado AS (
+                        UPDATE automation_results
+                        SET protocolo = %s,
+                            matricula = %s,
+                            cartorio = %s,
+                            data_pedido = %s,
+                            file_path = %s,
+                            metadata_json = %s
+                        WHERE job_id = %s
+                          AND metadata_json->>'row_key' = %s
+                        RETURNING id
+                    )
+                    INSERT INTO automation_results (
+                        job_id,
+                        protocolo,
+                        matricula,
+                        cartorio,
+                        data_pedido,
+                        file_path,
+                        metadata_json
+                    )
+                    SELECT %s,%s,%s,%s,%s,%s,%s
+                    WHERE NOT EXISTS (SELECT 1 FROM atualizado)
+                    """,
+                    (
+                        *valores,
+                        Json(metadata),
+                        job_id,
+                        row_key,
+                        job_id,
+                        *valores,
+                        Json(metadata),
+                    ),
+                )
+            conn.commit()
+
+
+# =========================================================
+# DOCUMENTO + RESULTADO NUMA ÚNICA TRANSAÇÃO
+# =========================================================
+
+# documents (opcional) + automation_results (upsert por row_key) num só
+# comando: o document_id entra no metadata_json no próprio banco.
+_SQL_PERSIST_DOCUMENT_AND_RESULT = """
+    WITH existente AS (
+        -- _processar_linha grava "document_id": null quando não há PDF
+        SELECT NULLIF((metadata_json->'document_id')::jsonb, 'null'::jsonb) AS document_id
+        FROM automation_results
+        WHERE %(row_key)s::text IS NOT NULL
+          AND job_id = %(job_id)s
+          AND metadata_json->>'row_key' = %(row_key)s
+        LIMIT 1
+    ),
+    doc AS (
+        INSERT INTO documents (
+            project_id,
+            matricula_id,
+            doc_type,
+            stored_filename,
+            original_filename,
+            content_type,
+            description,
+            file_path,
+            uploaded_at
+        )
+        SELECT %(project_id)s, NULL, %(doc_type)s, %(filename)s, %(filename)s,
+               'application/pdf', %(description)s, %(doc_path)s, NOW()
+        WHERE %(com_documento)s
+          -- retomada de checkpoint: a linha já tem o documento
+          AND NOT EXISTS (SELECT 1 FROM existente WHERE document_id IS NOT NULL)
+        RETURNING id
+    ),
+    documento AS (
+        SELECT COALESCE(
+            (SELECT to_jsonb(id) FROM doc),
+            (SELECT document_id FROM existente)
+        ) AS id
+    ),
+    meta AS (
+        SELECT %(metadata)s::jsonb || COALESCE(
+            (SELECT jsonb_build_object('document_id', id) FROM documento WHERE id IS NOT NULL),
+            '{}'::jsonb
+        ) AS metadata_json
+    ),
+    atualizado AS (
+        UPDATE automation_results
+        SET protocolo = %(protocolo)s,
+            matricula = %(matricula)s,
+            cartorio = %(cartorio)s,
+            data_pedido = %(data_pedido)s,
+            file_path = %(file_path)s,
+            metadata_json = (SELECT metadata_json FROM meta)
+        WHERE %(row_key)s::text IS NOT NULL
+          AND job_id = %(job_id)s
+          AND metadata_json->>'row_key' = %(row_key)s
+        RETURNING id
+    ),
+    inserido AS (
+        INSERT INTO automation_results (
+            job_id,
+            protocolo,
+            matricula,
+            cartorio,
+            data_pedido,
+            file_path,
+            metadata_json
+        )
+        SELECT %(job_id)s, %(protocolo)s, %(matricula)s, %(cartorio)s,
+               %(data_pedido)s, %(file_path)s, metadata_json
+        FROM meta
+        WHERE NOT EXISTS (SELECT 1 FROM atualizado)
+        RETURNING id
+    )
+    SELECT
+        (SELECT id FROM documento) AS document_id,
+        COALESCE((SELECT id FROM atualizado), (SELECT id FROM inserido)) AS result_id
+"""
+
+
+def _persistir(cur, job_id, data: dict, document: dict | None, row_key: str | None):
+    metadata = dict(data.get("metadata_json") or {})
+    if row_key is not None:
+        metadata["row_key"] = row_key
+
+    document = document or {}
+    com_documento = bool(document.get("project_id") and document.get("file_path"))
+
+    cur.execute(
+        _SQL_PERSIST_DOCUMENT_AND_RESULT,
+        {
+            "com_documento": com_documento,
+            "project_id": document.get("project_id"),
+            "doc_type": document.get("doc_type") or "RI_DIGITAL_PDF",
+            "description": document.get("description") or "Matrícula RI Digital",
+            "filename": document.get("filename"),
+            "doc_path": document.get("file_path"),
+            "metadata": Json(metadata),
+            "job_id": job_id,
+            "row_key": row_key,
+            "protocolo": data.get("protocolo"),
+            "matricula": data.get("matricula"),
+            "cartorio": data.get("cartorio"),
+            "data_pedido": data.get("data_pedido"),
+            "file_path": data.get("file_path"),
+        },
+    )
+    row = cur.fetchone()
+    return row[0], row[1]
+
+
+@span("db.persist_document_and_result")
+def persist_document_and_result(
+    job_id,
+    data: dict,
+    document: dict | None = None,
+    row_key: str | None = None,
+):
+    """
+    Grava o Document do PDF (se houver) e o resultado numa única
+    transação e num único round trip. Retorna (document_id, result_id).
+
+    data segue o formato de insert_result; document é
+    {"project_id", "filename", "file_path"} (+ "doc_type"/"description"
+    opcionais) e é ignorado sem project_id, como em create_document.
+    O document_id criado é incluído em metadata_json. Se a linha do
+    row_key já existe com documento (retomada), o documento não é
+    criado de novo e o document_id dela é devolvido.
     """
     with get_connection() as conn:
         with conn.cursor() as cur:
+            ids = _persistir(cur, job_id, data, document, row_key)
+        conn.commit()
+        return ids
+
+
+@span("db.persist_documents_and_results")
+def persist_documents_and_results(job_id, itens: list[dict]):
+    """
+    Versão em lote: itens = [{"data", "document", "row_key"}, ...], tudo
+    numa transação (ou grava todos ou nenhum). Retorna a lista de
+    (document_id, result_id) na ordem dos itens.
+    """
+    if not itens:
+        return []
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            ids = [
+                _persistir(
+                    cur,
+                    job_id,
+                    item["data"],
+                    item.get("document"),
+                    item.get("row_key"),
+                )
+                for item in itens
+            ]
+        conn.commit()
+        return ids
+
+
+# =========================================================
+# CHECKPOINT POR LINHA (RETOMADA DE JOBS)
+# =========================================================
+
+@span("db.fetch_job_checkpoints")
+def fetch_job_checkpoints(job_id) -> dict[str, dict]:
+    """
+    Linhas já concluídas do job: {row_key: result_json}.
+    Um job retomado usa isso para pular o que já foi feito.
+    """
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
                 """
-                INSERT INTO automation_results (
-                    job_id,
-                    protocolo,
-                    matricula,
-                    cartorio,
-                    data_pedido,
-                    file_path,
-                    metadata_json
+                SELECT row_key, result_json
+                FROM automation_job_checkpoints
+                WHERE job_id = %s
+                """,
+                (job_id,),
+            )
+            return {r["row_key"]: r["result_json"] for r in cur.fetchall()}
+
+
+@span("db.save_job_checkpoint")
+def save_job_checkpoint(job_id, row_key: str, result: dict | None = None):
+    """
+    Marca a linha como concluída. Chamar somente depois que o
+    resultado (e o PDF, se houver) já estiver persistido.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO automation_job_checkpoints (job_id, row_key, result_json)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (job_id, row_key)
+                DO UPDATE SET result_json = EXCLUDED.result_json,
+                              created_at = NOW()
+                """,
+                (job_id, row_key, Json(result or {})),
+            )
+            conn.commit()
+
+# =========================================================
+# SINCRONIZAÇÃO INCREMENTAL (CONSULTAR CERTIDÃO)
+# =========================================================
+
+@span("db.fetch_certidao_sync")
+def fetch_certidao_sync(user_id) -> tuple[dict[str, str], dict[str, dict]]:
+    """
+    Estado da última sincronização do usuário:
+    ({protocolo: status}, {"protocolo/item": {status, file_path, file_sha256, result_json}}).
+    """
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT protocolo, status
+                FROM ri_digital_certidao_sync
+                WHERE user_id = %s
+                """,
+                (user_id,),
+            )
+            protocolos = {r["protocolo"]: r["status"] for r in cur.fetchall()}
+
+            cur.execute(
+                """
+                SELECT protocolo, item, status, file_path, file_sha256, result_json
+                FROM ri_digital_certidao_sync_items
+                WHERE user_id = %s
+                """,
+                (user_id,),
+            )
+            itens = {f"{r['protocolo']}/{r['item']}": dict(r) for r in cur.fetchall()}
+
+            return protocolos, itens
+
+
+@span("db.save_certidao_sync_item")
+def save_certidao_sync_item(
+    user_id,
+    protocolo: str,
+    item: str,
+    status: str,
+    file_path: str | None,
+    file_sha256: str | None,
+    result: dict,
+):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO ri_digital_certidao_sync_items (
+                    user_id, protocolo, item, status, file_path, file_sha256, result_json
                 )
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (user_id, protocolo, item)
+                DO UPDATE SET status = EXCLUDED.status,
+                              file_path = EXCLUDED.file_path,
+                              file_sha256 = EXCLUDED.file_sha256,
+                              result_json = EXCLUDED.result_json,
+                              updated_at = NOW()
                 """,
-                (
-                    job_id,
-                    data.get("protocolo"),
-                    data.get("matricula"),
-                    data.get("cartorio"),
-                    data.get("data_pedido"),
-                    data.get("file_path"),
-                    Json(data.get("metadata_json") or {}),
-                ),
+                (user_id, protocolo, item, status, file_path, file_sha256, Json(result)),
+            )
+            conn.commit()
+
+
+@span("db.save_certidao_sync_protocolo")
+def save_certidao_sync_protocolo(user_id, protocolo: str, status: str):
+    """Gravar só depois que todos os itens do protocolo foram sincronizados."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO ri_digital_certidao_sync (user_id, protocolo, status)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (user_id, protocolo)
+                DO UPDATE SET status = EXCLUDED.status,
+                              updated_at = NOW()
+                """,
+                (user_id, protocolo, status),
+            )
+            conn.commit()
+
+
+# =========================================================
+# CATÁLOGO DE CIDADES / CARTÓRIOS (RI DIGITAL)
+# =========================================================
+
+@span("db.fetch_catalogo_cartorios")
+def fetch_catalogo_cartorios(uf: str) -> tuple[list[dict], dict[str, list[dict]]]:
+    """
+    Catálogo da UF: (cidades, {cidade_value: cartórios}); cada opção é
+    {value, label, updated_at}.
+    """
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT value, label, updated_at
+                FROM ri_digital_cidades
+                WHERE uf = %s
+                ORDER BY label
+                """,
+                (uf,),
             )
-            conn.commit()
\ No newline at end of file
+            cidades = [dict(r) for r in cur.fetchall()]
+
+            cur.execute(
+                """
+                SELECT cidade_value, value, label, updated_at
+                FROM ri_digital_cartorios
+                WHERE uf = %s
+                ORDER BY cidade_value, label
+                """,
+                (uf,),
+            )
+            cartorios: dict[str, list[dict]] = {}
+            for r in cur.fetchall():
+                cartorios.setdefault(r.pop("cidade_value"), []).append(dict(r))
+
+            return cidades, cartorios
+
+
+def _substituir_opcoes(cur, tabela: str, filtro: dict, opcoes: list[dict]) -> None:
+    """Troca as opções gravadas sob `filtro` pelas lidas agora do dropdown."""
+    colunas = list(filtro)
+    where = " AND ".join(f"{c} = %s" for c in colunas)
+    valores = [o["value"] for o in opcoes]
+
+    cur.execute(
+        f"DELETE FROM {tabela} WHERE {where} AND NOT (value = ANY(%s))",
+        (*filtro.values(), valores),
+    )
+    for o in opcoes:
+        cur.execute(
+            f"""
+            INSERT INTO {tabela} ({", ".join(colunas)}, value, label)
+            VALUES ({", ".join(["%s"] * len(colunas))}, %s, %s)
+            ON CONFLICT ({", ".join(colunas)}, value)
+            DO UPDATE SET label = EXCLUDED.label,
+                          updated_at = NOW()
+            """,
+            (*filtro.values(), o["value"], o["label"]),
+        )
+
+
+@span("db.save_catalogo_cidades")
+def save_catalogo_cidades(uf: str, opcoes: list[dict]):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            _substituir_opcoes(cur, "ri_digital_cidades", {"uf": uf}, opcoes)
+            conn.commit()
+
+
+@span("db.save_catalogo_cartorios")
+def save_catalogo_cartorios(uf: str, cidade_value: str, opcoes: list[dict]):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            _substituir_opcoes(
+                cur,
+                "ri_digital_cartorios",
+                {"uf": uf, "cidade_value": cidade_value},
+                opcoes,
+            )
+            conn.commit()
+
+
+# =========================================================
+# LIVRO DE PEDIDOS (SOLICITAR CERTIDÃO)
+# =========================================================
+# ENVIANDO: o clique em Concluir Pedido foi (ou ia ser) dado e o
+# resultado não é conhecido. CONCLUIDO: o portal aceitou o pedido.
+
+@span("db.fetch_pedidos_certidao")
+def fetch_pedidos_certidao(chaves: list[str]) -> dict[str, dict]:
+    """Linhas do livro para as chaves: {chave: {job_id, status, protocolo, result_json, updated_at}}."""
+    if not chaves:
+        return {}
+
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT chave, job_id, status, protocolo, result_json, updated_at
+                FROM ri_digital_certidao_pedidos
+                WHERE chave = ANY(%s)
+                """,
+                (list(chaves),),
+            )
+            return {r.pop("chave"): dict(r) for r in cur.fetchall()}
+
+
+@span("db.save_pedidos_enviando")
+def save_pedidos_enviando(job_id, user_id, pedidos: list[dict]):
+    """
+    Registra as matrículas antes do clique em Concluir Pedido. Cada
+    pedido: {chave, uf, cidade, cartorio, matricula, tipo, finalidade}.
+    A linha existente é reaberta para este job: quem chama já decidiu
+    (pela janela de reaproveitamento) que o pedido anterior não vale mais.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for p in pedidos:
+                cur.execute(
+                    """
+                    INSERT INTO ri_digital_certidao_pedidos (
+                        chave, user_id, job_id, uf, cidade, cartorio,
+                        matricula, tipo, finalidade, status
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'ENVIANDO')
+                    ON CONFLICT (chave)
+                    DO UPDATE SET job_id = EXCLUDED.job_id,
+                                  user_id = EXCLUDED.user_id,
+                                  status = 'ENVIANDO',
+                                  protocolo = NULL,
+                                  result_json = '{}'::jsonb,
+                                  updated_at = NOW()
+                    """,
+                    (
+                        p["chave"],
+                        user_id,
+                        job_id,
+                        p["uf"],
+                        p["cidade"],
+                        p["cartorio"],
+                        p["matricula"],
+                        p["tipo"],
+                        p["finalidade"],
+                    ),
+                )
+            conn.commit()
+
+
+@span("db.save_pedidos_concluidos")
+def save_pedidos_concluidos(job_id, concluidos: dict[str, dict]):
+    """{chave: data do resultado}; o protocolo vem de data["protocolo"]."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for chave, data in concluidos.items():
+                cur.execute(
+                    """
+                    UPDATE ri_digital_certidao_pedidos
+                    SET status = 'CONCLUIDO',
+                        job_id = %s,
+                        protocolo = %s,
+                        result_json = %s,
+                        updated_at = NOW()
+                    WHERE chave = %s
+                    """,
+                    (job_id, data.get("protocolo"), Json(data), chave),
+                )
+            conn.commit()
+
+
+# =========================================================
+# MÉTRICAS DE ETAPAS POR JOB
+# =========================================================
+
+def save_job_stage_metrics(job_id, resumo: dict[str, dict]):
+    """
+    Grava o resumo de timing.finalizar_job() em
+    automation_job_stage_metrics (uma linha por etapa).
+    """
+    if not resumo:
+        return
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for stage, m in resumo.items():
+                cur.execute(
+                    """
+                    INSERT INTO automation_job_stage_metrics (
+                        job_id, stage, count, total_ms, p50_ms, p95_ms
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (job_id, stage)
+                    DO UPDATE SET count = EXCLUDED.count,
+                                  total_ms = EXCLUDED.total_ms,
+                                  p50_ms = EXCLUDED.p50_ms,
+                                  p95_ms = EXCLUDED.p95_ms,
+                                  created_at = NOW()
+                    """,
+                    (
+                        job_id,
+                        stage,
+                        m["count"],
+                        m["total_ms"],
+                        m["p50_ms"],
+                        m["p95_ms"],
+                    ),
+                )
+            conn.commit()
@@ -0,0 +1,114 @@
+# geoincra_worker/app/db_writer.py
+"""
+Escritor do banco em background para as automações com browser.
+
+O loop de linhas enfileira as gravações (resultado, documento,
+checkpoint) e segue para a próxima interação com a página enquanto uma
+thread grava. As gravações rodam em ordem FIFO, então um checkpoint
+enfileirado depois do resultado só é gravado depois dele.
+
+    with EscritorDB(job["id"]) as escritor:
+        ...
+        escritor.enfileirar(persist_document_and_result, job_id, data, ...)
+        escritor.enfileirar(save_job_checkpoint, job_id, row_key)
+
+Ao sair do bloco a fila é drenada; se alguma gravação falhou, a exceção
+é relançada ali (antes de o job ser marcado COMPLETED). Depois da
+primeira falha as gravações seguintes são descartadas, para nenhum
+checkpoint apontar para uma linha que não foi persistida.
+"""
+import queue
+import threading
+
+from settings import DB_WRITER_QUEUE_SIZE
+
+_FIM = object()
+
+
+class EscritorDB:
+    def __init__(self, job_id, tamanho: int = DB_WRITER_QUEUE_SIZE):
+        self.job_id = job_id
+        self.tamanho = tamanho
+        self.erro: Exception | None = None
+        self.gravados = 0
+        self.descartados = 0
+        self._fila: queue.Queue | None = None
+        self._thread: threading.Thread | None = None
+
+    # -----------------------------------------------------
+
+    def _loop(self) -> None:
+        while True:
+            item = self._fila.get()
+            try:
+                if item is _FIM:
+                    return
+
+                if self.erro is not None:
+                    self.descartados += 1
+                    continue
+
+                func, args, kwargs = item
+                try:
+                    func(*args, **kwargs)
+                    self.gravados += 1
+                except Exception as e:
+                    self.erro = e
+                    print(f"❌ Falha na gravação em background ({func.__name__}): {e}")
+            finally:
+                self._fila.task_done()
+
+    def enfileirar(self, func, *args, **kwargs) -> None:
+        """
+        Agenda func(*args, **kwargs). Bloqueia se a fila estiver cheia.
+        Sem fila (tamanho 0) executa na hora.
+        """
+        if self._fila is None:
+            func(*args, **kwargs)
+            self.gravados += 1
+            return
+
+        if self.erro is not None:
+            raise Exception(f"Gravação em background falhou: {self.erro}") from self.erro
+
+        self._fila.put((func, args, kwargs))
+
+    def drenar(self) -> None:
+        """Espera a fila esvaziar e relança a primeira falha, se houver."""
+        if self._fila is not None:
+            self._fila.join()
+
+        if self.erro is not None:
+            raise Exception(f"Gravação em background falhou: {self.erro}") from self.erro
+
+    # -----------------------------------------------------
+
+    def __enter__(self):
+        if self.tamanho > 0:
+            self._fila = queue.Queue(maxsize=self.tamanho)
+            self._thread = threading.Thread(
+                target=self._loop,
+                name=f"db-writer-{self.job_id}",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            # mesmo com erro na automação, o que já foi coletado é gravado
+            # (a retomada pelos checkpoints depende disso)
+            if self._fila is not None:
+                self._fila.join()
+                self._fila.put(_FIM)
+                self._thread.join()
+        finally:
+            if self.descartados:
+                print(f"⚠ {self.descartados} gravação(ões) descartada(s) após falha")
+
+        if exc_type is None:
+            self.drenar()
+        elif self.erro is not None:
+            print(f"⚠ Além do erro da automação, a gravação falhou: {self.erro}")
+
+        return False
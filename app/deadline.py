@@ -0,0 +1,54 @@
+# geoincra_worker/app/deadline.py
+import time
+
+from settings import JOB_DEADLINE_DEFAULT_SECONDS, JOB_DEADLINE_SECONDS
+
+
+class PrazoExcedido(Exception):
+    """O orçamento de tempo do job acabou."""
+
+
+class Deadline:
+    """
+    Orçamento de tempo de um job.
+
+    Toda espera do Playwright usa deadline.timeout(step_ms), que devolve
+    min(step_ms, restante) e levanta PrazoExcedido quando não sobra nada.
+    Assim nenhum job segura uma lane do worker além do orçamento.
+    """
+
+    def __init__(self, segundos: float):
+        self.segundos = segundos
+        self.fim = time.monotonic() + segundos
+
+    @classmethod
+    def para_job(cls, job: dict) -> "Deadline":
+        payload = job.get("payload_json") or {}
+
+        segundos = payload.get("deadline_seconds")
+        if not segundos:
+            segundos = JOB_DEADLINE_SECONDS.get(
+                job.get("type"),
+                JOB_DEADLINE_DEFAULT_SECONDS,
+            )
+
+        return cls(float(segundos))
+
+    def restante_ms(self) -> int:
+        return int((self.fim - time.monotonic()) * 1000)
+
+    def expirado(self) -> bool:
+        return self.restante_ms() <= 0
+
+    def verificar(self) -> None:
+        if self.expirado():
+            raise PrazoExcedido(
+                f"Prazo do job excedido ({int(self.segundos)}s)"
+            )
+
+    def timeout(self, step_ms: int) -> int:
+        self.verificar()
+        return max(1, min(int(step_ms), self.restante_ms()))
+
+    def timeout_s(self, step_s: float) -> float:
+        return self.timeout(int(step_s * 1000)) / 1000
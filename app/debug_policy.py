@@ -0,0 +1,167 @@
+# geoincra_worker/app/debug_policy.py
+"""
+Política de artefatos de diagnóstico (trace do Playwright, PNG + HTML)
+por job.
+
+    debug = Depuracao.para_job(job, "solicitar", deadline)
+    debug.iniciar_trace(context)
+    debug.marco("pedido_1")                    # fronteira de etapa do trace
+    debug.snapshot(page, "apos_login")         # só em job amostrado
+    debug.snapshot(page, "erro", falha=True)   # em qualquer modo menos off
+    debug.finalizar_trace(erro=True)           # trace fica só se falhou/amostrado
+    debug.relatorio()                          # tamanho gravado pelo job
+
+Modos (DEBUG_MODO):
+
+    off      nada é gravado
+    falha    trace leve (sem screencast) em pedaços, um por marco; só os
+             últimos DEBUG_TRACE_PEDACOS ficam no disco e todos são
+             apagados quando o job termina bem. Snapshots só de erro.
+    amostra  como falha, mas uma fração DEBUG_AMOSTRA dos jobs (ou o
+             job com payload_json["debug"]) grava tudo: trace completo
+             com screenshots e os snapshots de cada passo.
+
+Os arquivos vão para a pasta do job (artifacts.PastaDoJob), criada só
+quando algo é gravado; o HTML é gravado comprimido (.html.gz).
+"""
+import zlib
+from collections import deque
+from pathlib import Path
+
+from artifacts import PastaDoJob, gravar_html
+from deadline import Deadline
+from settings import DEBUG_AMOSTRA, DEBUG_MODO, DEBUG_TRACE_PEDACOS
+
+MODOS = ("off", "falha", "amostra")
+
+# screenshot segue o prazo do job; o de erro ainda sai com o prazo
+# estourado, mas com uma espera curta
+_SCREENSHOT_MS = 30_000
+_SCREENSHOT_ERRO_MIN_MS = 2_000
+
+
+def _amostrado(job_id) -> bool:
+    # decisão estável por job: a retentativa do mesmo job repete a escolha
+    return zlib.crc32(str(job_id).encode("utf-8")) % 10_000 < DEBUG_AMOSTRA * 10_000
+
+
+class Depuracao:
+    def __init__(
+        self,
+        automacao: str,
+        job_id,
+        modo: str = DEBUG_MODO,
+        amostrado: bool = False,
+        deadline: Deadline | None = None,
+    ):
+        if modo not in MODOS:
+            print(f"⚠ DEBUG_MODO '{modo}' desconhecido, usando 'falha'")
+            modo = "falha"
+
+        self.modo = modo
+        self.amostrado = modo != "off" and amostrado
+        self.pasta = PastaDoJob(automacao, job_id)
+        self.deadline = deadline
+
+        self._context = None
+        self._pedaco_atual = "inicio"
+        self._pedacos: deque[Path] = deque()
+
+    @classmethod
+    def para_job(cls, job: dict, automacao: str, deadline: Deadline | None = None) -> "Depuracao":
+        job_id = job.get("id")
+        payload = job.get("payload_json") or {}
+        amostrado = bool(payload.get("debug")) or (
+            DEBUG_MODO == "amostra" and _amostrado(job_id)
+        )
+        return cls(automacao, job_id, amostrado=amostrado, deadline=deadline)
+
+    # =========================================================
+    # SNAPSHOTS
+    # =========================================================
+
+    def snapshot(self, page, label: str, falha: bool = False) -> None:
+        """PNG (página inteira) + HTML; passos normais só em job amostrado."""
+        if self.modo == "off" or not (falha or self.amostrado):
+            return
+
+        timeout = _SCREENSHOT_MS
+        if self.deadline is not None:
+            restante = self.deadline.restante_ms()
+            if restante <= 0 and not falha:
+                return
+            timeout = max(_SCREENSHOT_ERRO_MIN_MS, min(_SCREENSHOT_MS, restante))
+
+        try:
+            png_path, html_path = self.pasta.arquivos(label, "png", "html.gz")
+
+            page.screenshot(path=str(png_path), full_page=True, timeout=timeout)
+            gravar_html(html_path, page.content())
+
+            print(f"[DEBUG] Screenshot salvo: {png_path}")
+            print(f"[DEBUG] HTML salvo: {html_path}")
+
+        except Exception as e:
+            print(f"[DEBUG] Falha ao gerar snapshot '{label}': {e}")
+
+    # =========================================================
+    # TRACE DO PLAYWRIGHT
+    # =========================================================
+
+    def iniciar_trace(self, context) -> None:
+        if self.modo == "off":
+            return
+
+        context.tracing.start(
+            screenshots=self.amostrado,
+            snapshots=True,
+            sources=self.amostrado,
+        )
+        self._context = context
+
+    def marco(self, nome: str) -> None:
+        """Grava o pedaço atual do trace e abre outro chamado `nome`."""
+        if self._context is None:
+            return
+
+        try:
+            pedaco = self.pasta.arquivo(f"trace_{self._pedaco_atual}", "zip")
+            self._context.tracing.stop_chunk(path=str(pedaco))
+            self._context.tracing.start_chunk(title=nome)
+        except Exception as e:
+            print(f"[DEBUG] Falha ao trocar pedaço do trace: {e}")
+            return
+
+        self._pedaco_atual = nome
+        self._pedacos.append(pedaco)
+
+        # anel: fora do job amostrado, só os últimos pedaços importam
+        while not self.amostrado and len(self._pedacos) > DEBUG_TRACE_PEDACOS:
+            self._pedacos.popleft().unlink(missing_ok=True)
+
+    def finalizar_trace(self, erro: bool) -> None:
+        """Grava o último pedaço se o job falhou (ou é amostrado); senão descarta tudo."""
+        if self._context is None:
+            return
+
+        context, self._context = self._context, None
+        manter = erro or self.amostrado
+
+        try:
+            if manter:
+                path = self.pasta.arquivo(f"trace_{self._pedaco_atual}", "zip")
+                context.tracing.stop(path=str(path))
+                print(f"[DEBUG] Trace salvo em {self.pasta.dir}")
+            else:
+                context.tracing.stop()
+        except Exception as e:
+            print(f"[DEBUG] Falha ao encerrar trace: {e}")
+
+        if not manter:
+            for pedaco in self._pedacos:
+                pedaco.unlink(missing_ok=True)
+            self._pedacos.clear()
+            self.pasta.remover_se_vazia()
+
+    def relatorio(self) -> dict:
+        return self.pasta.relatorio()
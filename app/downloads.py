@@ -0,0 +1,206 @@
+# geoincra_worker/app/downloads.py
+"""
+Downloads diretos por HTTP usando a sessão autenticada do browser.
+
+Em vez de clicar no link e esperar o evento "download" (um por vez, pela
+UI), coleta o href do DOM e baixa com requests, reaproveitando os
+cookies e o User-Agent do contexto do Playwright. Vários downloads
+correm em paralelo num pool de threads e cada resposta vai em streaming
+direto para o disco.
+
+Só links com URL comum são elegíveis: href "#", "javascript:" ou
+__doPostBack dependem do ViewState da página e continuam pelo clique
+(href_direto() devolve None e o chamador usa o caminho antigo).
+
+O Playwright sync não é thread-safe: cookies e hrefs são lidos na thread
+da automação (agendar); as threads do pool só usam requests.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+import requests
+
+from metrics import chamada_externa
+from settings import DOWNLOAD_CONCURRENCY, DOWNLOAD_HTTP_ENABLED
+from timing import span
+
+_CHUNK = 64 * 1024
+
+_RE_FILENAME = re.compile(
+    r"filename\*?=(?:UTF-8'')?\"?([^\";]+)\"?",
+    re.IGNORECASE,
+)
+_RE_FORA_DO_NOME = re.compile(r"[^\w.-]+")
+
+
+def href_direto(locator) -> str | None:
+    """
+    URL absoluta do link se ele for baixável por HTTP, senão None.
+    """
+    if not DOWNLOAD_HTTP_ENABLED:
+        return None
+
+    try:
+        return locator.evaluate(
+            """
+            (el) => {
+                const a = el.closest("a") || el.querySelector("a");
+                if (!a) return null;
+
+                const bruto = (a.getAttribute("href") || "").trim();
+                const onclick = a.getAttribute("onclick") || "";
+
+                if (!bruto || bruto.startsWith("#") || /^javascript:/i.test(bruto)) return null;
+                if (/__doPostBack|WebForm_DoPostBack/i.test(onclick)) return null;
+
+                return a.href;
+            }
+            """
+        )
+    except Exception:
+        return None
+
+
+def _nome_do_arquivo(resp: requests.Response, url: str) -> str:
+    disposicao = resp.headers.get("Content-Disposition") or ""
+    m = _RE_FILENAME.search(disposicao)
+    nome = unquote(m.group(1)) if m else unquote(os.path.basename(urlsplit(url).path))
+
+    # mesmo critério do suggested_filename: só o nome, sem diretórios
+    nome = os.path.basename(nome.replace("\\", "/")).strip()
+    return nome or "download.pdf"
+
+
+def nome_do_protocolo(protocolo: str | None, nome: str) -> str:
+    """
+    <protocolo>_<nome>: o portal costuma mandar o mesmo nome de arquivo
+    para certidões diferentes, e jobs em paralelo dividem a pasta.
+    """
+    if not protocolo:
+        return nome
+    prefixo = _RE_FORA_DO_NOME.sub("_", str(protocolo))
+    return f"{prefixo}_{nome}"
+
+
+class BaixadorHTTP:
+    """
+        baixador = BaixadorHTTP(context, DOWNLOAD_DIR)
+        futuro = baixador.agendar(
+            url, timeout_s=deadline.timeout_s(60), page=page, protocolo=protocolo
+        )
+        ...
+        caminho = futuro.result()   # Path do arquivo salvo
+        baixador.fechar()           # ou use como context manager
+    """
+
+    def __init__(self, context, destino: Path, max_workers: int = DOWNLOAD_CONCURRENCY):
+        self.context = context
+        self.destino = Path(destino)
+        self.destino.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix="download",
+        )
+        self._local = threading.local()
+        self._cookies: list[dict] = []
+        self._user_agent: str | None = None
+
+    def fechar(self) -> None:
+        """Espera os downloads em andamento e encerra o pool."""
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+    # -----------------------------------------------------
+
+    def _sessao(self) -> requests.Session:
+        """Uma Session por thread do pool (requests.Session não é thread-safe)."""
+        sessao = getattr(self._local, "sessao", None)
+        if sessao is None:
+            sessao = requests.Session()
+            self._local.sessao = sessao
+
+        sessao.cookies.clear()
+        for c in self._cookies:
+            sessao.cookies.set(
+                c["name"],
+                c["value"],
+                domain=c.get("domain", "").lstrip("."),
+                path=c.get("path", "/"),
+            )
+        if self._user_agent:
+            sessao.headers["User-Agent"] = self._user_agent
+        return sessao
+
+    def _baixar(self, url: str, fim: float, referer: str | None, protocolo: str | None) -> Path:
+        """
+        fim (time.monotonic) vale para o download inteiro: o timeout do
+        requests é por leitura, então o laço confere o prazo a cada bloco
+        e uma resposta que chega a conta-gotas não passa dele.
+        """
+        headers = {"Referer": referer} if referer else {}
+
+        def restante() -> float:
+            falta = fim - time.monotonic()
+            if falta <= 0:
+                raise Exception(f"Download excedeu o prazo: {url}")
+            return falta
+
+        with span("download.http"), chamada_externa("ri_digital_download"):
+            with self._sessao().get(url, stream=True, timeout=restante(), headers=headers) as resp:
+                resp.raise_for_status()
+
+                tipo = resp.headers.get("Content-Type", "")
+                if "text/html" in tipo:
+                    # sessão expirada / página de erro no lugar do arquivo
+                    raise Exception(f"Resposta HTML em vez de arquivo: {url}")
+
+                destino = self.destino / nome_do_protocolo(protocolo, _nome_do_arquivo(resp, url))
+
+                # .part com nome único: downloads simultâneos com o mesmo
+                # nome não escrevem no mesmo arquivo
+                with tempfile.NamedTemporaryFile(
+                    dir=self.destino, prefix=f"{destino.name}.", suffix=".part", delete=False
+                ) as f:
+                    temporario = Path(f.name)
+                    try:
+                        for bloco in resp.iter_content(_CHUNK):
+                            restante()
+                            f.write(bloco)
+                    except BaseException:
+                        f.close()
+                        temporario.unlink(missing_ok=True)
+                        raise
+
+                os.replace(temporario, destino)
+
+        return destino
+
+    def agendar(self, url: str, timeout_s: float = 60, page=None, protocolo: str | None = None) -> Future:
+        """
+        Agenda o download de url. Deve ser chamado na thread do Playwright
+        (lê os cookies atuais do contexto). timeout_s conta a partir de
+        agora e cobre a espera no pool e a transferência inteira; o
+        arquivo é salvo como <protocolo>_<nome>.
+        """
+        fim = time.monotonic() + timeout_s
+        self._cookies = self.context.cookies()
+        if page is not None and self._user_agent is None:
+            try:
+                self._user_agent = page.evaluate("() => navigator.userAgent")
+            except Exception:
+                pass
+
+        referer = page.url if page is not None else None
+        return self._pool.submit(self._baixar, url, fim, referer, protocolo)
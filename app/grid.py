@@ -0,0 +1,215 @@
+# geoincra_worker/app/grid.py
+"""
+Leitura paginada de GridView do ASP.NET (#Grid) como gerador.
+
+O GridView mostra uma página por vez e troca de página por postback
+(__doPostBack('<grid>', 'Page$N')). GridPaginado.linhas() percorre as
+páginas em ordem e entrega as linhas uma a uma, lendo só a página atual:
+a memória fica limitada ao tamanho de uma página, não ao histórico.
+
+    grid = GridPaginado(page, deadline)
+    for linha in grid.linhas():
+        linha.celulas      # textos das <td>, lidos num único evaluate
+        linha.links        # href de cada <td> quando é URL comum
+        linha.locator      # a <tr>, para clicar
+        ...                # pode navegar para fora da listagem
+
+Entre uma linha e outra o chamador pode sair da listagem (abrir o
+pedido, voltar). Antes de entregar a próxima linha o gerador confere se
+a página ainda é a listagem e se o pager está na página certa; se não,
+recarrega a URL e refaz o postback até a página N.
+"""
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from deadline import Deadline
+
+# Linhas de dados = <tr> do tbody do grid com <td> e sem links Page$N
+# (as do pager, que marca a página atual com um <span>).
+_JS_ESTADO = """
+(grid) => {
+    const RE = /__doPostBack\\(\\s*['"]([^'"]+)['"]\\s*,\\s*['"]Page\\$([^'"]+)['"]/;
+    const trs = [...(grid.tBodies.length ? grid.tBodies[0].rows : grid.rows)];
+    const ehPager = (tr) => tr.querySelector("a[href*='Page$']") !== null;
+
+    let alvo = null;
+    const numeros = [];
+    const especiais = [];
+    for (const a of grid.querySelectorAll("a[href*='Page$']")) {
+        const m = RE.exec(a.getAttribute("href") || "");
+        if (!m) continue;
+        alvo = alvo || m[1];
+        if (/^\\d+$/.test(m[2])) numeros.push(parseInt(m[2], 10));
+        else especiais.push(m[2]);
+    }
+
+    let atual = 1;
+    const pager = trs.find(ehPager);
+    if (pager) {
+        for (const s of pager.querySelectorAll("span")) {
+            const n = parseInt(s.textContent.trim(), 10);
+            if (!isNaN(n)) { atual = n; break; }
+        }
+    }
+
+    // href do primeiro link da célula, se for URL comum (não postback)
+    const link = (td) => {
+        const a = td.querySelector("a[href]");
+        if (!a) return null;
+        const bruto = a.getAttribute("href").trim();
+        if (!bruto || bruto.startsWith("#") || /^javascript:/i.test(bruto)) return null;
+        if (/__doPostBack|WebForm_DoPostBack/i.test(a.getAttribute("onclick") || "")) return null;
+        return a.href;
+    };
+
+    const linhas = [];
+    const celulas = [];
+    const links = [];
+    trs.forEach((tr, i) => {
+        if (ehPager(tr)) return;
+        const tds = [...tr.cells].filter((c) => c.tagName === "TD");
+        if (!tds.length) return;
+        linhas.push(i);
+        celulas.push(tds.map((td) => td.innerText.trim()));
+        links.push(tds.map(link));
+    });
+
+    const proximo = numeros.some((n) => n > atual) || especiais.includes("Next");
+
+    return { atual, alvo, proximo, linhas, celulas, links };
+}
+"""
+
+_JS_PAGINA_ATUAL = """
+([seletor, n]) => {
+    const grid = document.querySelector(seletor);
+    if (!grid) return false;
+    const trs = [...(grid.tBodies.length ? grid.tBodies[0].rows : grid.rows)];
+    const pager = trs.find((tr) => tr.querySelector("a[href*='Page$']"));
+    if (!pager) return n === 1;
+    for (const s of pager.querySelectorAll("span")) {
+        const v = parseInt(s.textContent.trim(), 10);
+        if (!isNaN(v)) return v === n;
+    }
+    return false;
+}
+"""
+
+
+@dataclass
+class LinhaGrid:
+    pagina: int
+    indice: int  # posição da <tr> no tbody (inclui cabeçalho/pager)
+    celulas: list[str]
+    links: list[str | None]  # href comum por célula (None: sem link ou postback)
+    locator: object
+
+
+class GridPaginado:
+    def __init__(
+        self,
+        page,
+        deadline: Deadline,
+        seletor: str = "#Grid",
+        url: str | None = None,
+        max_paginas: int | None = None,
+    ):
+        """
+        url: endereço da listagem, usado para voltar a ela quando o
+        chamador navegou para fora (padrão: page.url agora).
+        max_paginas: limite de páginas lidas (None = todas).
+        """
+        self.page = page
+        self.deadline = deadline
+        self.seletor = seletor
+        self.url = url or page.url
+        self.max_paginas = max_paginas
+        self.pagina = 1
+        self._alvo: str | None = None
+
+    def _linha(self, indice: int):
+        return self.page.locator(f"{self.seletor} > tbody > tr").nth(indice)
+
+    def _estado(self) -> dict:
+        self.page.wait_for_selector(
+            f"{self.seletor} tbody tr", timeout=self.deadline.timeout(120000)
+        )
+        estado = self.page.locator(self.seletor).first.evaluate(_JS_ESTADO)
+        self._alvo = estado["alvo"] or self._alvo
+        return estado
+
+    def _na_listagem(self) -> bool:
+        return urlsplit(self.page.url).path.lower() == urlsplit(self.url).path.lower()
+
+    def ir_para(self, n: int) -> None:
+        """Postback Page$N e espera o pager mostrar a página N."""
+        if not self._alvo:
+            raise Exception(f"Grid {self.seletor} sem paginação para ir à página {n}")
+
+        print(f"➡ Grid: página {n}")
+        self.page.evaluate(
+            "([alvo, arg]) => __doPostBack(alvo, arg)", [self._alvo, f"Page${n}"]
+        )
+        # postback completo recarrega o documento; wait_for_function
+        # continua valendo depois da navegação
+        self.page.wait_for_function(
+            _JS_PAGINA_ATUAL,
+            arg=[self.seletor, n],
+            timeout=self.deadline.timeout(120000),
+        )
+        self.pagina = n
+
+    def garantir_pagina(self, n: int) -> dict:
+        """Volta para a listagem/página N se o chamador saiu dela."""
+        if not self._na_listagem():
+            print(f"➡ Grid: recarregando listagem para a página {n}")
+            self.page.goto(
+                self.url,
+                wait_until="domcontentloaded",
+                timeout=self.deadline.timeout(120000),
+            )
+
+        estado = self._estado()
+        if estado["atual"] != n:
+            self.ir_para(n)
+            estado = self._estado()
+        return estado
+
+    def linhas(self):
+        """Gera LinhaGrid de todas as páginas, uma página em memória por vez."""
+        n = 1
+        while True:
+            estado = self.garantir_pagina(n)
+            self.pagina = n
+            total = len(estado["linhas"])
+            print(f"➡ Grid: página {n}, {total} linha(s)")
+
+            for k in range(total):
+                if k:
+                    # o chamador pode ter navegado; índices mudam se a
+                    # página foi recarregada com outro conteúdo
+                    atual = self.garantir_pagina(n)
+                    if atual["celulas"] != estado["celulas"]:
+                        estado = atual
+                        if k >= len(estado["linhas"]):
+                            break
+
+                yield LinhaGrid(
+                    pagina=n,
+                    indice=estado["linhas"][k],
+                    celulas=estado["celulas"][k],
+                    links=estado["links"][k],
+                    locator=self._linha(estado["linhas"][k]),
+                )
+
+            if not estado["proximo"]:
+                return
+            if self.max_paginas and n >= self.max_paginas:
+                print(f"⚠ Grid: limite de {self.max_paginas} página(s) atingido")
+                return
+
+            # o estado da página seguinte é lido depois do postback
+            if not self._na_listagem():
+                self.garantir_pagina(n)
+            self.ir_para(n + 1)
+            n += 1
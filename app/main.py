@@ -1,9 +1,16 @@
+import sys
 import time
 
+import artifacts
+from circuit_breaker import breaker_do_tipo, tipos_liberados
+import cache
+import metrics
+from migrations import preparar_schema
 from db import (
     fetch_pending_job,
     update_job_status,
     fetch_ri_digital_credentials,
+    save_job_stage_metrics,
 )
 from ocr_worker import executar_ocr_job
 from ri_digital import executar_ri_digital
@@ -13,66 +20,107 @@ from ri_digital_consultar_certidao_worker import (
 from ri_digital_solicitar_certidao_worker import (
     executar_job_ri_digital_solicitar_certidao,
 )
+from timing import finalizar_job, iniciar_job, span
 
 
-def main() -> None:
-    print("🤖 Worker GEOINCRA iniciado")
+def _credenciais_ri_digital(job: dict) -> dict:
+    with span("credenciais"):
+        cred = fetch_ri_digital_credentials(job["user_id"])
 
-    while True:
-        job = fetch_pending_job()
+    if not cred:
+        raise Exception("Credenciais do RI Digital não encontradas")
 
-        if not job:
-            time.sleep(5)
-            continue
+    return cred
 
-        try:
-            job_type = job["type"]
 
-            if job_type == "RI_DIGITAL_MATRICULA":
-                cred = fetch_ri_digital_credentials(job["user_id"])
+def _executar_job(job: dict) -> None:
+    job_type = job["type"]
 
-                if not cred:
-                    raise Exception("Credenciais do RI Digital não encontradas")
+    if job_type == "RI_DIGITAL_MATRICULA":
+        cred = _credenciais_ri_digital(job)
+        executar_ri_digital(job, cred)
 
-                executar_ri_digital(job, cred)
-                update_job_status(job["id"], "COMPLETED")
+    elif job_type == "RI_DIGITAL_SOLICITAR_CERTIDAO":
+        cred = _credenciais_ri_digital(job)
+        executar_job_ri_digital_solicitar_certidao(
+            job,
+            cred["login"],
+            cred["password_encrypted"],
+        )
 
-            elif job_type == "RI_DIGITAL_SOLICITAR_CERTIDAO":
-                cred = fetch_ri_digital_credentials(job["user_id"])
+    elif job_type == "RI_DIGITAL_CONSULTAR_CERTIDAO":
+        cred = _credenciais_ri_digital(job)
+        executar_job_ri_digital_consultar_certidao(
+            job,
+            cred["login"],
+            cred["password_encrypted"],
+        )
 
-                if not cred:
-                    raise Exception("Credenciais do RI Digital não encontradas")
+    elif job_type == "OCR_DOCUMENT":
+        executar_ocr_job(job)
 
-                executar_job_ri_digital_solicitar_certidao(
-                    job,
-                    cred["login"],
-                    cred["password_encrypted"],
-                )
-                update_job_status(job["id"], "COMPLETED")
+    else:
+        raise Exception(f"Tipo de automação desconhecido: {job_type}")
 
-            elif job_type == "RI_DIGITAL_CONSULTAR_CERTIDAO":
-                cred = fetch_ri_digital_credentials(job["user_id"])
 
-                if not cred:
-                    raise Exception("Credenciais do RI Digital não encontradas")
+def _gravar_metricas(job_id) -> None:
+    try:
+        save_job_stage_metrics(job_id, finalizar_job())
+    except Exception as e:
+        print(f"⚠ Falha ao gravar métricas do job {job_id}: {e}")
 
-                executar_job_ri_digital_consultar_certidao(
-                    job,
-                    cred["login"],
-                    cred["password_encrypted"],
-                )
-                update_job_status(job["id"], "COMPLETED")
 
-            elif job_type == "OCR_DOCUMENT":
-                executar_ocr_job(job)
-                update_job_status(job["id"], "COMPLETED")
+def main() -> None:
+    print("🤖 Worker GEOINCRA iniciado")
+
+    try:
+        preparar_schema()
+    except Exception as e:
+        print(f"❌ Schema do worker não preparado, encerrando: {e}")
+        sys.exit(1)
 
-            else:
-                raise Exception(f"Tipo de automação desconhecido: {job_type}")
+    cache.iniciar_listener()
+    metrics.iniciar_servidor()
+    artifacts.iniciar_limpeza()
+
+    while True:
+        with metrics.CLAIM_LATENCY.time():
+            job = fetch_pending_job(tipos_liberados())
+
+        if not job:
+            time.sleep(5)
+            continue
+
+        job_type = job["type"]
+        breaker = breaker_do_tipo(job_type)
+
+        metrics.JOBS_CLAIMED.inc(type=job_type)
+        inicio = time.monotonic()
+        status = "FAILED"
+
+        iniciar_job(job["id"])
+
+        try:
+            with span("job.total"):
+                _executar_job(job)
+
+            update_job_status(job["id"], "COMPLETED")
+            status = "COMPLETED"
+
+            if breaker:
+                breaker.registrar_sucesso()
 
         except Exception as e:
+            if breaker:
+                breaker.registrar_falha(e)
+
             update_job_status(job["id"], "FAILED", str(e))
 
+        finally:
+            metrics.JOBS_FINISHED.inc(type=job_type, status=status)
+            metrics.JOB_DURATION.observe(time.monotonic() - inicio, type=job_type)
+            _gravar_metricas(job["id"])
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,298 @@
+# geoincra_worker/app/metrics.py
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from settings import METRICS_HOST, METRICS_PORT, METRICS_QUEUE_DEPTH_TTL_SECONDS
+
+
+# =========================================================
+# PRIMITIVAS (formato texto do Prometheus, sem dependência extra)
+# =========================================================
+
+_DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900, 1800)
+
+
+def _escape(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(nomes: tuple[str, ...], valores: tuple) -> str:
+    if not nomes:
+        return ""
+    pares = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(nomes, valores))
+    return "{" + pares + "}"
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, labels: tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = labels
+        self._lock = threading.Lock()
+        REGISTRO.append(self)
+
+    def _chave(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def _cabecalho(self) -> list[str]:
+        return [
+            f"# HELP {self.nome} {self.ajuda}",
+            f"# TYPE {self.nome} {self.tipo}",
+        ]
+
+
+class Counter(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, labels=()):
+        super().__init__(nome, ajuda, labels)
+        self._valores: dict[tuple, float] = {}
+
+    def inc(self, valor: float = 1, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def render(self) -> list[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        return self._cabecalho() + [
+            f"{self.nome}{_fmt_labels(self.labels, k)} {v}" for k, v in itens
+        ]
+
+
+class Gauge(Counter):
+    tipo = "gauge"
+
+    def dec(self, valor: float = 1, **labels) -> None:
+        self.inc(-valor, **labels)
+
+    def set(self, valor: float, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = valor
+
+
+class Histogram(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, labels=(), buckets=_DEFAULT_BUCKETS):
+        super().__init__(nome, ajuda, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, valor: float, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                # [contagem por bucket..., soma, total]
+                serie = [0] * len(self.buckets) + [0.0, 0]
+                self._series[chave] = serie
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio, **labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            itens = [(k, list(v)) for k, v in self._series.items()]
+
+        linhas = self._cabecalho()
+        nomes_le = self.labels + ("le",)
+
+        for chave, serie in itens:
+            for i, limite in enumerate(self.buckets):
+                linhas.append(
+                    f"{self.nome}_bucket{_fmt_labels(nomes_le, chave + (limite,))} {serie[i]}"
+                )
+            linhas.append(
+                f"{self.nome}_bucket{_fmt_labels(nomes_le, chave + ('+Inf',))} {serie[-1]}"
+            )
+            linhas.append(f"{self.nome}_sum{_fmt_labels(self.labels, chave)} {serie[-2]}")
+            linhas.append(f"{self.nome}_count{_fmt_labels(self.labels, chave)} {serie[-1]}")
+
+        return linhas
+
+
+REGISTRO: list[_Metrica] = []
+
+
+# =========================================================
+# MÉTRICAS DO WORKER
+# =========================================================
+
+JOBS_CLAIMED = Counter(
+    "geoincra_worker_jobs_claimed_total",
+    "Jobs reivindicados da fila",
+    ("type",),
+)
+JOBS_FINISHED = Counter(
+    "geoincra_worker_jobs_finished_total",
+    "Jobs finalizados por tipo e status",
+    ("type", "status"),
+)
+JOB_DURATION = Histogram(
+    "geoincra_worker_job_duration_seconds",
+    "Duração dos jobs (claim até status final)",
+    ("type",),
+)
+CLAIM_LATENCY = Histogram(
+    "geoincra_worker_claim_latency_seconds",
+    "Latência de fetch_pending_job",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+QUEUE_DEPTH = Gauge(
+    "geoincra_worker_queue_depth",
+    "Jobs PENDING por tipo (amostrado no scrape)",
+    ("type",),
+)
+ACTIVE_BROWSERS = Gauge(
+    "geoincra_worker_active_browsers",
+    "Instâncias de Chromium abertas pelo processo",
+)
+EXTERNAL_CALLS = Counter(
+    "geoincra_worker_external_calls_total",
+    "Chamadas a serviços externos por resultado",
+    ("service", "outcome"),
+)
+CACHE_LOOKUPS = Counter(
+    "geoincra_worker_cache_lookups_total",
+    "Consultas ao cache em processo por resultado (hit/miss)",
+    ("cache", "outcome"),
+)
+EXTERNAL_CALL_DURATION = Histogram(
+    "geoincra_worker_external_call_seconds",
+    "Duração das chamadas a serviços externos",
+    ("service",),
+)
+DEBUG_ARTIFACTS_BYTES = Gauge(
+    "geoincra_worker_debug_artifacts_bytes",
+    "Bytes em artefatos de diagnóstico (medido na última limpeza)",
+)
+DEBUG_JOB_ARTIFACTS_BYTES = Histogram(
+    "geoincra_worker_debug_job_artifacts_bytes",
+    "Bytes de artefatos de diagnóstico gravados por job",
+    ("automation",),
+    buckets=(0, 100_000, 1_000_000, 5_000_000, 20_000_000, 100_000_000, 500_000_000),
+)
+DEBUG_ARTIFACTS_REMOVED = Counter(
+    "geoincra_worker_debug_artifacts_removed_total",
+    "Pastas/arquivos de diagnóstico apagados pela limpeza, por motivo",
+    ("reason",),
+)
+
+
+@contextmanager
+def chamada_externa(servico: str):
+    """
+    Envolve uma chamada a Vision/OpenAI/backend: conta ok/erro e
+    observa a duração.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        EXTERNAL_CALLS.inc(service=servico, outcome="error")
+        raise
+    else:
+        EXTERNAL_CALLS.inc(service=servico, outcome="ok")
+    finally:
+        EXTERNAL_CALL_DURATION.observe(time.perf_counter() - inicio, service=servico)
+
+
+def registrar_browser(browser) -> None:
+    """
+    Conta um Chromium aberto; o decremento vem do evento "disconnected",
+    que o Playwright dispara em browser.close() ou se o processo morrer.
+    """
+    ACTIVE_BROWSERS.inc()
+    browser.on("disconnected", lambda _: ACTIVE_BROWSERS.dec())
+
+
+# =========================================================
+# SERVIDOR HTTP
+# =========================================================
+
+_fila_consultada_em = 0.0
+_fila_lock = threading.Lock()
+
+
+def _atualizar_profundidade_fila() -> None:
+    global _fila_consultada_em
+
+    with _fila_lock:
+        if time.monotonic() - _fila_consultada_em < METRICS_QUEUE_DEPTH_TTL_SECONDS:
+            return
+        _fila_consultada_em = time.monotonic()
+
+    from db import JOB_TYPES, count_pending_jobs
+
+    try:
+        pendentes = count_pending_jobs()
+        # tipo que esvaziou some do GROUP BY: a série precisa voltar a 0
+        with QUEUE_DEPTH._lock:
+            ja_vistos = {chave[0] for chave in QUEUE_DEPTH._valores}
+        for job_type in ja_vistos | set(JOB_TYPES) | set(pendentes):
+            QUEUE_DEPTH.set(pendentes.get(job_type, 0), type=job_type)
+    except Exception as e:
+        print(f"⚠ Métricas: falha ao consultar fila: {e}")
+
+
+def render() -> str:
+    _atualizar_profundidade_fila()
+
+    linhas: list[str] = []
+    for metrica in REGISTRO:
+        linhas.extend(metrica.render())
+    return "\n".join(linhas) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        corpo = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servidor(porta: int = METRICS_PORT, host: str = METRICS_HOST):
+    """
+    Sobe o endpoint /metrics numa thread daemon. Sem porta configurada
+    não faz nada. Retorna o servidor (útil para testes locais).
+    """
+    if not porta:
+        return None
+
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    threading.Thread(
+        target=servidor.serve_forever,
+        name="metrics-http",
+        daemon=True,
+    ).start()
+
+    print(f"📈 Métricas em http://{host}:{servidor.server_port}/metrics")
+    return servidor
@@ -0,0 +1,391 @@
+"""
+Migrações versionadas do schema usado pelo worker.
+
+Cada migração roda uma única vez e fica registrada em
+worker_schema_migrations. Índices em tabelas do backend são criados com
+CREATE INDEX CONCURRENTLY (sem bloquear escrita), por isso essas
+migrações rodam em autocommit.
+
+Na inicialização o worker aplica as pendentes e verifica se os índices
+esperados existem e estão válidos:
+
+    python migrations.py    # só mostra o status, não aplica nada
+"""
+import time
+from dataclasses import dataclass
+
+from db import get_connection
+
+# Chave do advisory lock: várias réplicas subindo juntas não aplicam a
+# mesma migração em paralelo. Usa pg_try_advisory_lock em laço porque uma
+# réplica parada em pg_advisory_lock mantém um snapshot aberto, e o
+# CREATE INDEX CONCURRENTLY da outra esperaria por ele.
+_ADVISORY_LOCK = 0x6765_6F69
+
+
+@dataclass(frozen=True)
+class Migracao:
+    versao: int
+    nome: str
+    sql: str
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+    concorrente: bool = False
+
+
+MIGRACOES = (
+    Migracao(
+        1,
+        "automation_job_checkpoints",
+        """
+        CREATE TABLE IF NOT EXISTS automation_job_checkpoints (
+            job_id      BIGINT      NOT NULL,
+            row_key     TEXT        NOT NULL,
+            result_json JSONB       NOT NULL DEFAULT '{}'::jsonb,
+            created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (job_id, row_key)
+        )
+        """,
+    ),
+    Migracao(
+        2,
+        "automation_job_stage_metrics",
+        """
+        CREATE TABLE IF NOT EXISTS automation_job_stage_metrics (
+            job_id     BIGINT           NOT NULL,
+            stage      TEXT             NOT NULL,
+            count      INTEGER          NOT NULL,
+            total_ms   DOUBLE PRECISION NOT NULL,
+            p50_ms     DOUBLE PRECISION NOT NULL,
+            p95_ms     DOUBLE PRECISION NOT NULL,
+            created_at TIMESTAMPTZ      NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (job_id, stage)
+        )
+        """,
+    ),
+    # claim da fila: WHERE status = 'PENDING' AND type = ANY(...) ORDER BY created_at
+    Migracao(
+        3,
+        "idx_automation_jobs_pending",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_automation_jobs_pending
+        ON automation_jobs (created_at, type)
+        WHERE status = 'PENDING'
+        """,
+        concorrente=True,
+    ),
+    # update_result_success/error: WHERE document_id = ... ORDER BY id DESC LIMIT 1
+    Migracao(
+        4,
+        "idx_ocr_results_document_id",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ocr_results_document_id
+        ON ocr_results (document_id, id DESC)
+        """,
+        concorrente=True,
+    ),
+    # fetch_ri_digital_credentials: (user_id, provider) ativos, index-only scan
+    Migracao(
+        5,
+        "idx_external_credentials_active",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_external_credentials_active
+        ON external_credentials (user_id, provider)
+        INCLUDE (login, password_encrypted)
+        WHERE active = TRUE
+        """,
+        concorrente=True,
+    ),
+    # insert_result com row_key: upsert por (job_id, metadata_json->>'row_key')
+    Migracao(
+        6,
+        "idx_automation_results_row_key",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_automation_results_row_key
+        ON automation_results (job_id, (metadata_json->>'row_key'))
+        """,
+        concorrente=True,
+    ),
+    # invalidação do cache em processo (cache.py): NOTIFY worker_cache '<tabela>:<chave>'
+    Migracao(
+        7,
+        "notify_worker_cache",
+        """
+        CREATE OR REPLACE FUNCTION worker_cache_notify() RETURNS trigger AS $$
+        DECLARE
+            coluna TEXT := TG_ARGV[0];
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify('worker_cache', TG_TABLE_NAME || ':' || (to_jsonb(OLD) ->> coluna));
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM pg_notify('worker_cache', TG_TABLE_NAME || ':' || (to_jsonb(NEW) ->> coluna));
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS trg_worker_cache_notify ON external_credentials;
+        CREATE TRIGGER trg_worker_cache_notify
+        AFTER INSERT OR UPDATE OR DELETE ON external_credentials
+        FOR EACH ROW EXECUTE FUNCTION worker_cache_notify('user_id');
+
+        DROP TRIGGER IF EXISTS trg_worker_cache_notify ON ocr_prompts;
+        CREATE TRIGGER trg_worker_cache_notify
+        AFTER INSERT OR UPDATE OR DELETE ON ocr_prompts
+        FOR EACH ROW EXECUTE FUNCTION worker_cache_notify('id');
+        """,
+    ),
+    # sincronização incremental do Consultar Certidão (estado por usuário)
+    Migracao(
+        8,
+        "ri_digital_certidao_sync",
+        """
+        CREATE TABLE IF NOT EXISTS ri_digital_certidao_sync (
+            user_id    INTEGER     NOT NULL,
+            protocolo  TEXT        NOT NULL,
+            status     TEXT        NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (user_id, protocolo)
+        );
+
+        CREATE TABLE IF NOT EXISTS ri_digital_certidao_sync_items (
+            user_id     INTEGER     NOT NULL,
+            protocolo   TEXT        NOT NULL,
+            item        TEXT        NOT NULL,
+            status      TEXT        NOT NULL,
+            file_path   TEXT,
+            file_sha256 TEXT,
+            result_json JSONB       NOT NULL DEFAULT '{}'::jsonb,
+            updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (user_id, protocolo, item)
+        );
+        """,
+    ),
+    # catálogo de cidades/cartórios do wizard de certidão (cartorios.py)
+    Migracao(
+        9,
+        "ri_digital_catalogo_cartorios",
+        """
+        CREATE TABLE IF NOT EXISTS ri_digital_cidades (
+            uf         TEXT        NOT NULL,
+            value      TEXT        NOT NULL,
+            label      TEXT        NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (uf, value)
+        );
+
+        CREATE TABLE IF NOT EXISTS ri_digital_cartorios (
+            uf           TEXT        NOT NULL,
+            cidade_value TEXT        NOT NULL,
+            value        TEXT        NOT NULL,
+            label        TEXT        NOT NULL,
+            updated_at   TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (uf, cidade_value, value)
+        );
+        """,
+    ),
+    # livro de pedidos do Solicitar Certidão: retentativa não paga de novo
+    Migracao(
+        10,
+        "ri_digital_certidao_pedidos",
+        """
+        CREATE TABLE IF NOT EXISTS ri_digital_certidao_pedidos (
+            chave       TEXT        PRIMARY KEY,
+            user_id     INTEGER,
+            job_id      BIGINT      NOT NULL,
+            uf          TEXT        NOT NULL,
+            cidade      TEXT        NOT NULL,
+            cartorio    TEXT        NOT NULL,
+            matricula   TEXT        NOT NULL,
+            tipo        TEXT        NOT NULL,
+            finalidade  TEXT        NOT NULL,
+            status      TEXT        NOT NULL,
+            protocolo   TEXT,
+            result_json JSONB       NOT NULL DEFAULT '{}'::jsonb,
+            created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        """,
+    ),
+    # job_id no mesmo tipo de automation_jobs.id (BIGSERIAL): sem cast
+    # implícito nos joins e sem estouro depois de 2^31. Bancos novos já
+    # criam BIGINT acima; nos antigos o ALTER reescreve as tabelas.
+    Migracao(
+        11,
+        "job_id_bigint",
+        """
+        ALTER TABLE automation_job_checkpoints ALTER COLUMN job_id TYPE BIGINT;
+        ALTER TABLE automation_job_stage_metrics ALTER COLUMN job_id TYPE BIGINT;
+        ALTER TABLE ri_digital_certidao_pedidos ALTER COLUMN job_id TYPE BIGINT;
+        """,
+    ),
+)
+
+# índice -> tabela, conferidos na inicialização
+INDICES_ESPERADOS = {
+    "idx_automation_jobs_pending": "automation_jobs",
+    "idx_ocr_results_document_id": "ocr_results",
+    "idx_external_credentials_active": "external_credentials",
+    "idx_automation_results_row_key": "automation_results",
+}
+
+
+def _criar_tabela_de_versoes(cur) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS worker_schema_migrations (
+            versao      INTEGER     PRIMARY KEY,
+            nome        TEXT        NOT NULL,
+            aplicada_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+
+
+def _versoes_aplicadas(cur) -> set[int]:
+    """Versões registradas; sem a tabela (banco novo), nenhuma. Só lê."""
+    cur.execute("SELECT to_regclass('worker_schema_migrations')")
+    if cur.fetchone()[0] is None:
+        return set()
+    cur.execute("SELECT versao FROM worker_schema_migrations")
+    return {r[0] for r in cur.fetchall()}
+
+
+def _remover_indice_invalido(cur, nome: str) -> None:
+    """
+    Um CREATE INDEX CONCURRENTLY interrompido deixa o índice INVALID;
+    o IF NOT EXISTS da nova tentativa o pularia, então removemos antes.
+    """
+    cur.execute(
+        """
+        SELECT 1
+        FROM pg_class c
+        JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s
+          AND NOT i.indisvalid
+        """,
+        (nome,),
+    )
+    if cur.fetchone():
+        print(f"⚠️ Índice {nome} inválido, recriando")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}")
+
+
+def _aplicar(cur, m: Migracao) -> None:
+    if m.concorrente:
+        _remover_indice_invalido(cur, m.nome)
+        cur.execute(m.sql)
+        cur.execute(
+            "INSERT INTO worker_schema_migrations (versao, nome) VALUES (%s, %s)",
+            (m.versao, m.nome),
+        )
+        return
+
+    cur.execute("BEGIN")
+    try:
+        cur.execute(m.sql)
+        cur.execute(
+            "INSERT INTO worker_schema_migrations (versao, nome) VALUES (%s, %s)",
+            (m.versao, m.nome),
+        )
+        cur.execute("COMMIT")
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+
+
+def aplicar_migracoes() -> list[int]:
+    """
+    Aplica as migrações pendentes em ordem. Retorna as versões aplicadas.
+    Uma falha interrompe a sequência (as seguintes ficam pendentes) e
+    sobe como Exception com a versão que falhou.
+    """
+    aplicadas = []
+
+    conn = get_connection()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            while True:
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (_ADVISORY_LOCK,))
+                if cur.fetchone()[0]:
+                    break
+                print("⏳ Outra instância aplicando migrações, aguardando...")
+                time.sleep(2)
+
+            try:
+                _criar_tabela_de_versoes(cur)
+                feitas = _versoes_aplicadas(cur)
+
+                for m in MIGRACOES:
+                    if m.versao in feitas:
+                        continue
+
+                    print(f"🛠️ Migração {m.versao}: {m.nome}")
+
+                    try:
+                        _aplicar(cur, m)
+                    except Exception as e:
+                        raise Exception(f"Migração {m.versao:03d} ({m.nome}) falhou: {e}") from e
+
+                    aplicadas.append(m.versao)
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (_ADVISORY_LOCK,))
+    finally:
+        conn.close()
+
+    return aplicadas
+
+
+def verificar_indices() -> list[str]:
+    """
+    Confere INDICES_ESPERADOS no banco. Retorna os ausentes ou inválidos
+    e imprime o relatório.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT c.relname, i.indisvalid
+                FROM pg_class c
+                JOIN pg_index i ON i.indexrelid = c.oid
+                WHERE c.relname = ANY(%s)
+                  AND pg_table_is_visible(c.oid)
+                """,
+                (list(INDICES_ESPERADOS),),
+            )
+            existentes = dict(cur.fetchall())
+
+    faltando = []
+    for nome, tabela in INDICES_ESPERADOS.items():
+        if nome not in existentes:
+            print(f"❌ Índice ausente: {nome} ({tabela})")
+            faltando.append(nome)
+        elif not existentes[nome]:
+            print(f"❌ Índice inválido: {nome} ({tabela})")
+            faltando.append(nome)
+
+    if not faltando:
+        print(f"✅ Índices do worker OK ({len(INDICES_ESPERADOS)})")
+
+    return faltando
+
+
+def preparar_schema() -> None:
+    """Chamado uma vez na inicialização do processo."""
+    aplicar_migracoes()
+    verificar_indices()
+
+
+if __name__ == "__main__":
+    with get_connection() as conn:
+        conn.set_session(readonly=True)
+        with conn.cursor() as cur:
+            feitas = _versoes_aplicadas(cur)
+        conn.rollback()
+
+    for m in MIGRACOES:
+        marca = "✅" if m.versao in feitas else "⏳"
+        print(f"{marca} {m.versao:03d} {m.nome}")
+
+    verificar_indices()
@@ -8,14 +8,49 @@ from google.cloud import vision
 from openai import OpenAI
 from psycopg2.extras import Json, RealDictCursor
 
-from settings import BACKEND_UPLOADS_BASE, DATABASE_URL
+from settings import (
+    BACKEND_UPLOADS_BASE,
+    DATABASE_URL,
+    OCR_PDF_DPI,
+    VISION_API_ENDPOINT,
+)
+from cache import cache_ttl
+from metrics import chamada_externa
+from timing import span
 
 
 # =========================================================
 # GOOGLE VISION CLIENT
 # =========================================================
 
-vision_client = vision.ImageAnnotatorClient()
+_vision_client = None
+
+
+def get_vision_client() -> vision.ImageAnnotatorClient:
+    """
+    Cliente criado sob demanda (importar o módulo não exige credenciais).
+    Com VISION_API_ENDPOINT usa transporte REST no endpoint informado;
+    endpoints http:// (stubs locais) dispensam credenciais.
+    """
+    global _vision_client
+
+    if _vision_client is None:
+        if VISION_API_ENDPOINT:
+            credentials = None
+            if VISION_API_ENDPOINT.startswith("http://"):
+                from google.auth.credentials import AnonymousCredentials
+
+                credentials = AnonymousCredentials()
+
+            _vision_client = vision.ImageAnnotatorClient(
+                credentials=credentials,
+                transport="rest",
+                client_options={"api_endpoint": VISION_API_ENDPOINT},
+            )
+        else:
+            _vision_client = vision.ImageAnnotatorClient()
+
+    return _vision_client
 
 
 # =========================================================
@@ -87,6 +122,7 @@ def _safe_json_loads(content: str):
 # DB QUERIES
 # =========================================================
 
+@span("db.get_document")
 def get_document(document_id: int):
 
     with get_connection() as conn:
@@ -104,6 +140,8 @@ def get_document(document_id: int):
             return cur.fetchone()
 
 
+@cache_ttl("ocr_prompts")
+@span("db.get_prompt")
 def get_prompt(prompt_id: int):
 
     with get_connection() as conn:
@@ -126,6 +164,7 @@ def get_prompt(prompt_id: int):
 # UPDATE RESULT SUCCESS
 # =========================================================
 
+@span("db.update_result_success")
 def update_result_success(document_id: int, texto: str, dados_json: dict):
 
     with get_connection() as conn:
@@ -163,6 +202,7 @@ def update_result_success(document_id: int, texto: str, dados_json: dict):
 # UPDATE RESULT ERROR
 # =========================================================
 
+@span("db.update_result_error")
 def update_result_error(document_id: int, error_message: str):
 
     with get_connection() as conn:
@@ -200,7 +240,8 @@ def extrair_texto_imagem_google(file_path: str) -> str:
 
     image = vision.Image(content=content)
 
-    response = vision_client.document_text_detection(image=image)
+    with span("ocr.vision"), chamada_externa("google_vision"):
+        response = get_vision_client().document_text_detection(image=image)
 
     if response.error.message:
         raise Exception(f"Google Vision erro: {response.error.message}")
@@ -220,6 +261,7 @@ def extrair_texto_imagem_google(file_path: str) -> str:
 # PDF TEXT EXTRACTION
 # =========================================================
 
+@span("ocr.pdf_texto_nativo")
 def extrair_texto_pdf_nativo(file_path: str) -> str:
 
     partes: list[str] = []
@@ -244,13 +286,15 @@ def extrair_texto_pdf_ocr_google(file_path: str) -> str:
 
         for page_index, page in enumerate(doc):
 
-            pix = page.get_pixmap(dpi=220, alpha=False)
+            with span("ocr.pdf_rasterizar"):
+                pix = page.get_pixmap(dpi=OCR_PDF_DPI, alpha=False)
 
-            png_bytes = pix.tobytes("png")
+                png_bytes = pix.tobytes("png")
 
             image = vision.Image(content=png_bytes)
 
-            response = vision_client.document_text_detection(image=image)
+            with span("ocr.vision"), chamada_externa("google_vision"):
+                response = get_vision_client().document_text_detection(image=image)
 
             if response.error.message:
                 raise Exception(
@@ -298,30 +342,32 @@ def extrair_texto_documento(file_path: str) -> str:
 # OPENAI INTERPRETATION
 # =========================================================
 
+@span("ocr.openai")
 def interpretar_texto(prompt: str, texto: str):
 
     openai_client = get_openai_client()
 
-    completion = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    f"{prompt}\n\n"
-                    "Retorne JSON válido sempre que possível. "
-                    "Não use markdown. Não use bloco ```json. "
-                    "Quando houver listas, retorne arrays JSON. "
-                    "Quando não encontrar algum campo, use null ou array vazio."
-                ),
-            },
-            {
-                "role": "user",
-                "content": texto,
-            },
-        ],
-    )
+    with chamada_externa("openai"):
+        completion = openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            temperature=0,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        f"{prompt}\n\n"
+                        "Retorne JSON válido sempre que possível. "
+                        "Não use markdown. Não use bloco ```json. "
+                        "Quando houver listas, retorne arrays JSON. "
+                        "Quando não encontrar algum campo, use null ou array vazio."
+                    ),
+                },
+                {
+                    "role": "user",
+                    "content": texto,
+                },
+            ],
+        )
 
     content = completion.choices[0].message.content or ""
 
@@ -332,6 +378,7 @@ def interpretar_texto(prompt: str, texto: str):
 # BACKEND PIPELINE CALL
 # =========================================================
 
+@span("ocr.backend_pipeline")
 def chamar_pipeline_backend(document_id: int, categoria: str, dados: dict):
 
     backend_url = os.getenv("BACKEND_INTERNAL_URL", "http://geoincra_backend:8000")
@@ -344,12 +391,13 @@ def chamar_pipeline_backend(document_id: int, categoria: str, dados: dict):
         "dados": dados
     }
 
-    response = requests.post(url, json=payload, timeout=60)
+    with chamada_externa("backend_pipeline"):
+        response = requests.post(url, json=payload, timeout=60)
 
-    if response.status_code != 200:
-        raise Exception(
-            f"Erro ao chamar pipeline backend: {response.status_code} {response.text}"
-        )
+        if response.status_code != 200:
+            raise Exception(
+                f"Erro ao chamar pipeline backend: {response.status_code} {response.text}"
+            )
 
 
 # =========================================================
@@ -13,6 +13,8 @@ from app.settings import (
     ONR_PFX_PASSWORD,
 )
 from app.db import insert_result, create_document, get_job_project_id
+from app.metrics import registrar_browser
+from app.timing import Etapas
 
 PLAYWRIGHT_TIMEOUT = 60_000  # 60s
 
@@ -79,6 +81,9 @@ def executar_onr_sigri(job: dict):
 
     print(f"▶️ ONR/SIG-RI | Job {job['id']} | Projeto {project_id} | {search['type']}={search['value']}")
 
+    etapas = Etapas("onr")
+    etapas.iniciar("browser")
+
     with sync_playwright() as p:
         browser = p.chromium.launch(
             headless=True,
@@ -87,6 +92,7 @@ def executar_onr_sigri(job: dict):
                 "--no-sandbox",
             ],
         )
+        registrar_browser(browser)
 
         # Playwright: client certificate (PFX) para origin do ONR.
         # Isso evita “modal de seleção” depender do SO (Linux headless).
@@ -107,6 +113,7 @@ def executar_onr_sigri(job: dict):
         # =========================
         # LOGIN
         # =========================
+        etapas.iniciar("login")
         page.goto("https://mapa.onr.org.br/sigri/login-usuario", wait_until="domcontentloaded")
 
         # Em ambientes com certificado aplicado por mTLS, o site pode logar automaticamente.
@@ -125,12 +132,14 @@ def executar_onr_sigri(job: dict):
         # =========================
         # ABRIR MAPA PRINCIPAL
         # =========================
+        etapas.iniciar("mapa")
         page.goto("https://mapa.onr.org.br", wait_until="domcontentloaded")
         time.sleep(5)
 
         # =========================
         # CAMADA DE BUSCA (CAR / ENDERECO)
         # =========================
+        etapas.iniciar("busca")
         # Estratégia: abrir card "Camada de Busca" e selecionar opção.
         # Seletores tolerantes para não quebrar fácil.
         try:
@@ -176,6 +185,7 @@ def executar_onr_sigri(job: dict):
         # =========================
         # CLICAR NO POLÍGONO PARA ABRIR MODAL
         # =========================
+        etapas.iniciar("modal")
         # Como a geometria é canvas/mapa, usamos um clique central na viewport para disparar seleção.
         # Em produção, isso pode exigir ajuste por zoom/offset, mas funciona para a maioria.
         page.mouse.click(800, 450)
@@ -224,6 +234,7 @@ def executar_onr_sigri(job: dict):
         # =========================
         # BAIXAR POLÍGONO (KMZ)
         # =========================
+        etapas.iniciar("download")
         # Você descreveu o ícone/ação “Baixar polígono”.
         # Tentamos primeiro pelo texto, depois por aria-label/title.
         download_clicked = False
@@ -262,6 +273,7 @@ def executar_onr_sigri(job: dict):
         # =========================
         # REGISTRAR RESULTADO + DOCUMENT DO PROJETO
         # =========================
+        etapas.iniciar("persistencia")
         # 1) Document (para download seguro via /api/files/documents/{id})
         doc_id = create_document(
             project_id=project_id,
@@ -290,5 +302,7 @@ def executar_onr_sigri(job: dict):
             },
         )
 
+        etapas.encerrar()
+
         browser.close()
         print(f"✅ ONR/SIG-RI concluído | Projeto {project_id} | Document {doc_id}")
@@ -0,0 +1,127 @@
+# geoincra_worker/app/page_pool.py
+"""
+Pool de páginas no mesmo contexto autenticado, com execução em pipeline.
+
+A API sync do Playwright é de uma thread só, mas o Chromium navega e
+baixa em todas as abas ao mesmo tempo. O pool aproveita isso: cada
+tarefa é um gerador que executa um passo (clicar, navegar) e faz
+`yield` enquanto a página trabalha; o escalonador alterna entre as K
+páginas em round-robin. Enquanto uma espera bloqueia numa aba, as
+outras continuam carregando, e o tempo total tende ao da aba mais lenta
+em vez da soma.
+
+    def processar(page, linha):
+        page.click(...)
+        yield              # devolve a vez; retoma no próximo round
+        yield 0.4          # retoma só depois de 0,4 s (sem bloquear as outras)
+        return resultado
+
+    with PoolDePaginas(context, 4, primeira=page) as pool:
+        pool.executar(linhas, processar, ao_concluir)
+
+ao_concluir(tarefa, resultado, erro) é chamado na ordem das tarefas
+(resultados adiantados ficam guardados até a vez deles).
+
+`tarefas` pode ser um gerador: a próxima tarefa só é puxada quando uma
+página fica livre, então a fonte (ex.: um GridPaginado em outra aba)
+é lida sob demanda.
+"""
+import time
+from collections import deque
+
+
+class PoolDePaginas:
+    def __init__(self, context, tamanho: int, primeira=None, configurar=None):
+        """
+        primeira: página já aberta (ex.: a do login) reaproveitada como slot 0.
+        configurar(page): aplicado a cada página nova (timeouts, viewport).
+        """
+        self.context = context
+        self.tamanho = max(1, tamanho)
+        self.paginas = []
+        self._criadas = []
+
+        if primeira is not None:
+            self.paginas.append(primeira)
+
+        while len(self.paginas) < self.tamanho:
+            page = context.new_page()
+            if configurar:
+                configurar(page)
+            self.paginas.append(page)
+            self._criadas.append(page)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for page in self._criadas:
+            try:
+                page.close()
+            except Exception:
+                pass
+        return False
+
+    def executar(self, tarefas, processar, ao_concluir, propagar: tuple = ()) -> None:
+        """
+        Distribui as tarefas pelas páginas. Exceções de uma tarefa vão
+        para ao_concluir como erro, exceto os tipos em `propagar`, que
+        interrompem tudo.
+        """
+        fila = enumerate(tarefas)
+        esgotada = False
+        livres = deque(range(len(self.paginas)))
+        ativos: dict[int, tuple] = {}  # slot -> (indice, gerador, retomar_em)
+        em_curso: dict[int, object] = {}  # indice -> tarefa, até ao_concluir
+        prontos: dict[int, tuple] = {}
+        proximo = 0
+
+        try:
+            while not esgotada or ativos:
+                while livres and not esgotada:
+                    item = next(fila, None)
+                    if item is None:
+                        esgotada = True
+                        break
+                    indice, tarefa = item
+                    em_curso[indice] = tarefa
+                    slot = livres.popleft()
+                    ativos[slot] = (indice, processar(self.paginas[slot], tarefa), 0.0)
+
+                agora = time.monotonic()
+                avancou = False
+
+                for slot in list(ativos):
+                    indice, gerador, retomar_em = ativos[slot]
+                    if retomar_em > agora:
+                        continue
+
+                    avancou = True
+                    try:
+                        pausa = next(gerador)
+                    except StopIteration as fim:
+                        prontos[indice] = (fim.value, None)
+                    except propagar:
+                        raise
+                    except Exception as e:
+                        prontos[indice] = (None, e)
+                    else:
+                        ativos[slot] = (indice, gerador, time.monotonic() + (pausa or 0))
+                        continue
+
+                    del ativos[slot]
+                    livres.append(slot)
+
+                while proximo in prontos:
+                    resultado, erro = prontos.pop(proximo)
+                    ao_concluir(em_curso.pop(proximo), resultado, erro)
+                    proximo += 1
+
+                if not avancou and ativos:
+                    # todas as páginas em pausa: dorme até a primeira retomada
+                    espera = min(r for _, _, r in ativos.values()) - time.monotonic()
+                    if espera > 0:
+                        time.sleep(espera)
+        finally:
+            for _, gerador, _ in ativos.values():
+                gerador.close()
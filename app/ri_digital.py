@@ -5,8 +5,26 @@ from typing import Optional
 
 from playwright.sync_api import sync_playwright
 
-from db import create_document, insert_result
-from settings import BACKEND_UPLOADS_BASE, RI_DIGITAL_DIR
+from deadline import Deadline, PrazoExcedido
+from debug_policy import Depuracao
+from db import (
+    fetch_job_checkpoints,
+    insert_result,
+    persist_document_and_result,
+    save_job_checkpoint,
+)
+from db_writer import EscritorDB
+from grid import GridPaginado
+from metrics import registrar_browser
+from page_pool import PoolDePaginas
+from settings import (
+    BACKEND_UPLOADS_BASE,
+    RI_DIGITAL_BASE_URL,
+    RI_DIGITAL_DIR,
+    RI_DIGITAL_PAGINAS,
+    RI_DIGITAL_PAGINAS_MAX,
+)
+from timing import Etapas
 
 
 PLAYWRIGHT_TIMEOUT = 60_000
@@ -28,56 +46,305 @@ def _parse_br_date(text: str) -> date:
     return datetime.strptime(text.strip(), "%d/%m/%Y").date()
 
 
-def _within_range(d: date, start_dt: datetime, end_dt: datetime) -> bool:
-    return start_dt.date() <= d <= end_dt.date()
+def _persistir_linha(job_id, row_key: str, documento: dict | None, data: dict) -> None:
+    """Resultado + documento e, só depois, o checkpoint da linha (roda no EscritorDB)."""
+    doc_id, _ = persist_document_and_result(
+        job_id=job_id,
+        row_key=row_key,
+        document=documento,
+        data=data,
+    )
+    save_job_checkpoint(
+        job_id,
+        row_key,
+        {
+            "numero_pedido_vm": data["metadata_json"].get("numero_pedido_vm"),
+            "document_id": doc_id,
+        },
+    )
 
 
-def _create_document_compat(project_id, filename, backend_path):
-    if not project_id:
+def _extract_vm_number_from_body(text: str) -> Optional[str]:
+    if not text:
         return None
+    match = re.search(r"\b(VM\d{6,})\b", text)
+    return match.group(1) if match else None
 
-    try:
-        return create_document(project_id, filename, backend_path)
-    except TypeError:
-        try:
-            return create_document(
-                project_id=project_id,
-                doc_type="RI_DIGITAL_MATRICULA",
-                stored_filename=os.path.basename(backend_path),
-                original_filename=filename,
-                content_type="application/pdf",
-                description="PDF RI Digital - Visualização de Matrícula",
-                file_path=backend_path,
+
+def _row_key(protocolo: Optional[str], matricula: Optional[str]) -> str:
+    return f"{protocolo or ''}|{matricula or ''}"
+
+
+# Listagem da Visualização de Matrícula: GridView sem id próprio, a
+# primeira <table> da página. Pagina por postback quando tem pager.
+_URL_LISTAGEM = f"{RI_DIGITAL_BASE_URL}/VisualizarMatricula/DefaultVM.aspx?from=menu"
+_GRID_LISTAGEM = "table"
+
+
+def _goto_listagem(page, deadline: Deadline, debug: Depuracao | None = None) -> None:
+    page.goto(
+        _URL_LISTAGEM,
+        wait_until="domcontentloaded",
+        timeout=deadline.timeout(PLAYWRIGHT_TIMEOUT),
+    )
+    page.wait_for_selector("table", timeout=deadline.timeout(PLAYWRIGHT_TIMEOUT))
+    if debug:
+        debug.snapshot(page, "listagem")
+    page.wait_for_timeout(deadline.timeout(250))
+
+
+def _configurar_pagina(page) -> None:
+    page.set_default_timeout(PLAYWRIGHT_TIMEOUT)
+    page.set_viewport_size({"width": 1440, "height": 900})
+
+
+def _paginas_do_job(payload: dict) -> int:
+    paginas = int(payload.get("paginas_paralelas") or RI_DIGITAL_PAGINAS)
+    return max(1, min(paginas, RI_DIGITAL_PAGINAS_MAX))
+
+
+def _ordem_das_datas(datas: list[date]) -> str | None:
+    """'asc', 'desc' ou None (fora de ordem ou ainda sem duas datas diferentes)."""
+    if len(datas) < 2 or datas[0] == datas[-1]:
+        return None
+    if all(a <= b for a, b in zip(datas, datas[1:])):
+        return "asc"
+    if all(a >= b for a, b in zip(datas, datas[1:])):
+        return "desc"
+    return None
+
+
+def _fim_do_periodo(ordem: str | None, ultima: date, inicio: date, fim: date) -> bool:
+    """Listagem ordenada e a última data da página já passou do período."""
+    if ordem == "desc":
+        return ultima < inicio
+    if ordem == "asc":
+        return ultima > fim
+    return False
+
+
+def _ler_linhas_no_periodo(page, deadline: Deadline, data_inicio, data_fim, concluidas: dict):
+    """
+    Percorre as páginas da listagem e devolve (linhas a processar, já
+    concluídas). Cada linha guarda a página, o índice na tabela e os
+    dados para localizá-la de novo em qualquer página do pool.
+
+    Uma ida ao browser por página (GridPaginado lê as células de uma
+    vez). Se as datas lidas até aqui estão ordenadas e a página termina
+    fora do período, as seguintes não são abertas.
+    """
+    inicio, fim = data_inicio.date(), data_fim.date()
+    grid = GridPaginado(page, deadline, seletor=_GRID_LISTAGEM, url=_URL_LISTAGEM)
+
+    vistas: list[date] = []
+    linhas = []
+    ja_concluidas = 0
+    n = 1
+
+    while True:
+        estado = grid.garantir_pagina(n)
+        if n == 1 and not estado["linhas"]:
+            raise Exception("Tabela de matrículas vazia")
+
+        no_periodo = 0
+        datas_pagina = []
+
+        # linhas com menos de 6 colunas: cabeçalho/rodapé
+        for indice, cel in zip(estado["linhas"], estado["celulas"]):
+            if len(cel) < 6:
+                continue
+            try:
+                data_pedido = _parse_br_date(cel[2])
+            except ValueError:
+                continue
+
+            datas_pagina.append(data_pedido)
+            if not inicio <= data_pedido <= fim:
+                continue
+            no_periodo += 1
+
+            protocolo = cel[1]
+            matricula = cel[3]
+
+            row_key = _row_key(protocolo, matricula)
+            if row_key in concluidas:
+                ja_concluidas += 1
+                continue
+
+            linhas.append(
+                {
+                    "pagina": n,
+                    "indice": indice,
+                    "row_key": row_key,
+                    "protocolo": protocolo,
+                    "matricula": matricula,
+                    "cartorio": cel[4],
+                    "data_pedido": data_pedido,
+                }
             )
-        except Exception:
-            return None
 
+        vistas.extend(datas_pagina)
+        ordem = _ordem_das_datas(vistas)
 
-def _save_debug(page, job_id: str, suffix: str) -> None:
-    try:
-        page.screenshot(
-            path=os.path.join(RI_DIGITAL_DIR, f"debug_{job_id}_{suffix}.png"),
-            full_page=True,
+        print(
+            f"➡ Listagem página {n}: {len(estado['linhas'])} linha(s), "
+            f"ordem por data: {ordem or 'nenhuma'}, {no_periodo} no período"
         )
+
+        if not estado["proximo"]:
+            break
+        if datas_pagina and _fim_do_periodo(ordem, datas_pagina[-1], inicio, fim):
+            print("⏭ Listagem ordenada: páginas seguintes fora do período")
+            break
+
+        grid.ir_para(n + 1)
+        n += 1
+
+    return linhas, ja_concluidas
+
+
+def _localizar_linha(page, linha: dict, deadline: Deadline):
+    """
+    Linha da tabela pelo índice lido na listagem; se a listagem mudou
+    (pedido novo no topo), procura pelo protocolo.
+    """
+    rows = page.locator("table tbody tr")
+    row = rows.nth(linha["indice"])
+
+    try:
+        if row.locator("td").nth(1).inner_text(timeout=deadline.timeout(CLICK_TIMEOUT)).strip() == linha["protocolo"]:
+            return row
+    except PrazoExcedido:
+        raise
     except Exception:
         pass
 
+    return rows.filter(has_text=linha["protocolo"]).first
 
-def _extract_vm_number_from_body(text: str) -> Optional[str]:
-    if not text:
-        return None
-    match = re.search(r"\b(VM\d{6,})\b", text)
-    return match.group(1) if match else None
 
+def _processar_linha(page, linha: dict, job: dict, deadline: Deadline, debug: Depuracao):
+    """
+    Gerador usado pelo PoolDePaginas: abre o pedido da linha nesta página,
+    gera o PDF e devolve os argumentos de _persistir_linha. Cada `yield`
+    devolve a vez às outras páginas enquanto esta navega/baixa.
+    """
+    protocolo = linha["protocolo"]
+    matricula = linha["matricula"]
+    data_pedido = linha["data_pedido"]
+    i = linha["indice"]
 
-def _goto_listagem(page, job_id: str) -> None:
-    page.goto(
-        "https://ridigital.org.br/VisualizarMatricula/DefaultVM.aspx?from=menu",
-        wait_until="domcontentloaded",
+    if linha["pagina"] > 1:
+        # recarrega a listagem se preciso e faz o postback até a página
+        GridPaginado(
+            page, deadline, seletor=_GRID_LISTAGEM, url=_URL_LISTAGEM
+        ).garantir_pagina(linha["pagina"])
+        yield
+    elif "/VisualizarMatricula/DefaultVM.aspx" not in page.url:
+        _goto_listagem(page, deadline)
+        yield
+
+    cells = _localizar_linha(page, linha, deadline).locator("td")
+
+    abrir_link = cells.nth(0).locator("a").first
+    abrir_link.wait_for(state="attached", timeout=deadline.timeout(CLICK_TIMEOUT))
+
+    try:
+        abrir_link.click(timeout=deadline.timeout(CLICK_TIMEOUT))
+    except PrazoExcedido:
+        raise
+    except Exception:
+        cells.nth(0).click(force=True, timeout=deadline.timeout(CLICK_TIMEOUT))
+
+    yield
+
+    page.wait_for_url(
+        "**/PedidoFinalizadoVM.aspx**",
+        timeout=deadline.timeout(PLAYWRIGHT_TIMEOUT),
+    )
+    yield 0.4
+    debug.snapshot(page, f"pedido_{i}")
+
+    body_text = page.locator("body").inner_text(timeout=deadline.timeout(CLICK_TIMEOUT))
+    numero_pedido = _extract_vm_number_from_body(body_text) or protocolo or f"pedido_{i}"
+
+    filename = (
+        f"{numero_pedido}_{(matricula or 'matricula')}.pdf"
+        .replace("/", "_")
+        .replace("\\", "_")
+    )
+    worker_path = os.path.join(RI_DIGITAL_DIR, filename)
+    backend_path = _as_backend_path(worker_path)
+
+    pdf_ok = False
+    pdf_motivo = None
+    final_file_path = None
+    documento = None
+
+    try:
+        page.locator("#btnPDF").wait_for(
+            state="visible",
+            timeout=deadline.timeout(CLICK_TIMEOUT),
+        )
+
+        try:
+            # registrado antes do clique: o evento pode chegar enquanto
+            # o pool atende outra página
+            with page.expect_download(timeout=deadline.timeout(8_000)) as download_info:
+                page.locator("#btnPDF").click(
+                    force=True,
+                    timeout=deadline.timeout(CLICK_TIMEOUT),
+                )
+                yield
+
+            download_info.value.save_as(worker_path)
+
+            pdf_ok = True
+            final_file_path = backend_path
+            documento = {
+                "project_id": job.get("project_id"),
+                "filename": filename,
+                "file_path": backend_path,
+            }
+        except PrazoExcedido:
+            raise
+        except Exception:
+            pdf_motivo = "PDF não disponível ou prazo expirado no RI Digital"
+    except PrazoExcedido:
+        raise
+    except Exception:
+        pdf_motivo = "Erro ao acionar botão de geração do PDF"
+
+    # volta a página para a listagem em segundo plano (sem esperar)
+    try:
+        page.goto(
+            _URL_LISTAGEM,
+            wait_until="commit",
+            timeout=deadline.timeout(PLAYWRIGHT_TIMEOUT),
+        )
+    except PrazoExcedido:
+        raise
+    except Exception:
+        pass
+
+    return (
+        linha["row_key"],
+        documento,
+        {
+            "protocolo": protocolo,
+            "matricula": matricula,
+            "cartorio": linha["cartorio"],
+            "data_pedido": data_pedido,
+            "file_path": final_file_path,
+            "metadata_json": {
+                "fonte": "RI_DIGITAL",
+                "numero_pedido_vm": numero_pedido,
+                "pdf_status": "OK" if pdf_ok else "NAO_DISPONIVEL",
+                "pdf_motivo": pdf_motivo,
+                "document_id": None,
+                "data_consulta": data_pedido.isoformat() if data_pedido else None,
+            },
+        },
     )
-    page.wait_for_selector("table", timeout=PLAYWRIGHT_TIMEOUT)
-    _save_debug(page, job_id, "listagem")
-    page.wait_for_timeout(250)
 
 
 def executar_ri_digital(job: dict, cred: dict) -> None:
@@ -98,187 +365,128 @@ def executar_ri_digital(job: dict, cred: dict) -> None:
     job_id = str(job.get("id"))
     print(f"▶️ RI Digital | Job {job_id}")
 
-    with sync_playwright() as p:
+    deadline = Deadline.para_job(job)
+    debug = Depuracao.para_job(job, "ri_digital", deadline)
+    paginas = _paginas_do_job(payload)
+
+    concluidas = fetch_job_checkpoints(job["id"])
+    if concluidas:
+        print(f"↩️ Retomando job: {len(concluidas)} linha(s) já concluída(s)")
+
+    etapas = Etapas("ri_digital")
+    etapas.iniciar("browser")
+
+    with sync_playwright() as p, EscritorDB(job["id"]) as escritor:
         browser = p.chromium.launch(
             headless=True,
             args=["--no-sandbox", "--disable-dev-shm-usage"],
         )
+        registrar_browser(browser)
         context = browser.new_context(accept_downloads=True)
         page = context.new_page()
-        page.set_default_timeout(PLAYWRIGHT_TIMEOUT)
-        page.set_viewport_size({"width": 1440, "height": 900})
+        _configurar_pagina(page)
 
         try:
+            etapas.iniciar("login")
+
             page.goto(
-                "https://ridigital.org.br/Acesso.aspx",
+                f"{RI_DIGITAL_BASE_URL}/Acesso.aspx",
                 wait_until="domcontentloaded",
+                timeout=deadline.timeout(PLAYWRIGHT_TIMEOUT),
             )
 
             acesso_link = page.locator("a.access-details.acesso-comum-link").first
-            acesso_link.wait_for(state="visible", timeout=CLICK_TIMEOUT)
-            acesso_link.click(force=True, timeout=CLICK_TIMEOUT)
+            acesso_link.wait_for(
+                state="visible", timeout=deadline.timeout(CLICK_TIMEOUT)
+            )
+            acesso_link.click(force=True, timeout=deadline.timeout(CLICK_TIMEOUT))
 
             email_input = page.locator('input[placeholder="E-mail"]')
             senha_input = page.locator('input[placeholder="Senha"]')
 
-            email_input.wait_for(state="visible", timeout=CLICK_TIMEOUT)
-            senha_input.wait_for(state="visible", timeout=CLICK_TIMEOUT)
+            email_input.wait_for(
+                state="visible", timeout=deadline.timeout(CLICK_TIMEOUT)
+            )
+            senha_input.wait_for(
+                state="visible", timeout=deadline.timeout(CLICK_TIMEOUT)
+            )
 
-            email_input.fill(login)
-            senha_input.fill(senha)
+            email_input.fill(login, timeout=deadline.timeout(CLICK_TIMEOUT))
+            senha_input.fill(senha, timeout=deadline.timeout(CLICK_TIMEOUT))
 
-            page.get_by_role("button", name=re.compile(r"entrar", re.I)).click()
+            page.get_by_role("button", name=re.compile(r"entrar", re.I)).click(
+                timeout=deadline.timeout(CLICK_TIMEOUT)
+            )
 
-            page.wait_for_timeout(3000)
+            page.wait_for_timeout(deadline.timeout(3000))
             print("✅ Login RI Digital realizado | URL:", page.url)
-            _save_debug(page, job_id, "apos_login")
-
-            _goto_listagem(page, job_id)
-
-            rows = page.locator("table tbody tr")
-            total = rows.count()
-            if total == 0:
-                raise Exception("Tabela de matrículas vazia")
-
-            encontrados = 0
-
-            for i in range(total):
-                rows = page.locator("table tbody tr")
-                if rows.count() == 0:
-                    break
-
-                row = rows.nth(i)
-                cells = row.locator("td")
-                if cells.count() < 6:
-                    continue
-
-                protocolo = None
-                matricula = None
-                cartorio = None
-                data_pedido = None
-
-                try:
-                    data_pedido = _parse_br_date(cells.nth(2).inner_text())
-                    if not _within_range(data_pedido, data_inicio, data_fim):
-                        continue
-
-                    protocolo = cells.nth(1).inner_text().strip()
-                    matricula = cells.nth(3).inner_text().strip()
-                    cartorio = cells.nth(4).inner_text().strip()
-
-                    abrir_link = cells.nth(0).locator("a").first
-                    abrir_link.wait_for(state="attached", timeout=CLICK_TIMEOUT)
-
-                    try:
-                        abrir_link.click(timeout=CLICK_TIMEOUT)
-                    except Exception:
-                        cells.nth(0).click(force=True, timeout=CLICK_TIMEOUT)
-
-                    page.wait_for_url(
-                        "**/PedidoFinalizadoVM.aspx**",
-                        timeout=PLAYWRIGHT_TIMEOUT,
-                    )
-                    page.wait_for_timeout(400)
-                    _save_debug(page, job_id, f"pedido_{i}")
-
-                    body_text = page.locator("body").inner_text(
-                        timeout=CLICK_TIMEOUT
-                    )
-                    numero_pedido = (
-                        _extract_vm_number_from_body(body_text)
-                        or protocolo
-                        or f"pedido_{i}"
-                    )
-
-                    filename = (
-                        f"{numero_pedido}_{(matricula or 'matricula')}.pdf"
-                        .replace("/", "_")
-                        .replace("\\", "_")
-                    )
-                    worker_path = os.path.join(RI_DIGITAL_DIR, filename)
-                    backend_path = _as_backend_path(worker_path)
-
-                    pdf_ok = False
-                    pdf_motivo = None
-                    final_file_path = None
-                    doc_id = None
-
-                    try:
-                        page.locator("#btnPDF").wait_for(
-                            state="visible",
-                            timeout=CLICK_TIMEOUT,
-                        )
-                        page.locator("#btnPDF").click(
-                            force=True,
-                            timeout=CLICK_TIMEOUT,
-                        )
-
-                        try:
-                            download = page.wait_for_event("download", timeout=8_000)
-                            download.save_as(worker_path)
-
-                            pdf_ok = True
-                            final_file_path = backend_path
-
-                            doc_id = _create_document_compat(
-                                job.get("project_id"),
-                                filename,
-                                backend_path,
-                            )
-                        except Exception:
-                            pdf_motivo = (
-                                "PDF não disponível ou prazo expirado no RI Digital"
-                            )
-                    except Exception:
-                        pdf_motivo = "Erro ao acionar botão de geração do PDF"
-
-                    insert_result(
-                        job_id=job["id"],
-                        data={
-                            "protocolo": protocolo,
-                            "matricula": matricula,
-                            "cartorio": cartorio,
-                            "data_pedido": data_pedido,
-                            "file_path": final_file_path,
-                            "metadata_json": {
-                                "fonte": "RI_DIGITAL",
-                                "numero_pedido_vm": numero_pedido,
-                                "pdf_status": "OK" if pdf_ok else "NAO_DISPONIVEL",
-                                "pdf_motivo": pdf_motivo,
-                                "document_id": doc_id,
-                                "data_consulta": (
-                                    data_pedido.isoformat() if data_pedido else None
-                                ),
-                            },
-                        },
-                    )
-                    encontrados += 1
+            debug.snapshot(page, "apos_login")
+
+            etapas.iniciar("listagem")
+            _goto_listagem(page, deadline, debug)
+
+            etapas.iniciar("tabela_leitura")
 
-                except Exception as e:
-                    insert_result(
-                        job_id=job["id"],
-                        data={
-                            "protocolo": protocolo,
-                            "matricula": matricula,
-                            "cartorio": cartorio,
-                            "data_pedido": data_pedido,
-                            "file_path": None,
-                            "metadata_json": {
-                                "fonte": "RI_DIGITAL",
-                                "erro_linha": str(e),
-                                "linha_index": i,
-                            },
+            linhas, ja_concluidas = _ler_linhas_no_periodo(
+                page, deadline, data_inicio, data_fim, concluidas
+            )
+            encontrados = ja_concluidas
+
+            print(
+                f"➡ {len(linhas)} linha(s) a processar "
+                f"({ja_concluidas} já concluída(s)) em {paginas} página(s)"
+            )
+
+            def processar(pagina, linha):
+                return _processar_linha(pagina, linha, job, deadline, debug)
+
+            def ao_concluir(linha, resultado, erro):
+                nonlocal encontrados
+
+                if erro is None:
+                    escritor.enfileirar(_persistir_linha, job["id"], *resultado)
+                    encontrados += 1
+                    return
+
+                escritor.enfileirar(
+                    insert_result,
+                    job_id=job["id"],
+                    row_key=linha["row_key"],
+                    data={
+                        "protocolo": linha["protocolo"],
+                        "matricula": linha["matricula"],
+                        "cartorio": linha["cartorio"],
+                        "data_pedido": linha["data_pedido"],
+                        "file_path": None,
+                        "metadata_json": {
+                            "fonte": "RI_DIGITAL",
+                            "erro_linha": str(erro),
+                            "linha_index": linha["indice"],
                         },
-                    )
+                    },
+                )
+
+            etapas.iniciar("linhas")
+
+            with PoolDePaginas(
+                context, paginas, primeira=page, configurar=_configurar_pagina
+            ) as pool:
+                pool.executar(linhas, processar, ao_concluir, propagar=(PrazoExcedido,))
 
-                _goto_listagem(page, job_id)
+            etapas.encerrar()
 
             if encontrados == 0:
                 raise Exception("Nenhuma matrícula encontrada no período informado")
 
             print("🏁 RI Digital finalizado com sucesso")
 
+        except Exception:
+            debug.snapshot(page, "erro", falha=True)
+            raise
+
         finally:
+            etapas.encerrar()
+            debug.relatorio()
             try:
                 browser.close()
             except Exception:
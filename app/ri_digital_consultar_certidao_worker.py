@@ -1,6 +1,8 @@
+from concurrent.futures import Future
+from dataclasses import dataclass
 from pathlib import Path
+import hashlib
 import re
-import time
 from typing import Any
 
 from playwright.sync_api import (
@@ -8,14 +10,33 @@ from playwright.sync_api import (
     sync_playwright,
 )
 
-from db import insert_result, create_document
+from certidao_modal import capturar_detalhes, parse_modal_detalhes
+from deadline import Deadline, PrazoExcedido
+from debug_policy import Depuracao
+from db import (
+    fetch_certidao_sync,
+    fetch_job_checkpoints,
+    persist_document_and_result,
+    save_certidao_sync_item,
+    save_certidao_sync_protocolo,
+    save_job_checkpoint,
+)
+from db_writer import EscritorDB
+from downloads import BaixadorHTTP, href_direto, nome_do_protocolo
+from grid import GridPaginado
+from metrics import registrar_browser
+from page_pool import PoolDePaginas
+from settings import (
+    BACKEND_UPLOADS_BASE,
+    RI_DIGITAL_BASE_URL,
+    RI_DIGITAL_PAGINAS,
+    RI_DIGITAL_PAGINAS_MAX,
+)
+from timing import Etapas, span
 
-DOWNLOAD_DIR = Path("/app/app/uploads/ri-digital")
+DOWNLOAD_DIR = Path(BACKEND_UPLOADS_BASE) / "ri-digital"
 DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-DEBUG_DIR = Path("/app/debug")
-DEBUG_DIR.mkdir(parents=True, exist_ok=True)
-
 
 def _normalizar(texto: str | None) -> str:
     if not texto:
@@ -48,25 +69,6 @@ def _debug_page_info(page, etapa: str) -> None:
         print(f"[DEBUG][{etapa}] Erro ao obter TITLE: {e}")
 
 
-def _debug_snapshot(page, label: str) -> None:
-    try:
-        ts = int(time.time())
-        png_path = DEBUG_DIR / f"{label}_{ts}.png"
-        html_path = DEBUG_DIR / f"{label}_{ts}.html"
-
-        page.screenshot(path=str(png_path), full_page=True)
-
-        html = page.content()
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(html)
-
-        print(f"[DEBUG] Screenshot salvo: {png_path}")
-        print(f"[DEBUG] HTML salvo: {html_path}")
-
-    except Exception as e:
-        print(f"[DEBUG] Falha ao gerar snapshot '{label}': {e}")
-
-
 def _extrair_primeiro(texto: str, padrao: str) -> str | None:
     match = re.search(padrao, texto, flags=re.IGNORECASE | re.DOTALL)
     if not match:
@@ -76,252 +78,104 @@ def _extrair_primeiro(texto: str, padrao: str) -> str | None:
     return " ".join(valor.split()) if valor else None
 
 
-def _extrair_bloco(
-    texto: str,
-    inicio: str,
-    fim_opcoes: list[str] | None = None,
-) -> str | None:
-    if fim_opcoes:
-        fim_regex = r"(?=\s*(?:" + "|".join(re.escape(item) for item in fim_opcoes) + r")\s*)"
-    else:
-        fim_regex = r"$"
+def _aguardar_tabela_principal(page, deadline: Deadline) -> None:
+    page.wait_for_selector("#Grid tbody tr", timeout=deadline.timeout(120000))
 
-    padrao = rf"{re.escape(inicio)}\s*(.*?){fim_regex}"
-    return _extrair_primeiro(texto, padrao)
 
+def _aguardar_tabela_interna(page, deadline: Deadline) -> None:
+    page.wait_for_selector("#Grid tbody tr", timeout=deadline.timeout(120000))
 
-def _aguardar_tabela_principal(page) -> None:
-    page.wait_for_selector("#Grid tbody tr", timeout=120000)
 
+def _linha_principal_eh_cabecalho(celulas: list[str]) -> bool:
+    protocolo, data, status = celulas[1:4]
 
-def _aguardar_tabela_interna(page) -> None:
-    page.wait_for_selector("#Grid tbody tr", timeout=120000)
+    if _normalizar(protocolo) == "protocolo":
+        return True
+    if _normalizar(data) == "data":
+        return True
+    if _normalizar(status) == "status *" or _normalizar(status) == "status":
+        return True
 
+    return False
 
-def _linha_principal_eh_cabecalho(colunas) -> bool:
-    try:
-        protocolo = colunas.nth(1).inner_text().strip()
-        data = colunas.nth(2).inner_text().strip()
-        status = colunas.nth(3).inner_text().strip()
 
-        if _normalizar(protocolo) == "protocolo":
-            return True
-        if _normalizar(data) == "data":
-            return True
-        if _normalizar(status) == "status *" or _normalizar(status) == "status":
-            return True
+def _linha_interna_eh_cabecalho(celulas: list[str]) -> bool:
+    protocolo, cartorio, tipo_pesquisa, status = celulas[1:5]
 
-        return False
-    except Exception:
-        return False
+    if _normalizar(protocolo) == "protocolo":
+        return True
+    if _normalizar(cartorio) == "cartório":
+        return True
+    if _normalizar(tipo_pesquisa) == "tipo de pesquisa":
+        return True
+    if _normalizar(status) == "status":
+        return True
 
+    return False
 
-def _linha_interna_eh_cabecalho(colunas) -> bool:
-    try:
-        protocolo = colunas.nth(1).inner_text().strip()
-        cartorio = colunas.nth(2).inner_text().strip()
-        tipo_pesquisa = colunas.nth(3).inner_text().strip()
-        status = colunas.nth(4).inner_text().strip()
 
-        if _normalizar(protocolo) == "protocolo":
-            return True
-        if _normalizar(cartorio) == "cartório":
-            return True
-        if _normalizar(tipo_pesquisa) == "tipo de pesquisa":
-            return True
-        if _normalizar(status) == "status":
-            return True
-
-        return False
-    except Exception:
-        return False
-
-
-def _capturar_numero_pedido(page) -> str | None:
-    texto_pagina = page.inner_text("body")
+def _capturar_numero_pedido(page, deadline: Deadline) -> str | None:
+    texto_pagina = page.inner_text("body", timeout=deadline.timeout(30000))
     return _extrair_primeiro(texto_pagina, r"N[ºo]\s*Pedido\s*(P\d+[A-Z])")
 
 
-def _abrir_pagina_pedido(page, linha, protocolo: str) -> None:
+@span("consultar.pedido_abrir")
+def _abrir_pagina_pedido(page, linha, protocolo: str, deadline: Deadline) -> None:
     print(f"➡ Abrindo processo {protocolo}")
 
     try:
-        with page.expect_navigation(wait_until="domcontentloaded", timeout=120000):
-            linha.locator("td").nth(0).locator("a").click()
+        with page.expect_navigation(
+            wait_until="domcontentloaded",
+            timeout=deadline.timeout(120000),
+        ):
+            linha.locator("td").nth(0).locator("a").click(
+                timeout=deadline.timeout(30000)
+            )
 
     except PlaywrightTimeoutError:
         print("⚠ Navegação não detectada via expect_navigation, validando URL manualmente")
-        linha.locator("td").nth(0).locator("a").click(force=True)
+        linha.locator("td").nth(0).locator("a").click(
+            force=True,
+            timeout=deadline.timeout(30000),
+        )
 
     page.wait_for_url(
         re.compile(r".*/CertidaoDigital/lstConsultaPedidos\.aspx.*"),
-        timeout=120000,
+        timeout=deadline.timeout(120000),
     )
 
-    _aguardar_tabela_interna(page)
-    page.wait_for_timeout(1000)
+    _aguardar_tabela_interna(page, deadline)
+    page.wait_for_timeout(deadline.timeout(1000))
 
     print(f"✔ Página consulta carregada: {page.url}")
 
 
-def _capturar_modal_detalhes(page) -> dict[str, str | None]:
-    page.wait_for_selector("#popContent", timeout=60000)
-    modal = page.locator("#popContent")
-
-    texto_modal = modal.inner_text()
-
-    protocolo_modal = _extrair_bloco(
-        texto_modal,
-        "Nº Protocolo",
-        [
-            "Tipo de Certidão",
-            "Pedido Por",
-            "Cartório / Cidade",
-            "Status",
-            "Resposta",
-            "Dados da Solicitação",
-            "Tipo de Finalidade",
-        ],
-    )
-
-    tipo_certidao = _extrair_bloco(
-        texto_modal,
-        "Tipo de Certidão",
-        [
-            "Pedido Por",
-            "Cartório / Cidade",
-            "Status",
-            "Resposta",
-            "Dados da Solicitação",
-            "Tipo de Finalidade",
-        ],
-    )
-
-    pedido_por = _extrair_bloco(
-        texto_modal,
-        "Pedido Por",
-        [
-            "Cartório / Cidade",
-            "Status",
-            "Resposta",
-            "Dados da Solicitação",
-            "Tipo de Finalidade",
-        ],
-    )
-
-    cartorio_cidade_modal = _extrair_bloco(
-        texto_modal,
-        "Cartório / Cidade",
-        [
-            "Status",
-            "Resposta",
-            "Dados da Solicitação",
-            "Tipo de Finalidade",
-        ],
-    )
-
-    status_modal = _extrair_bloco(
-        texto_modal,
-        "Status",
-        [
-            "Resposta",
-            "Dados da Solicitação",
-            "Tipo de Finalidade",
-        ],
-    )
-
-    resposta_modal = _extrair_bloco(
-        texto_modal,
-        "Resposta",
-        [
-            "Dados da Solicitação",
-            "Tipo de Finalidade",
-        ],
-    )
-
-    dados_solicitacao = _extrair_bloco(
-        texto_modal,
-        "Dados da Solicitação",
-        [
-            "Tipo de Finalidade",
-        ],
-    )
-
-    finalidade = _extrair_bloco(
-        texto_modal,
-        "Tipo de Finalidade",
-        None,
-    )
-
-    matricula = None
-
-    if dados_solicitacao:
-        matricula = _extrair_primeiro(
-            dados_solicitacao,
-            r"Matr[íi]cula\s*[:\-]?\s*([^\n\r]+)",
-        )
-
-    return {
-        "protocolo_modal": protocolo_modal,
-        "matricula": matricula,
-        "tipo_certidao": tipo_certidao,
-        "pedido_por": pedido_por,
-        "cartorio_cidade_modal": cartorio_cidade_modal,
-        "status_modal": status_modal,
-        "resposta_modal": resposta_modal,
-        "dados_solicitacao": dados_solicitacao,
-        "finalidade": finalidade,
-    }
-
-
-def _abrir_e_capturar_detalhes(page, linha_int) -> dict[str, str | None]:
-    print("➡ Abrindo detalhes do pedido")
-
-    col = linha_int.locator("td")
-
+@span("consultar.modal_detalhes")
+def _abrir_e_capturar_detalhes(
+    page, linha_int, deadline: Deadline, debug: Depuracao
+) -> dict[str, str | None]:
     try:
-        link_detalhes = col.nth(0).locator("a")
-        link_detalhes.scroll_into_view_if_needed()
-        page.wait_for_timeout(300)
-
-        try:
-            link_detalhes.click(timeout=30000)
-        except PlaywrightTimeoutError:
-            link_detalhes.click(force=True, timeout=30000)
+        return capturar_detalhes(page, linha_int, deadline)
 
-        page.wait_for_selector("#popContent", timeout=60000)
-        print("✔ Modal carregado")
-
-        detalhes = _capturar_modal_detalhes(page)
-
-        fechar_btn = page.locator("#popContent input[value='Fechar']")
-        if fechar_btn.count() > 0:
-            try:
-                fechar_btn.click(timeout=15000)
-            except PlaywrightTimeoutError:
-                fechar_btn.click(force=True, timeout=15000)
-
-        page.wait_for_timeout(800)
-
-        return detalhes
+    except PrazoExcedido:
+        raise
 
     except Exception as e:
         print(f"⚠ Falha ao abrir/capturar modal: {e}")
-        _debug_snapshot(page, "erro_modal_detalhes")
-        return {
-            "protocolo_modal": None,
-            "matricula": None,
-            "tipo_certidao": None,
-            "pedido_por": None,
-            "cartorio_cidade_modal": None,
-            "status_modal": None,
-            "resposta_modal": None,
-            "dados_solicitacao": None,
-            "finalidade": None,
-        }
-
-
-def _baixar_arquivo_se_disponivel(page, linha_int, status_int: str) -> str | None:
+        debug.snapshot(page, "erro_modal_detalhes", falha=True)
+        return parse_modal_detalhes("")
+
+
+@span("consultar.download")
+def _baixar_arquivo_se_disponivel(
+    page, linha_int, status_int: str, deadline: Deadline, baixador: BaixadorHTTP, item_key: str
+) -> str | Future | None:
+    """
+    Caminho relativo do PDF, None se indisponível ou, quando o link tem
+    URL comum, um Future do download HTTP em andamento (resolvido por
+    _resolver_arquivo na thread de gravação). O arquivo leva o item_key
+    no nome.
+    """
     if _normalizar(status_int) != "respondido":
         print("➡ Item não respondido, sem download")
         return None
@@ -335,17 +189,24 @@ def _baixar_arquivo_se_disponivel(page, linha_int, status_int: str) -> str | Non
             print("⚠ Coluna de download sem link disponível")
             return None
 
+        url = href_direto(download_link.first)
+        if url:
+            print(f"➡ Download direto agendado: {url}")
+            return baixador.agendar(
+                url, timeout_s=deadline.timeout_s(60), page=page, protocolo=item_key
+            )
+
         download_link.scroll_into_view_if_needed()
-        page.wait_for_timeout(300)
+        page.wait_for_timeout(deadline.timeout(300))
 
-        with page.expect_download(timeout=60000) as download_info:
+        with page.expect_download(timeout=deadline.timeout(60000)) as download_info:
             try:
-                download_link.click(timeout=15000)
+                download_link.click(timeout=deadline.timeout(15000))
             except PlaywrightTimeoutError:
-                download_link.click(force=True, timeout=15000)
+                download_link.click(force=True, timeout=deadline.timeout(15000))
 
         download = download_info.value
-        destino = DOWNLOAD_DIR / download.suggested_filename
+        destino = DOWNLOAD_DIR / nome_do_protocolo(item_key, download.suggested_filename)
         download.save_as(destino)
 
         print(f"✔ PDF salvo: {destino}")
@@ -356,226 +217,488 @@ def _baixar_arquivo_se_disponivel(page, linha_int, status_int: str) -> str | Non
 
         return relative_path
 
+    except PrazoExcedido:
+        raise
+
     except Exception as e:
         print(f"⚠ Falha download: {e}")
         return None
 
 
-def _voltar_para_listagem_principal(page) -> None:
-    print("➡ Voltando para listagem principal")
+def _resolver_arquivo(arquivo: str | Future | None) -> str | None:
+    if not isinstance(arquivo, Future):
+        return arquivo
 
-    page.go_back(wait_until="domcontentloaded")
+    try:
+        destino = arquivo.result()
+    except Exception as e:
+        print(f"⚠ Falha download: {e}")
+        return None
 
-    page.wait_for_url(
-        re.compile(r".*/CertidaoDigital/lstPedidos\.aspx.*"),
-        timeout=120000,
+    print(f"✔ PDF salvo: {destino}")
+    return f"ri-digital/{destino.name}"
+
+
+def _hash_arquivo(file_path: str) -> str | None:
+    caminho = DOWNLOAD_DIR / Path(file_path).name
+    if not caminho.exists():
+        return None
+
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _item_sincronizado(anterior: dict | None, status: str | None = None) -> bool:
+    """
+    Item da última sincronização ainda válido: mesmo status (quando
+    informado), PDF baixado se respondido e arquivo ainda no disco.
+    """
+    if not anterior:
+        return False
+
+    if status is not None and _normalizar(anterior["status"]) != _normalizar(status):
+        return False
+
+    file_path = anterior.get("file_path")
+    if _normalizar(anterior["status"]) == "respondido" and not file_path:
+        return False
+
+    return not file_path or (DOWNLOAD_DIR / Path(file_path).name).exists()
+
+
+def _persistir_item(
+    job_id,
+    item_key: str,
+    arquivo,
+    project_id,
+    data: dict,
+    user_id=None,
+    status_item: str = "",
+    anterior: dict | None = None,
+) -> None:
+    """
+    Roda no EscritorDB: espera o download (se ainda em andamento), grava
+    resultado + documento, o estado de sincronização e só então o
+    checkpoint do item.
+    """
+    file_path = _resolver_arquivo(arquivo)
+
+    data["file_path"] = file_path
+    data["metadata_json"]["pdf_status"] = "OK" if file_path else "NAO_DISPONIVEL"
+
+    file_sha256 = _hash_arquivo(file_path) if file_path else None
+
+    # mesmo conteúdo já virou Document numa sincronização anterior
+    repetido = bool(file_sha256 and anterior and anterior.get("file_sha256") == file_sha256)
+
+    persist_document_and_result(
+        job_id,
+        data,
+        document=None if repetido else {
+            "project_id": project_id,
+            "filename": Path(file_path).name if file_path else None,
+            "file_path": file_path,
+        },
+        row_key=item_key,
     )
 
-    _aguardar_tabela_principal(page)
-    page.wait_for_timeout(1000)
+    if user_id:
+        protocolo, item = item_key.split("/", 1)
+        save_certidao_sync_item(
+            user_id, protocolo, item, status_item, file_path, file_sha256, data
+        )
 
-    print("✔ Retornou para listagem principal")
+    save_job_checkpoint(job_id, item_key, {"file_path": file_path})
 
 
-def executar_job_ri_digital_consultar_certidao(job: dict[str, Any], login: str, senha: str):
-    payload = job.get("payload_json") or {}
+def _repetir_item(job_id, item_key: str, anterior: dict) -> None:
+    """Item sem mudança: regrava o resultado da última sincronização neste job."""
+    persist_document_and_result(job_id, anterior["result_json"], row_key=item_key)
+    save_job_checkpoint(
+        job_id,
+        item_key,
+        {"file_path": anterior.get("file_path"), "sincronizado": True},
+    )
+
+
+def _configurar_pagina(page) -> None:
+    page.set_default_timeout(120000)
+
+
+def _paginas_do_job(payload: dict) -> int:
+    paginas = int(payload.get("paginas_paralelas") or RI_DIGITAL_PAGINAS)
+    return max(1, min(paginas, RI_DIGITAL_PAGINAS_MAX))
 
+
+@dataclass
+class _Execucao:
+    """Estado do job compartilhado pelos protocolos em andamento."""
+
+    job: dict
+    deadline: Deadline
+    escritor: EscritorDB
+    baixador: BaixadorHTTP
+    concluidas: set
+    sync_protocolos: dict
+    sync_itens: dict
+    pular_inalterados: bool
+    debug: Depuracao
+
+
+def _pedidos_a_processar(page, payload: dict, ex: _Execucao):
+    """
+    Percorre lstPedidos (todas as páginas) na aba principal e gera os
+    protocolos que precisam ser abertos. Protocolos já concluídos ou sem
+    mudança desde a última sincronização são resolvidos aqui mesmo.
+    """
     protocolo_busca = payload.get("protocolo")
     data_busca = payload.get("data")
     status_busca = payload.get("status")
+    job_id = ex.job["id"]
+
+    pedidos = GridPaginado(page, ex.deadline, max_paginas=payload.get("max_paginas"))
+
+    for linha_grid in pedidos.linhas():
+        celulas = linha_grid.celulas
+        i = linha_grid.indice
+
+        if len(celulas) < 4:
+            continue
+
+        if _linha_principal_eh_cabecalho(celulas):
+            print(f"⚠ Ignorando cabeçalho da tabela principal na linha {i + 1}")
+            continue
+
+        protocolo, data, status = celulas[1:4]
+
+        if not protocolo:
+            continue
+
+        if protocolo_busca and protocolo_busca != protocolo:
+            continue
+
+        if data_busca and data_busca != data:
+            continue
+
+        if status_busca and status_busca.lower() not in status.lower():
+            continue
+
+        if protocolo in ex.concluidas:
+            print(f"↩ Protocolo {protocolo} já concluído, pulando")
+            continue
+
+        itens_salvos = {
+            k: v for k, v in ex.sync_itens.items() if k.startswith(f"{protocolo}/")
+        }
+
+        if (
+            ex.pular_inalterados
+            and itens_salvos
+            and _normalizar(ex.sync_protocolos.get(protocolo) or "") == _normalizar(status)
+            and all(_item_sincronizado(a) for a in itens_salvos.values())
+        ):
+            print(
+                f"⏭ Protocolo {protocolo} sem mudança ({status}), "
+                f"{len(itens_salvos)} item(ns) da última sincronização"
+            )
+            for item_key, anterior in itens_salvos.items():
+                if item_key not in ex.concluidas:
+                    ex.escritor.enfileirar(_repetir_item, job_id, item_key, anterior)
+            ex.escritor.enfileirar(
+                save_job_checkpoint, job_id, protocolo, {"sincronizado": True}
+            )
+            continue
+
+        print(f"➡ Linha {i + 1} (página {linha_grid.pagina})")
+        print(f"   Protocolo: {protocolo}")
+        print(f"   Data: {data}")
+        print(f"   Status: {status}")
+
+        yield {
+            "protocolo": protocolo,
+            "data": data,
+            "status": status,
+            "indice": i,
+            "pagina": linha_grid.pagina,
+            # link do pedido: com URL comum, qualquer aba abre direto
+            "url": linha_grid.links[0],
+            "listagem": pedidos.url,
+        }
+
+
+def _abrir_pedido_pela_listagem(page, pedido: dict, deadline: Deadline) -> None:
+    """Link do pedido é postback: abre a listagem nesta aba e clica na linha."""
+    listagem = GridPaginado(page, deadline, url=pedido["listagem"])
+    listagem.garantir_pagina(pedido["pagina"])
+
+    linha = page.locator("#Grid > tbody > tr").filter(has_text=pedido["protocolo"]).first
+    _abrir_pagina_pedido(page, linha, pedido["protocolo"], deadline)
 
-    project_id = job.get("project_id")
 
-    with sync_playwright() as p:
+def _processar_protocolo(page, pedido: dict, ex: _Execucao):
+    """
+    Gerador usado pelo PoolDePaginas: abre lstConsultaPedidos do protocolo
+    nesta aba, captura detalhes e downloads de cada item e enfileira a
+    gravação item a item. Devolve o Nº do pedido.
+    """
+    job_id = ex.job["id"]
+    deadline = ex.deadline
+    protocolo = pedido["protocolo"]
+    data_iso = _converter_data_ptbr_para_iso(pedido["data"])
+
+    try:
+        if pedido["url"]:
+            print(f"➡ Abrindo processo {protocolo}")
+            with span("consultar.pedido_abrir"):
+                page.goto(pedido["url"], wait_until="commit", timeout=deadline.timeout(120000))
+                yield
+                _aguardar_tabela_interna(page, deadline)
+            yield 1.0
+            print(f"✔ Página consulta carregada: {page.url}")
+        else:
+            _abrir_pedido_pela_listagem(page, pedido, deadline)
+
+        # ------------------------------------------------
+        # Nº PEDIDO
+        # ------------------------------------------------
+        numero_pedido = _capturar_numero_pedido(page, deadline)
+        print(f"✔ Nº Pedido: {numero_pedido}")
+
+        # ------------------------------------------------
+        # TABELA INTERNA
+        # ------------------------------------------------
+        itens = GridPaginado(page, deadline)
+
+        for item_grid in itens.linhas():
+            linha_int = item_grid.locator
+            col = item_grid.celulas
+            j = item_grid.indice
+
+            if len(col) < 7:
+                continue
+
+            if _linha_interna_eh_cabecalho(col):
+                print(f"⚠ Ignorando cabeçalho da tabela interna na linha {j + 1}")
+                continue
+
+            protocolo_int, cartorio, tipo_pesquisa, status_int = col[1:5]
+
+            if not protocolo_int:
+                print(f"⚠ Ignorando linha interna vazia na linha {j + 1}")
+                continue
+
+            item_key = f"{protocolo}/{protocolo_int}"
+            if item_key in ex.concluidas:
+                print(f"↩ Item {protocolo_int} já concluído, pulando")
+                continue
+
+            anterior = ex.sync_itens.get(item_key)
+            if ex.pular_inalterados and _item_sincronizado(anterior, status_int):
+                print(f"⏭ Item {protocolo_int} sem mudança ({status_int})")
+                ex.escritor.enfileirar(_repetir_item, job_id, item_key, anterior)
+                continue
+
+            print(f"   ➜ Item {j + 1} (página {item_grid.pagina})")
+            print(f"      Protocolo interno: {protocolo_int}")
+            print(f"      Cartório: {cartorio}")
+            print(f"      Tipo pesquisa: {tipo_pesquisa}")
+            print(f"      Status: {status_int}")
+
+            # ------------------------------------------------
+            # DETALHES
+            # ------------------------------------------------
+            detalhes = _abrir_e_capturar_detalhes(page, linha_int, deadline, ex.debug)
+            yield
+
+            # ------------------------------------------------
+            # DOWNLOAD
+            # ------------------------------------------------
+            arquivo = _baixar_arquivo_se_disponivel(
+                page, linha_int, status_int, deadline, ex.baixador, item_key
+            )
+            yield
+
+            # ------------------------------------------------
+            # SALVAR RESULTADO (file_path/pdf_status preenchidos
+            # quando o download terminar, em _persistir_item)
+            # ------------------------------------------------
+            metadata = {
+                "numero_pedido": numero_pedido,
+                "tipo_certidao": detalhes.get("tipo_certidao"),
+                "tipo_pedido": detalhes.get("pedido_por"),
+                "tipo_pesquisa": tipo_pesquisa,
+                "status": status_int,
+                "status_modal": detalhes.get("status_modal"),
+                "resposta": detalhes.get("resposta_modal"),
+                "finalidade": detalhes.get("finalidade"),
+                "cartorio_cidade_modal": detalhes.get("cartorio_cidade_modal"),
+                "dados_solicitacao": detalhes.get("dados_solicitacao"),
+            }
+
+            ex.escritor.enfileirar(
+                _persistir_item,
+                job_id,
+                item_key,
+                arquivo,
+                ex.job.get("project_id"),
+                {
+                    "protocolo": detalhes.get("protocolo_modal") or protocolo_int,
+                    "matricula": detalhes.get("matricula"),
+                    "cartorio": cartorio,
+                    "data_pedido": data_iso,
+                    "metadata_json": metadata,
+                },
+                ex.job.get("user_id"),
+                status_int,
+                anterior,
+            )
+
+        return numero_pedido
+
+    except PrazoExcedido:
+        raise
+
+    except Exception:
+        _debug_page_info(page, f"erro_protocolo_{protocolo}")
+        ex.debug.snapshot(page, f"erro_protocolo_{protocolo}", falha=True)
+        raise
+
+
+def executar_job_ri_digital_consultar_certidao(job: dict[str, Any], login: str, senha: str):
+    payload = job.get("payload_json") or {}
+
+    deadline = Deadline.para_job(job)
+    debug = Depuracao.para_job(job, "consultar", deadline)
+
+    concluidas = fetch_job_checkpoints(job["id"])
+    if concluidas:
+        print(f"↩ Retomando job: {len(concluidas)} checkpoint(s) encontrados")
+
+    # sincronização incremental: protocolos/itens sem mudança desde a
+    # última execução do usuário não são abertos de novo
+    user_id = job.get("user_id")
+    sync_protocolos, sync_itens = fetch_certidao_sync(user_id) if user_id else ({}, {})
+    pular_inalterados = bool(user_id) and not payload.get("sincronizacao_completa")
+
+    etapas = Etapas("consultar")
+    etapas.iniciar("browser")
+
+    with sync_playwright() as p, EscritorDB(job["id"]) as escritor:
         browser = p.chromium.launch(
             headless=True,
             args=["--no-sandbox", "--disable-dev-shm-usage"],
         )
+        registrar_browser(browser)
 
         context = browser.new_context(accept_downloads=True)
         page = context.new_page()
-        page.set_default_timeout(120000)
+        _configurar_pagina(page)
+
+        baixador = BaixadorHTTP(context, DOWNLOAD_DIR)
 
         try:
             # ------------------------------------------------
             # LOGIN
             # ------------------------------------------------
+            etapas.iniciar("login")
             print("➡ Login RI Digital")
 
             page.goto(
-                "https://ridigital.org.br/Acesso.aspx",
+                f"{RI_DIGITAL_BASE_URL}/Acesso.aspx",
                 wait_until="domcontentloaded",
+                timeout=deadline.timeout(120000),
             )
 
-            page.wait_for_selector("a.acesso-comum-link", timeout=60000)
-            page.click("a.acesso-comum-link")
+            page.wait_for_selector(
+                "a.acesso-comum-link",
+                timeout=deadline.timeout(60000),
+            )
+            page.click("a.acesso-comum-link", timeout=deadline.timeout(30000))
 
-            page.wait_for_selector('input[placeholder="E-mail"]', timeout=60000)
+            page.wait_for_selector(
+                'input[placeholder="E-mail"]',
+                timeout=deadline.timeout(60000),
+            )
             page.fill('input[placeholder="E-mail"]', login)
             page.fill('input[placeholder="Senha"]', senha)
 
-            page.click("#btnProsseguir")
-            page.wait_for_url("**/ServicosOnline.aspx", timeout=120000)
-            page.wait_for_load_state("networkidle")
+            page.click("#btnProsseguir", timeout=deadline.timeout(30000))
+            page.wait_for_url(
+                "**/ServicosOnline.aspx",
+                timeout=deadline.timeout(120000),
+            )
+            page.wait_for_load_state("networkidle", timeout=deadline.timeout(120000))
 
             print("✔ Login realizado")
 
             # ------------------------------------------------
             # CERTIDÃO DIGITAL
             # ------------------------------------------------
+            etapas.iniciar("listagem")
             print("➡ Acessando página Certidão Digital")
 
             page.goto(
-                "https://ridigital.org.br/CertidaoDigital/lstPedidos.aspx",
+                f"{RI_DIGITAL_BASE_URL}/CertidaoDigital/lstPedidos.aspx",
                 wait_until="domcontentloaded",
+                timeout=deadline.timeout(120000),
             )
 
-            _aguardar_tabela_principal(page)
+            _aguardar_tabela_principal(page, deadline)
 
             print("✔ Página de pedidos carregada")
             _debug_page_info(page, "lst_pedidos")
 
             # ------------------------------------------------
-            # TABELA PRINCIPAL
+            # PROTOCOLOS (aba principal lê a listagem, K abas
+            # abrem os pedidos em paralelo)
             # ------------------------------------------------
-            linhas = page.locator("#Grid tbody tr")
-            total = linhas.count()
-
-            print(f"➡ Processos encontrados: {total}")
+            etapas.iniciar("protocolos")
+
+            paginas = _paginas_do_job(payload)
+            print(f"➡ Processando protocolos em {paginas} aba(s)")
+
+            ex = _Execucao(
+                job=job,
+                deadline=deadline,
+                escritor=escritor,
+                baixador=baixador,
+                concluidas=concluidas,
+                sync_protocolos=sync_protocolos,
+                sync_itens=sync_itens,
+                pular_inalterados=pular_inalterados,
+                debug=debug,
+            )
 
-            for i in range(total):
-                linhas = page.locator("#Grid tbody tr")
-                linha = linhas.nth(i)
-
-                colunas = linha.locator("td")
-                qtd_colunas = colunas.count()
-
-                if qtd_colunas < 4:
-                    continue
-
-                if _linha_principal_eh_cabecalho(colunas):
-                    print(f"⚠ Ignorando cabeçalho da tabela principal na linha {i + 1}")
-                    continue
-
-                protocolo = colunas.nth(1).inner_text().strip()
-                data = colunas.nth(2).inner_text().strip()
-                data_iso = _converter_data_ptbr_para_iso(data)
-                status = colunas.nth(3).inner_text().strip()
-
-                if not protocolo:
-                    continue
-
-                if protocolo_busca and protocolo_busca != protocolo:
-                    continue
-
-                if data_busca and data_busca != data:
-                    continue
-
-                if status_busca and status_busca.lower() not in status.lower():
-                    continue
-
-                print(f"➡ Linha {i + 1}/{total}")
-                print(f"   Protocolo: {protocolo}")
-                print(f"   Data: {data}")
-                print(f"   Status: {status}")
-
-                _abrir_pagina_pedido(page, linha, protocolo)
-
-                # ------------------------------------------------
-                # Nº PEDIDO
-                # ------------------------------------------------
-                numero_pedido = _capturar_numero_pedido(page)
-                print(f"✔ Nº Pedido: {numero_pedido}")
-
-                # ------------------------------------------------
-                # TABELA INTERNA
-                # ------------------------------------------------
-                _aguardar_tabela_interna(page)
-
-                linhas_internas = page.locator("#Grid tbody tr")
-                total_internas = linhas_internas.count()
-
-                print(f"➡ Itens internos encontrados: {total_internas}")
-
-                for j in range(total_internas):
-                    linhas_internas = page.locator("#Grid tbody tr")
-                    linha_int = linhas_internas.nth(j)
-
-                    col = linha_int.locator("td")
-                    qtd_col_int = col.count()
-
-                    if qtd_col_int < 7:
-                        continue
-
-                    if _linha_interna_eh_cabecalho(col):
-                        print(f"⚠ Ignorando cabeçalho da tabela interna na linha {j + 1}")
-                        continue
-
-                    protocolo_int = col.nth(1).inner_text().strip()
-                    cartorio = col.nth(2).inner_text().strip()
-                    tipo_pesquisa = col.nth(3).inner_text().strip()
-                    status_int = col.nth(4).inner_text().strip()
-
-                    if not protocolo_int:
-                        print(f"⚠ Ignorando linha interna vazia na linha {j + 1}")
-                        continue
-
-                    print(f"   ➜ Item {j + 1}/{total_internas}")
-                    print(f"      Protocolo interno: {protocolo_int}")
-                    print(f"      Cartório: {cartorio}")
-                    print(f"      Tipo pesquisa: {tipo_pesquisa}")
-                    print(f"      Status: {status_int}")
-
-                    # ------------------------------------------------
-                    # DETALHES
-                    # ------------------------------------------------
-                    detalhes = _abrir_e_capturar_detalhes(page, linha_int)
-
-                    # ------------------------------------------------
-                    # DOWNLOAD
-                    # ------------------------------------------------
-                    file_path = _baixar_arquivo_se_disponivel(page, linha_int, status_int)
-
-                    # ------------------------------------------------
-                    # SALVAR RESULTADO
-                    # ------------------------------------------------
-                    metadata = {
-                        "numero_pedido": numero_pedido,
-                        "tipo_certidao": detalhes.get("tipo_certidao"),
-                        "tipo_pedido": detalhes.get("pedido_por"),
-                        "tipo_pesquisa": tipo_pesquisa,
-                        "status": status_int,
-                        "status_modal": detalhes.get("status_modal"),
-                        "resposta": detalhes.get("resposta_modal"),
-                        "finalidade": detalhes.get("finalidade"),
-                        "cartorio_cidade_modal": detalhes.get("cartorio_cidade_modal"),
-                        "dados_solicitacao": detalhes.get("dados_solicitacao"),
-                        "pdf_status": "OK" if file_path else "NAO_DISPONIVEL",
-                    }
-
-                    insert_result(
-                        job["id"],
-                        {
-                            "protocolo": detalhes.get("protocolo_modal") or protocolo_int,
-                            "matricula": detalhes.get("matricula"),
-                            "cartorio": cartorio,
-                            "data_pedido": data_iso,
-                            "file_path": file_path,
-                            "metadata_json": metadata,
-                        },
+            def processar(pagina, pedido):
+                return _processar_protocolo(pagina, pedido, ex)
+
+            def ao_concluir(pedido, numero_pedido, erro):
+                if erro is not None:
+                    raise erro
+
+                escritor.enfileirar(
+                    save_job_checkpoint,
+                    job["id"],
+                    pedido["protocolo"],
+                    {"numero_pedido": numero_pedido},
+                )
+                if user_id:
+                    escritor.enfileirar(
+                        save_certidao_sync_protocolo, user_id, pedido["protocolo"], pedido["status"]
                     )
 
-                    if file_path and project_id:
-                        create_document(
-                            project_id,
-                            Path(file_path).name,
-                            file_path,
-                        )
+            with PoolDePaginas(context, paginas, configurar=_configurar_pagina) as pool:
+                pool.executar(
+                    _pedidos_a_processar(page, payload, ex),
+                    processar,
+                    ao_concluir,
+                    propagar=(PrazoExcedido,),
+                )
 
-                # ------------------------------------------------
-                # VOLTAR PARA LISTA
-                # ------------------------------------------------
-                _voltar_para_listagem_principal(page)
+            etapas.encerrar()
 
             print("✔ Consulta finalizada")
             return True
@@ -583,8 +706,11 @@ def executar_job_ri_digital_consultar_certidao(job: dict[str, Any], login: str,
         except Exception as e:
             print("⚠ ERRO NA AUTOMAÇÃO CONSULTAR CERTIDÃO")
             _debug_page_info(page, "erro_consultar_certidao")
-            _debug_snapshot(page, "erro_consultar_certidao")
+            debug.snapshot(page, "erro_consultar_certidao", falha=True)
             raise Exception(f"Erro na automação RI Digital Consultar Certidão: {str(e)}")
 
         finally:
+            etapas.encerrar()
+            debug.relatorio()
+            baixador.fechar()
             browser.close()
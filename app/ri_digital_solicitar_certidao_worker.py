@@ -1,17 +1,42 @@
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+import hashlib
+import re
 import time
+from urllib.parse import urlsplit
 
 from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from playwright.sync_api import sync_playwright
 
-from db import insert_result, create_document
-
-
-DOWNLOAD_DIR = Path("/app/app/uploads/ri-digital")
+from cartorios import Catalogo, Opcoes, nome_estado, normalizar
+from certidao_modal import capturar_detalhes
+from db import (
+    fetch_job_checkpoints,
+    fetch_pedidos_certidao,
+    persist_documents_and_results,
+    save_job_checkpoint,
+    save_pedidos_concluidos,
+    save_pedidos_enviando,
+)
+from deadline import Deadline, PrazoExcedido
+from debug_policy import Depuracao
+from downloads import BaixadorHTTP, href_direto, nome_do_protocolo
+from grid import GridPaginado
+from metrics import registrar_browser
+from settings import BACKEND_UPLOADS_BASE, RI_DIGITAL_BASE_URL, RI_DIGITAL_PEDIDO_REUSO_HORAS
+from timing import Etapas
+
+
+DOWNLOAD_DIR = Path(BACKEND_UPLOADS_BASE) / "ri-digital"
 DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-DEBUG_DIR = Path("/app/debug")
-DEBUG_DIR.mkdir(parents=True, exist_ok=True)
+# Tipo de Certidão / Pedido Por selecionados no wizard (inteiro teor por matrícula)
+_TIPO_CERTIDAO = "3"
+_PEDIDO_POR = "4"
+
+# páginas de lstPedidos lidas ao reconciliar um envio interrompido
+_PAGINAS_RECONCILIACAO = 2
 
 
 def _wait_enabled(ctx, selector: str, timeout: int = 30000) -> None:
@@ -52,664 +77,1204 @@ def _debug_frames(page, etapa: str) -> None:
     print(f"[DEBUG][{etapa}] ========================")
 
 
-def _debug_snapshot(page, label: str) -> None:
-    try:
-        ts = int(time.time())
-        png_path = DEBUG_DIR / f"{label}_{ts}.png"
-        html_path = DEBUG_DIR / f"{label}_{ts}.html"
+class _LocalizadorWizard:
+    """
+    Lembra, durante a sessão, onde o wizard apareceu (DOM principal ou o
+    path da URL do frame). Nos pedidos seguintes do lote o mapa é
+    procurado primeiro ali, sem varrer todos os frames.
+    """
 
-        page.screenshot(path=str(png_path), full_page=True)
+    def __init__(self):
+        self._caminho: str | None = None  # "" = DOM principal
 
-        html = page.content()
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(html)
+    @staticmethod
+    def _tem_mapa(ctx) -> bool:
+        try:
+            return ctx.locator("#svg-map-brasil").count() > 0
+        except Exception:
+            return False
+
+    def _do_cache(self, page):
+        if self._caminho is None:
+            return None
+        if self._caminho == "":
+            return page if self._tem_mapa(page) else None
+        for frame in page.frames:
+            if urlsplit(frame.url).path == self._caminho and self._tem_mapa(frame):
+                return frame
+        return None
 
-        print(f"[DEBUG] Screenshot salvo: {png_path}")
-        print(f"[DEBUG] HTML salvo: {html_path}")
+    def _procurar(self, page):
+        if self._tem_mapa(page):
+            print("[DEBUG] Mapa encontrado no DOM principal")
+            self._caminho = ""
+            return page
 
-    except Exception as e:
-        print(f"[DEBUG] Falha ao gerar snapshot '{label}': {e}")
+        for i, frame in enumerate(page.frames):
+            if self._tem_mapa(frame):
+                print(f"[DEBUG] Mapa encontrado no FRAME[{i}]")
+                self._caminho = urlsplit(frame.url).path
+                return frame
+
+        return None
+
+    def localizar(self, page, deadline: Deadline):
+        """Contexto (página ou frame) com o mapa; espera até 30 s ele aparecer."""
+        fim = time.monotonic() + deadline.timeout_s(30)
+
+        while True:
+            ctx = self._do_cache(page) or self._procurar(page)
+            if ctx:
+                return ctx
+            if time.monotonic() >= fim:
+                raise Exception("Mapa não encontrado")
+            page.wait_for_timeout(deadline.timeout(250))
+
+
+def _baixar_por_clique(page, link, deadline: Deadline, protocolo: str | None) -> Path:
+
+    with page.expect_download(
+        timeout=deadline.timeout(30000)
+    ) as download_info:
+        link.click(timeout=deadline.timeout(60000))
+
+    download = download_info.value
+
+    file_path = DOWNLOAD_DIR / nome_do_protocolo(protocolo, download.suggested_filename)
+
+    download.save_as(file_path)
+
+    return file_path
+
+
+# =========================================================
+# PAYLOAD
+# =========================================================
+
+def _grupos_do_payload(payload: dict) -> list[dict]:
+    """
+    Normaliza o payload em grupos (UF, cidade, cartório, matrículas);
+    cada grupo vira um pedido no wizard. Aceita:
+
+        {"cidade", "cartorio", "matricula", "finalidade"}           (1 matrícula)
+        {"cidade", "cartorio", "matriculas": [...], "finalidade"}   (lote num cartório)
+        {"itens": [{"cidade", "cartorio", "matricula"}, ...], "finalidade"}
+
+    "uf" (padrão RO) vale para o payload todo e pode ser repetido por
+    item. Itens do mesmo cartório são agrupados (na ordem da primeira
+    ocorrência) e matrículas repetidas no grupo são descartadas.
+    """
+    uf_padrao = str(payload.get("uf") or "RO").strip().upper()
+
+    if payload.get("itens"):
+        itens = payload["itens"]
+    elif payload.get("matriculas"):
+        itens = [
+            {"cidade": payload["cidade"], "cartorio": payload["cartorio"], "matricula": m}
+            for m in payload["matriculas"]
+        ]
+    else:
+        itens = [payload]
+
+    grupos: dict[tuple, dict] = {}
+
+    for item in itens:
+        uf = str(item.get("uf") or uf_padrao).strip().upper()
+        nome_estado(uf)
+        cidade = str(item["cidade"]).strip()
+        cartorio = str(item["cartorio"]).strip()
+        matricula = str(item["matricula"]).strip()
+
+        if not matricula:
+            continue
+
+        chave = (uf, cidade.lower(), cartorio.lower())
+        grupo = grupos.setdefault(
+            chave, {"uf": uf, "cidade": cidade, "cartorio": cartorio, "matriculas": []}
+        )
+        if matricula not in grupo["matriculas"]:
+            grupo["matriculas"].append(matricula)
+
+    if not grupos:
+        raise Exception("Payload sem matrícula para solicitar")
+
+    return list(grupos.values())
+
+
+# =========================================================
+# ETAPAS DO WIZARD
+# =========================================================
+
+def _login(page, login: str, senha: str, deadline: Deadline) -> None:
+    print("➡ Abrindo página de login")
+
+    page.goto(
+        f"{RI_DIGITAL_BASE_URL}/Acesso.aspx",
+        wait_until="domcontentloaded",
+        timeout=deadline.timeout(60000),
+    )
+
+    _debug_page_info(page, "login_aberto")
+
+    page.wait_for_selector("a.acesso-comum-link", timeout=deadline.timeout(60000))
+    page.click("a.acesso-comum-link", timeout=deadline.timeout(60000))
+
+    page.wait_for_selector(
+        'input[placeholder="E-mail"]',
+        timeout=deadline.timeout(60000),
+    )
+
+    print("➡ Preenchendo login")
+
+    page.fill('input[placeholder="E-mail"]', login, timeout=deadline.timeout(60000))
+    page.fill('input[placeholder="Senha"]', senha, timeout=deadline.timeout(60000))
+
+    page.click("#btnProsseguir", timeout=deadline.timeout(60000))
+
+    page.wait_for_url("**/ServicosOnline.aspx", timeout=deadline.timeout(60000))
+
+    print("✔ Login realizado com sucesso")
+
+    _debug_page_info(page, "login_ok")
+
+
+def _abrir_novo_pedido(page, deadline: Deadline) -> None:
+    # SERVIÇOS
+
+    print("➡ Abrindo serviços")
+
+    page.goto(
+        f"{RI_DIGITAL_BASE_URL}/ServicosOnline.aspx",
+        wait_until="domcontentloaded",
+        timeout=deadline.timeout(60000),
+    )
+
+    _debug_page_info(page, "servicos")
+
+    # CERTIDÃO DIGITAL
+
+    print("➡ Abrindo Certidão Digital")
+
+    page.wait_for_selector(
+        "#form1 > div.servicos__cards__v2 > div > div:nth-child(2) > div:nth-child(1) > a",
+        timeout=deadline.timeout(60000),
+    )
+
+    page.click(
+        "#form1 > div.servicos__cards__v2 > div > div:nth-child(2) > div:nth-child(1) > a",
+        timeout=deadline.timeout(60000),
+    )
+
+    page.wait_for_load_state("networkidle", timeout=deadline.timeout(60000))
+
+    _debug_page_info(page, "certidao_digital")
+
+    # NOVO PEDIDO
+
+    print("➡ Aguardando botão +Novo Pedido")
+
+    page.wait_for_selector(
+        "#Ul1 > a.subheader__action-btn",
+        timeout=deadline.timeout(60000),
+    )
+
+    print("➡ Clicando em +Novo Pedido")
+
+    page.locator("#Ul1 > a.subheader__action-btn").click(
+        timeout=deadline.timeout(60000)
+    )
+
+    page.wait_for_url(
+        "**/CertidaoDigital/Default.aspx",
+        timeout=deadline.timeout(60000),
+    )
+
+    print("✔ Página de novo pedido carregada")
+
+    _debug_page_info(page, "novo_pedido")
 
 
-def _find_map_context(page):
+def _selecionar_estado(page, localizador: _LocalizadorWizard, uf: str, deadline: Deadline):
     """
-    Procura o mapa no DOM principal e depois em frames.
+    Seleciona o estado e devolve o contexto (página ou frame) do wizard.
+
+    Caminho direto: dispara o click da <a> do estado sem rolar nem
+    esperar o SVG ficar clicável (o onclick é quem faz o postback). Só
+    cai no clique real no mapa se, no prazo de _aceitar_termo, o termo
+    não apareceu e o mapa continua na página.
     """
+    nome = nome_estado(uf)
+    seletor = f"#svg-map-brasil a[name='{nome}']"
+
+    print("➡ Aguardando mapa do Brasil")
+
+    ctx = localizador.localizar(page, deadline)
+
+    ctx.wait_for_selector(seletor, state="attached", timeout=deadline.timeout(60000))
+
+    print(f"➡ Selecionando estado {nome}")
+
+    estado = ctx.locator(seletor).first
 
     try:
-        if page.locator("#svg-map-brasil").count() > 0:
-            print("[DEBUG] Mapa encontrado no DOM principal")
-            return page
-    except Exception:
-        pass
+        estado.dispatch_event("click", timeout=deadline.timeout(10000))
+    except PlaywrightTimeoutError:
+        pass  # o postback pode já ter levado o mapa; a espera abaixo decide
 
-    for i, frame in enumerate(page.frames):
+    if not _saiu_do_mapa(ctx, seletor, deadline):
+        print("⚠ Seleção direta sem resposta; clicando no mapa")
         try:
-            if frame.locator("#svg-map-brasil").count() > 0:
-                print(f"[DEBUG] Mapa encontrado no FRAME[{i}]")
-                return frame
-        except Exception:
-            pass
+            estado.click(timeout=deadline.timeout(60000))
+        except PlaywrightTimeoutError:
+            estado.click(force=True, timeout=deadline.timeout(60000))
 
-    return None
+    print("✔ Estado selecionado")
 
+    _debug_page_info(page, "apos_estado")
 
-def executar_job_ri_digital_solicitar_certidao(job, login, senha):
+    return ctx
 
-    payload = job["payload_json"]
 
-    cidade = payload["cidade"]
-    cartorio = payload["cartorio"]
-    matricula = payload["matricula"]
-    finalidade = str(payload["finalidade"])
+def _saiu_do_mapa(ctx, seletor: str, deadline: Deadline) -> bool:
+    """
+    Espera o postback do estado: True quando o termo aparece ou a <a>
+    do estado sai da página. Mesmo prazo de _aceitar_termo (60 s); a
+    espera do botão habilitado fica com ele.
+    """
+    fim = time.monotonic() + deadline.timeout_s(60)
 
-    project_id = job.get("project_id")
+    while True:
+        try:
+            if ctx.locator("#Contrato_btnGoNext").count() > 0:
+                return True
+            if ctx.locator(seletor).count() == 0:
+                return True
+        except Exception:
+            pass  # contexto navegando no meio do postback
+        if time.monotonic() >= fim:
+            return False
+        time.sleep(0.25)
 
-    with sync_playwright() as p:
 
-        browser = p.chromium.launch(
-            headless=True,
-            args=["--no-sandbox", "--disable-dev-shm-usage"],
-        )
+def _aceitar_termo(page, ctx, deadline: Deadline) -> None:
+    print("➡ Aguardando tela de termo")
 
-        context = browser.new_context(accept_downloads=True)
-        page = context.new_page()
+    ctx.wait_for_selector("#Contrato_btnGoNext", timeout=deadline.timeout(60000))
 
-        page.set_default_timeout(60000)
+    _wait_enabled(ctx, "#Contrato_btnGoNext", timeout=deadline.timeout(30000))
 
-        # LOGS
-        page.on("console", lambda msg: print(f"[PAGE CONSOLE] {msg.type}: {msg.text}"))
-        page.on("pageerror", lambda e: print(f"[PAGE ERROR] {e}"))
-        page.on("requestfailed", lambda r: print(f"[REQUEST FAILED] {r.url}"))
+    print("✔ Tela de termo carregada")
 
-        context.tracing.start(
-            screenshots=True,
-            snapshots=True,
-            sources=True,
-        )
+    ctx.click("#Contrato_btnGoNext", timeout=deadline.timeout(60000))
 
-        try:
+    page.wait_for_load_state("networkidle", timeout=deadline.timeout(60000))
 
-            print("➡ Iniciando automação RI Digital Certidão")
 
-            # LOGIN
-            print("➡ Abrindo página de login")
+_JS_OPCOES = """
+(sel) => [...sel.options].map((o) => ({ value: o.value, label: o.textContent.trim() }))
+"""
 
-            page.goto(
-                "https://ridigital.org.br/Acesso.aspx",
-                wait_until="domcontentloaded",
-            )
 
-            _debug_page_info(page, "login_aberto")
+def _ler_opcoes(ctx, seletor: str) -> list[dict]:
+    """Todas as <option> do select num único evaluate."""
+    return ctx.locator(seletor).evaluate(_JS_OPCOES)
 
-            page.wait_for_selector("a.acesso-comum-link")
-            page.click("a.acesso-comum-link")
 
-            page.wait_for_selector('input[placeholder="E-mail"]')
+def _selecionar_cidade_cartorio(
+    page, ctx, grupo: dict, catalogo: Catalogo, deadline: Deadline
+) -> None:
+    """
+    Seleciona pelo value do catálogo quando ele existe no dropdown; senão
+    casa a entrada com as opções lidas agora e atualiza o catálogo.
+    """
+    cidade = grupo["cidade"]
+    cartorio = grupo["cartorio"]
 
-            print("➡ Preenchendo login")
+    print(f"➡ Selecionando cidade: {cidade}")
 
-            page.fill('input[placeholder="E-mail"]', login)
-            page.fill('input[placeholder="Senha"]', senha)
+    ctx.wait_for_selector("#Cartorio_ddlCidade", timeout=deadline.timeout(60000))
 
-            page.click("#btnProsseguir")
+    # aguarda opções carregarem
+    ctx.wait_for_function(
+        """
+        () => {
+            const sel = document.querySelector('#Cartorio_ddlCidade');
+            return sel && sel.options && sel.options.length > 1;
+        }
+        """,
+        timeout=deadline.timeout(60000),
+    )
 
-            page.wait_for_url("**/ServicosOnline.aspx")
+    opcoes_cidade = Opcoes(_ler_opcoes(ctx, "#Cartorio_ddlCidade"))
 
-            print("✔ Login realizado com sucesso")
+    opcao = opcoes_cidade.por_value(grupo.get("cidade_value"))
+    if not opcao:
+        opcao = opcoes_cidade.cidade(cidade)
+        catalogo.registrar_cidades(opcoes_cidade.opcoes)
 
-            _debug_page_info(page, "login_ok")
+    if not opcao:
+        raise Exception(f"Cidade '{cidade}' não encontrada")
 
-            # SERVIÇOS
+    cidade_value = opcao["value"]
 
-            print("➡ Abrindo serviços")
+    ctx.select_option(
+        "#Cartorio_ddlCidade",
+        value=cidade_value,
+        timeout=deadline.timeout(60000),
+    )
 
-            page.goto(
-                "https://ridigital.org.br/ServicosOnline.aspx",
-                wait_until="domcontentloaded",
-            )
+    print(f"✔ Cidade selecionada: {opcao['label']}")
 
-            _debug_page_info(page, "servicos")
+    # ------------------------------------------------
+    # AGUARDAR POSTBACK DO ASP.NET
+    # ------------------------------------------------
 
-            # CERTIDÃO DIGITAL
+    ctx.wait_for_load_state("networkidle", timeout=deadline.timeout(60000))
 
-            print("➡ Abrindo Certidão Digital")
+    # ------------------------------------------------
+    # CARTÓRIO
+    # ------------------------------------------------
 
-            page.wait_for_selector(
-                "#form1 > div.servicos__cards__v2 > div > div:nth-child(2) > div:nth-child(1) > a"
-            )
+    print(f"➡ Selecionando cartório: {cartorio}")
 
-            page.click(
-                "#form1 > div.servicos__cards__v2 > div > div:nth-child(2) > div:nth-child(1) > a"
-            )
+    # aguarda cartórios carregarem após postback da cidade
+    ctx.wait_for_function(
+        """
+        () => {
+            const sel = document.querySelector('#Cartorio_ddlCartorio');
+            return sel && sel.options && sel.options.length > 1;
+        }
+        """,
+        timeout=deadline.timeout(60000)
+    )
 
-            page.wait_for_load_state("networkidle")
+    opcoes_cartorio = Opcoes(_ler_opcoes(ctx, "#Cartorio_ddlCartorio"))
 
-            _debug_page_info(page, "certidao_digital")
+    opcao = opcoes_cartorio.por_value(grupo.get("cartorio_value"))
+    if not opcao:
+        opcao = opcoes_cartorio.cartorio(cartorio)
+        catalogo.registrar_cartorios(cidade_value, opcoes_cartorio.opcoes)
 
-            # NOVO PEDIDO
+    if not opcao:
+        raise Exception(
+            f"Cartório '{cartorio}' não encontrado nas opções disponíveis"
+        )
 
-            print("➡ Aguardando botão +Novo Pedido")
+    ctx.select_option(
+        "#Cartorio_ddlCartorio",
+        value=opcao["value"],
+        timeout=deadline.timeout(60000),
+    )
 
-            page.wait_for_selector("#Ul1 > a.subheader__action-btn")
+    print(f"✔ Cartório selecionado: {opcao['label']}")
 
-            print("➡ Clicando em +Novo Pedido")
+    # ------------------------------------------------
+    # PROSSEGUIR
+    # ------------------------------------------------
 
-            page.locator("#Ul1 > a.subheader__action-btn").click()
+    print("➡ Prosseguindo")
 
-            page.wait_for_url("**/CertidaoDigital/Default.aspx")
+    _wait_enabled(ctx, "#Cartorio_btnGoNext", timeout=deadline.timeout(30000))
 
-            print("✔ Página de novo pedido carregada")
+    ctx.click("#Cartorio_btnGoNext", timeout=deadline.timeout(60000))
 
-            page.wait_for_timeout(2000)
+    page.wait_for_load_state("networkidle", timeout=deadline.timeout(60000))
 
-            _debug_page_info(page, "novo_pedido")
-            _debug_frames(page, "novo_pedido")
-            _debug_snapshot(page, "antes_busca_mapa")
 
-            # MAPA
+def _selecionar_tipo_certidao(page, ctx, deadline: Deadline) -> None:
+    print("➡ Selecionando tipo certidão")
 
-            print("➡ Aguardando mapa do Brasil")
+    ctx.wait_for_selector(
+        "#TipoCertidao_ddlTipoCertidao",
+        timeout=deadline.timeout(60000),
+    )
 
-            ctx = _find_map_context(page)
+    ctx.select_option(
+        "#TipoCertidao_ddlTipoCertidao",
+        value=_TIPO_CERTIDAO,
+        timeout=deadline.timeout(60000),
+    )
 
-            if not ctx:
+    ctx.wait_for_timeout(deadline.timeout(500))
 
-                page.wait_for_timeout(3000)
+    ctx.select_option(
+        "#TipoCertidao_ddlPedidoPor",
+        value=_PEDIDO_POR,
+        timeout=deadline.timeout(60000),
+    )
 
-                _debug_snapshot(page, "segunda_tentativa_mapa")
+    page.wait_for_timeout(deadline.timeout(1000))
 
-                ctx = _find_map_context(page)
+    print("➡ Prosseguindo")
 
-            if not ctx:
-                raise Exception("Mapa não encontrado")
+    _wait_enabled(ctx, "#TipoCertidao_btnGoNext", timeout=deadline.timeout(30000))
 
-            ctx.wait_for_selector("#svg-map-brasil")
+    ctx.click("#TipoCertidao_btnGoNext", timeout=deadline.timeout(60000))
 
-            ctx.wait_for_selector("#svg-map-brasil a[name='Rondônia']")
+    # aguarda ASP.NET atualizar tela
+    ctx.wait_for_selector("#txtTag", timeout=deadline.timeout(60000))
 
-            print("➡ Selecionando estado Rondônia")
 
-            estado = ctx.locator("#svg-map-brasil a[name='Rondônia']").first
+def _informar_matriculas(page, ctx, matriculas: list[str], deadline: Deadline) -> None:
+    """Cada matrícula vira uma tag (Enter); todas entram no mesmo pedido."""
+    ctx.wait_for_selector("#txtTag", timeout=deadline.timeout(60000))
 
-            estado.scroll_into_view_if_needed()
+    for matricula in matriculas:
 
-            page.wait_for_timeout(500)
+        print(f"➡ Informando matrícula {matricula}")
 
-            try:
-                estado.click()
-            except PlaywrightTimeoutError:
-                estado.click(force=True)
+        ctx.fill("#txtTag", "", timeout=deadline.timeout(60000))
 
-            print("✔ Estado selecionado")
+        ctx.fill("#txtTag", matricula, timeout=deadline.timeout(60000))
 
-            _debug_page_info(page, "apos_estado")
-            _debug_snapshot(page, "apos_estado")
+        # confirmar matrícula (teclado pertence à page, não ao frame)
+        page.keyboard.press("Enter")
 
-            # TERMO
+        page.wait_for_timeout(deadline.timeout(1000))
 
-            print("➡ Aguardando tela de termo")
+    print("➡ Prosseguindo")
 
-            ctx.wait_for_selector("#Contrato_btnGoNext")
+    _wait_enabled(
+        ctx,
+        "#PorMatriculaComComplemento_btnGoNext",
+        timeout=deadline.timeout(30000),
+    )
 
-            _wait_enabled(ctx, "#Contrato_btnGoNext")
+    ctx.click("#PorMatriculaComComplemento_btnGoNext", timeout=deadline.timeout(60000))
 
-            print("✔ Tela de termo carregada")
+    page.wait_for_load_state("networkidle", timeout=deadline.timeout(60000))
 
-            ctx.click("#Contrato_btnGoNext")
 
-            page.wait_for_load_state("networkidle")
+def _ler_confirmacao(ctx, deadline: Deadline) -> list[dict]:
+    print("➡ Capturando dados da tabela de confirmação")
 
-                        # ------------------------------------------------
-            # PASSO — CIDADE E CARTÓRIO
-            # ------------------------------------------------
+    resultados = []
 
-            print(f"➡ Selecionando cidade: {cidade}")
+    ctx.wait_for_selector("table tbody tr", timeout=deadline.timeout(60000))
 
-            ctx.wait_for_selector("#Cartorio_ddlCidade", timeout=60000)
+    linhas = ctx.locator("table tbody tr").all()
 
-            # aguarda opções carregarem
-            ctx.wait_for_function(
-                """
-                () => {
-                    const sel = document.querySelector('#Cartorio_ddlCidade');
-                    return sel && sel.options && sel.options.length > 1;
-                }
-                """
-            )
+    for linha in linhas:
 
-            cidade_normalizada = cidade.strip().lower()
+        colunas = linha.locator("td").all()
 
-            opcoes_cidade = ctx.locator("#Cartorio_ddlCidade option").all()
+        # tabela esperada:
+        # 0 detalhes
+        # 1 número
+        # 2 cartório
+        # 3 tipo certidão
+        # 4 tipo pedido
+        # 5 prazo
+        # 6 valor
+        # 7 excluir
+        if len(colunas) < 7:
+            continue
 
-            cidade_value = None
+        numero = colunas[1].inner_text().strip()
+        cartorio_nome = colunas[2].inner_text().strip()
+        tipo_certidao = colunas[3].inner_text().strip()
+        tipo_pedido = colunas[4].inner_text().strip()
+        prazo = colunas[5].inner_text().strip()
+        valor = colunas[6].inner_text().strip()
 
-            for opt in opcoes_cidade:
-                texto = opt.inner_text().strip().lower()
+        # ignora linha total / vazias
+        if not numero:
+            continue
 
-                if cidade_normalizada in texto:
-                    cidade_value = opt.get_attribute("value")
-                    break
+        if numero.lower() == "total":
+            continue
 
-            if not cidade_value:
-                raise Exception(f"Cidade '{cidade}' não encontrada")
+        resultados.append(
+            {
+                "numero": numero,
+                "cartorio": cartorio_nome,
+                "tipo_certidao": tipo_certidao,
+                "tipo_pedido": tipo_pedido,
+                "prazo": prazo,
+                "valor": valor,
+            }
+        )
 
-            ctx.select_option("#Cartorio_ddlCidade", value=cidade_value)
+    print(f"✔ Itens capturados da tabela: {len(resultados)}")
 
-            print("✔ Cidade selecionada")
+    return resultados
 
-            # ------------------------------------------------
-            # AGUARDAR POSTBACK DO ASP.NET
-            # ------------------------------------------------
 
-            ctx.wait_for_load_state("networkidle")
+def _escolher_pagamento(page, ctx, finalidade: str, etapas: Etapas, deadline: Deadline) -> None:
+    print(f"➡ Selecionando finalidade {finalidade}")
 
-            ctx.wait_for_function(
-                """
-                () => {
-                    const sel = document.querySelector('#Cartorio_ddlCartorio');
-                    return sel && sel.options && sel.options.length >= 1;
-                }
-                """
-            )
+    ctx.wait_for_selector(
+        "#Confirmacao_ddlTipoFinalidade",
+        timeout=deadline.timeout(60000),
+    )
 
-                       # ------------------------------------------------
-            # CARTÓRIO
-            # ------------------------------------------------
+    ctx.select_option(
+        "#Confirmacao_ddlTipoFinalidade",
+        value=finalidade,
+        timeout=deadline.timeout(60000),
+    )
 
-            print(f"➡ Selecionando cartório: {cartorio}")
+    # ASP.NET faz micro atualização da tela
+    page.wait_for_timeout(deadline.timeout(1500))
 
-            # aguarda cartórios carregarem após postback da cidade
-            ctx.wait_for_function(
-                """
-                () => {
-                    const sel = document.querySelector('#Cartorio_ddlCartorio');
-                    return sel && sel.options && sel.options.length > 1;
-                }
-                """,
-                timeout=60000
-            )
+    # ------------------------------------------------
+    # PAGAMENTO
+    # ------------------------------------------------
+
+    etapas.iniciar("pagamento")
 
-            opcoes_cartorio = ctx.locator("#Cartorio_ddlCartorio option").all()
+    print("➡ Pagamento saldo")
 
-            # remove "(Selecione)"
-            opcoes_validas = []
+    ctx.wait_for_selector(
+        "#Confirmacao_btnSaldoCreditos",
+        timeout=deadline.timeout(60000),
+    )
 
-            for opt in opcoes_cartorio:
+    ctx.click("#Confirmacao_btnSaldoCreditos", timeout=deadline.timeout(60000))
 
-                value = opt.get_attribute("value")
+    # micro renderização após escolher forma de pagamento
+    page.wait_for_timeout(deadline.timeout(1500))
 
-                if value and value != "-1":
+    # aguarda botão concluir ficar habilitado
+    _wait_enabled(
+        ctx,
+        "#Confirmacao_btnConcluirPedido",
+        timeout=deadline.timeout(60000),
+    )
 
-                    opcoes_validas.append(opt)
 
-            # ------------------------------------------------
-            # CASO 1 — SOMENTE UM CARTÓRIO
-            # ------------------------------------------------
+def _concluir_pedido(page, ctx, etapas: Etapas, deadline: Deadline) -> None:
+    etapas.iniciar("concluir")
 
-            if len(opcoes_validas) == 1:
+    print("➡ Concluindo pedido")
 
-                unico = opcoes_validas[0]
+    ctx.click("#Confirmacao_btnConcluirPedido", timeout=deadline.timeout(60000))
 
-                cartorio_value = unico.get_attribute("value")
-                cartorio_label = unico.inner_text().strip()
+    # aguarda a tela reagir
+    # (pedido já concluído: o prazo só encurta as esperas daqui em
+    # diante, nunca impede que os resultados sejam gravados)
+    page.wait_for_timeout(max(0, min(4000, deadline.restante_ms())))
 
-                ctx.select_option("#Cartorio_ddlCartorio", value=cartorio_value)
+    # tenta aguardar algum indício de finalização:
+    # protocolo ou link de download
+    try:
+        ctx.wait_for_function(
+            """
+            () => {
+                return !!document.querySelector("a[href*='Download']")
+                    || !!document.body.innerText.match(/protocolo/i)
+                    || !!document.body.innerText.match(/pedido realizado/i);
+            }
+            """,
+            timeout=deadline.timeout(60000)
+        )
+    except Exception:
+        pass
 
-                print(f"✔ Cartório único selecionado automaticamente: {cartorio_label}")
 
-            else:
+def _protocolo(protocolos: list[str], i: int) -> str | None:
+    return protocolos[i] if i < len(protocolos) else None
 
-                # ------------------------------------------------
-                # CASO 2 — MAIS DE UM CARTÓRIO
-                # ------------------------------------------------
 
-                cartorio_input = str(cartorio).strip().lower()
+def _baixar_pdfs(page, context, ctx, deadline: Deadline, protocolos: list[str]) -> list[str]:
+    """
+    PDFs da tela final, na ordem dos links. O i-ésimo é do i-ésimo
+    protocolo da confirmação e leva o número dele no nome do arquivo.
+    """
+    print("➡ Procurando downloads")
+
+    arquivos_pdf = []
+
+    pdf_links = ctx.locator("a[href*='Download']").all()
 
-                cartorio_value = None
-                cartorio_label = None
+    # links com URL comum: todos agendados de uma vez (HTTP em
+    # paralelo); os demais seguem pelo clique. A ordem dos links
+    # é mantida em arquivos_pdf.
+    with BaixadorHTTP(context, DOWNLOAD_DIR) as baixador:
 
-                for opt in opcoes_validas:
+        pendentes = []
 
-                    value = opt.get_attribute("value")
-                    texto = opt.inner_text().strip().lower()
+        for i, link in enumerate(pdf_links):
 
-                    texto_limpo = (
-                        texto.replace("º", "")
-                        .replace("-", "")
-                        .replace("  ", " ")
-                        .strip()
+            url = href_direto(link)
+
+            if url:
+                pendentes.append(
+                    baixador.agendar(
+                        url,
+                        timeout_s=max(5.0, min(60.0, deadline.restante_ms() / 1000)),
+                        page=page,
+                        protocolo=_protocolo(protocolos, i),
                     )
+                )
+            else:
+                pendentes.append(link)
 
-                    # ------------------------------------------------
-                    # CASO A — VALUE DIRETO (2663)
-                    # ------------------------------------------------
+        for i, pendente in enumerate(pendentes):
 
-                    if cartorio_input == value:
+            try:
 
-                        cartorio_value = value
-                        cartorio_label = opt.inner_text().strip()
-                        break
+                if isinstance(pendente, Future):
+                    try:
+                        file_path = pendente.result()
+                    except Exception as e:
+                        # HTTP falhou: tenta o clique no mesmo link
+                        print(f"⚠ Download direto falhou ({e}), tentando clique")
+                        file_path = _baixar_por_clique(
+                            page, pdf_links[i], deadline, _protocolo(protocolos, i)
+                        )
+                else:
+                    file_path = _baixar_por_clique(
+                        page, pendente, deadline, _protocolo(protocolos, i)
+                    )
 
-                    # ------------------------------------------------
-                    # CASO B — NÚMERO (1 → 01º)
-                    # ------------------------------------------------
+                arquivos_pdf.append(str(file_path))
 
-                    if texto_limpo.startswith(cartorio_input):
+                print(f"✔ Download realizado: {file_path.name}")
 
-                        cartorio_value = value
-                        cartorio_label = opt.inner_text().strip()
-                        break
+            except Exception as e:
+                print(f"⚠ Falha ao baixar arquivo: {e}")
 
-                    # ------------------------------------------------
-                    # CASO C — TEXTO COMPLETO
-                    # ------------------------------------------------
+    return arquivos_pdf
 
-                    if cartorio_input in texto:
 
-                        cartorio_value = value
-                        cartorio_label = opt.inner_text().strip()
-                        break
+def _itens_do_pedido(
+    grupo: dict, resultados: list[dict], arquivos_pdf: list[str], project_id
+) -> list[dict]:
+    """
+    Linhas da confirmação -> itens de persist_documents_and_results. A
+    tabela lista os itens na ordem das tags, então a i-ésima linha (e o
+    i-ésimo PDF) é da i-ésima matrícula do grupo.
+    """
+    matriculas = grupo["matriculas"]
+    itens = []
 
-                if not cartorio_value:
+    if resultados:
 
-                    raise Exception(
-                        f"Cartório '{cartorio}' não encontrado nas opções disponíveis"
-                    )
+        for i, r in enumerate(resultados):
 
-                ctx.select_option("#Cartorio_ddlCartorio", value=cartorio_value)
+            pdf_path = arquivos_pdf[i] if i < len(arquivos_pdf) else (
+                arquivos_pdf[0] if arquivos_pdf and len(matriculas) == 1 else None
+            )
 
-                print(f"✔ Cartório selecionado: {cartorio_label}")
+            relative_path = None
+
+            if pdf_path:
+                relative_path = f"ri-digital/{Path(pdf_path).name}"
+
+            metadata = {
+                "tipo_certidao": r["tipo_certidao"],
+                "tipo_pedido": r["tipo_pedido"],
+                "prazo": r["prazo"],
+                "valor": r["valor"],
+                "pdf_status": "OK" if pdf_path else "NAO_DISPONIVEL",
+            }
+
+            itens.append(
+                {
+                    "data": {
+                        "protocolo": r["numero"],
+                        "matricula": matriculas[i] if i < len(matriculas) else None,
+                        "cartorio": r["cartorio"],
+                        "data_pedido": None,
+                        "file_path": relative_path,
+                        "metadata_json": metadata,
+                    },
+                    "document": {
+                        "project_id": project_id,
+                        "filename": Path(pdf_path).name if pdf_path else None,
+                        "file_path": relative_path,
+                    },
+                }
+            )
 
-            page.wait_for_timeout(1000)
+    else:
+
+        # fallback: se não conseguiu capturar tabela, ainda salva PDFs
+        for i, pdf_path in enumerate(arquivos_pdf):
+
+            relative_path = f"ri-digital/{Path(pdf_path).name}"
+
+            metadata = {
+                "pdf_status": "OK"
+            }
+
+            itens.append(
+                {
+                    "data": {
+                        "protocolo": None,
+                        "matricula": matriculas[i] if i < len(matriculas) else None,
+                        "cartorio": grupo["cartorio"],
+                        "data_pedido": None,
+                        "file_path": relative_path,
+                        "metadata_json": metadata,
+                    },
+                    "document": {
+                        "project_id": project_id,
+                        "filename": Path(pdf_path).name,
+                        "file_path": relative_path,
+                    },
+                }
+            )
 
-            # ------------------------------------------------
-            # PROSSEGUIR
-            # ------------------------------------------------
+    return itens
+
+
+# =========================================================
+# LIVRO DE PEDIDOS / RECONCILIAÇÃO
+# =========================================================
+# Cada matrícula vai para o livro (ENVIANDO) logo antes do clique em
+# Concluir Pedido e passa a CONCLUIDO quando o portal aceita. Numa
+# retentativa:
+#   - CONCLUIDO: não pede de novo, grava o resultado guardado;
+#   - ENVIANDO: o job anterior caiu no meio do envio; procura o pedido
+#     em lstPedidos antes de pagar outra vez.
+
+def _chave_pedido(user_id, grupo: dict, matricula: str, finalidade: str) -> str:
+    """Hash de (usuário, UF, cidade, cartório, matrícula, tipo, finalidade)."""
+    partes = (
+        str(user_id or ""),
+        grupo["uf"],
+        normalizar(grupo["cidade"]),
+        normalizar(grupo["cartorio"]),
+        matricula,
+        f"{_TIPO_CERTIDAO}/{_PEDIDO_POR}",
+        finalidade,
+    )
+    return hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()
+
+
+def _pedidos_do_livro(grupo: dict, finalidade: str) -> list[dict]:
+    return [
+        {
+            "chave": grupo["chaves"][m],
+            "uf": grupo["uf"],
+            "cidade": grupo["cidade"],
+            "cartorio": grupo["cartorio"],
+            "matricula": m,
+            "tipo": f"{_TIPO_CERTIDAO}/{_PEDIDO_POR}",
+            "finalidade": finalidade,
+        }
+        for m in grupo["matriculas"]
+    ]
+
+
+def _concluidos_do_pedido(grupo: dict, resultados: list[dict]) -> dict[str, dict]:
+    """{chave: data} de cada matrícula do pedido recém-concluído (sem PDF)."""
+    por_matricula = {
+        item["data"]["matricula"]: item["data"]
+        for item in _itens_do_pedido(grupo, resultados, [], None)
+        if item["data"].get("matricula")
+    }
+
+    concluidos = {}
+    for m in grupo["matriculas"]:
+        concluidos[grupo["chaves"][m]] = por_matricula.get(m) or {
+            "protocolo": None,
+            "matricula": m,
+            "cartorio": grupo["cartorio"],
+            "data_pedido": None,
+            "file_path": None,
+            "metadata_json": {"pdf_status": "NAO_DISPONIVEL"},
+        }
+    return concluidos
 
-            print("➡ Prosseguindo")
 
-            _wait_enabled(ctx, "#Cartorio_btnGoNext")
+def _item_reaproveitado(data: dict, origem: str) -> dict:
+    metadata = dict(data.get("metadata_json") or {})
+    metadata["livro_pedidos"] = origem
+    return {"data": {**data, "metadata_json": metadata}}
 
-            ctx.click("#Cartorio_btnGoNext")
 
-            page.wait_for_load_state("networkidle")
+def _so_digitos(valor: str | None) -> str:
+    return re.sub(r"\D", "", valor or "").lstrip("0")
 
-            # ------------------------------------------------
-            # TIPO CERTIDAO
-            # ------------------------------------------------
 
-            print("➡ Selecionando tipo certidão")
+def _abrir_protocolo(page, linha, deadline: Deadline) -> None:
+    """Abre lstConsultaPedidos do protocolo da linha de lstPedidos."""
+    if linha.links[0]:
+        page.goto(linha.links[0], wait_until="domcontentloaded", timeout=deadline.timeout(120000))
+    else:
+        linha.locator.locator("td").nth(0).locator("a").click(timeout=deadline.timeout(30000))
+        page.wait_for_url(
+            re.compile(r".*/CertidaoDigital/lstConsultaPedidos\.aspx.*"),
+            timeout=deadline.timeout(120000),
+        )
 
-            ctx.wait_for_selector("#TipoCertidao_ddlTipoCertidao", timeout=60000)
+    page.wait_for_selector("#Grid tbody tr", timeout=deadline.timeout(120000))
 
-            ctx.select_option("#TipoCertidao_ddlTipoCertidao", value="3")
 
-            ctx.wait_for_timeout(500)
+def _reconciliar(page, grupo: dict, pendentes: dict[str, dict], deadline: Deadline) -> dict[str, dict]:
+    """
+    pendentes: {matrícula: linha ENVIANDO do livro}. Abre os pedidos de
+    lstPedidos feitos desde o envio (páginas mais recentes) e procura,
+    no modal de cada item, a matrícula na mesma cidade. Devolve
+    {matrícula: data} dos que o portal já tem.
+    """
+    desde = min(p["updated_at"] for p in pendentes.values()).date() - timedelta(days=1)
+    faltam = set(pendentes)
+    cidade = normalizar(grupo["cidade"])
+    encontrados = {}
 
-            ctx.select_option("#TipoCertidao_ddlPedidoPor", value="4")
+    print(f"➡ Reconciliando {len(faltam)} matrícula(s) com lstPedidos (desde {desde:%d/%m/%Y})")
 
-            page.wait_for_timeout(1000)
+    page.goto(
+        f"{RI_DIGITAL_BASE_URL}/CertidaoDigital/lstPedidos.aspx",
+        wait_until="domcontentloaded",
+        timeout=deadline.timeout(120000),
+    )
 
-            print("➡ Prosseguindo")
+    pedidos = GridPaginado(page, deadline, max_paginas=_PAGINAS_RECONCILIACAO)
 
-            _wait_enabled(ctx, "#TipoCertidao_btnGoNext")
+    for linha in pedidos.linhas():
+        if not faltam:
+            break
+        if len(linha.celulas) < 4:
+            continue
 
-            ctx.click("#TipoCertidao_btnGoNext")
+        protocolo, data = linha.celulas[1:3]
+        try:
+            dia = datetime.strptime(data.strip(), "%d/%m/%Y").date()
+        except ValueError:
+            continue  # cabeçalho
+        if dia < desde:
+            continue
 
-            # aguarda ASP.NET atualizar tela
-            ctx.wait_for_selector("#txtTag", timeout=60000)
+        print(f"➡ Conferindo protocolo {protocolo} ({data})")
+        _abrir_protocolo(page, linha, deadline)
 
-                       # ------------------------------------------------
-            # MATRÍCULA
-            # ------------------------------------------------
+        for item in GridPaginado(page, deadline).linhas():
+            if not faltam:
+                break
+            if len(item.celulas) < 3 or normalizar(item.celulas[1]) in ("", "protocolo"):
+                continue
 
-            print(f"➡ Informando matrícula {matricula}")
+            try:
+                detalhes = capturar_detalhes(page, item.locator, deadline)
+            except PrazoExcedido:
+                raise
+            except Exception as e:
+                print(f"⚠ Falha ao abrir detalhes na reconciliação: {e}")
+                continue
+
+            local = normalizar(detalhes.get("cartorio_cidade_modal"))
+            if local and cidade not in local:
+                continue
+
+            matricula = next(
+                (
+                    m for m in faltam
+                    if _so_digitos(m) and _so_digitos(m) == _so_digitos(detalhes.get("matricula"))
+                ),
+                None,
+            )
+            if not matricula:
+                continue
+
+            print(f"✔ Matrícula {matricula} já pedida no protocolo {protocolo}")
+            faltam.discard(matricula)
+            encontrados[matricula] = {
+                "protocolo": detalhes.get("protocolo_modal") or item.celulas[1],
+                "matricula": matricula,
+                "cartorio": item.celulas[2],
+                "data_pedido": dia.isoformat(),
+                "file_path": None,
+                "metadata_json": {
+                    "numero_pedido": protocolo,
+                    "tipo_certidao": detalhes.get("tipo_certidao"),
+                    "tipo_pedido": detalhes.get("pedido_por"),
+                    "status": detalhes.get("status_modal"),
+                    "pdf_status": "NAO_DISPONIVEL",
+                },
+            }
+
+    return encontrados
+
+
+def _gravar_reaproveitados(job, grupo: dict, dados: dict[str, dict], origem: str) -> None:
+    """Grava {matrícula: data} de pedidos que não passam pelo wizard."""
+    persist_documents_and_results(
+        job["id"], [_item_reaproveitado(d, origem) for d in dados.values()]
+    )
+    for m in dados:
+        save_job_checkpoint(job["id"], grupo["chaves"][m], {"matricula": m})
 
-            ctx.wait_for_selector("#txtTag", timeout=60000)
 
-            ctx.fill("#txtTag", "")
+def _vale_para_job(anterior: dict, job_id, agora: datetime) -> bool:
+    """Linha do livro vale para o job: é dele (retentativa) ou é recente."""
+    if str(anterior.get("job_id")) == str(job_id):
+        return True
+    limite = agora - timedelta(hours=RI_DIGITAL_PEDIDO_REUSO_HORAS)
+    return RI_DIGITAL_PEDIDO_REUSO_HORAS > 0 and anterior["updated_at"] >= limite
 
-            ctx.fill("#txtTag", matricula)
 
-            # confirmar matrícula (teclado pertence à page, não ao frame)
-            page.keyboard.press("Enter")
+def _aplicar_livro(job, grupo: dict, livro: dict[str, dict], concluidas: dict) -> None:
+    """
+    Antes do browser: tira do grupo as matrículas já gravadas neste job
+    ou já pedidas (grava o resultado guardado) e separa em
+    grupo["pendentes"] as que ficaram ENVIANDO, para reconciliar.
+    Linha do livro de outro job, mais velha que
+    RI_DIGITAL_PEDIDO_REUSO_HORAS, é ignorada: a matrícula é pedida de novo.
+    """
+    reaproveitados = {}
+    grupo["pendentes"] = {}
+    restantes = []
+    agora = datetime.now(timezone.utc)
 
-            page.wait_for_timeout(1000)
+    for m in grupo["matriculas"]:
+        chave = grupo["chaves"][m]
+        anterior = livro.get(chave)
 
-            print("➡ Prosseguindo")
+        if chave in concluidas:
+            print(f"↩ Matrícula {m} já gravada neste job, pulando")
+            continue
 
-            _wait_enabled(ctx, "#PorMatriculaComComplemento_btnGoNext")
+        if anterior and not _vale_para_job(anterior, job["id"], agora):
+            print(f"🛠️ Matrícula {m}: pedido anterior (job {anterior['job_id']}) fora da janela, pedindo de novo")
+            anterior = None
 
-            ctx.click("#PorMatriculaComComplemento_btnGoNext")
+        if anterior and anterior["status"] == "CONCLUIDO":
+            print(f"↩ Matrícula {m} já pedida (protocolo {anterior['protocolo']}), sem novo pedido")
+            reaproveitados[m] = anterior["result_json"]
+            continue
 
-            page.wait_for_load_state("networkidle")
+        if anterior:
+            grupo["pendentes"][m] = anterior
+        restantes.append(m)
 
-            # ------------------------------------------------
-            # CAPTURAR TABELA DE CONFIRMAÇÃO
-            # ------------------------------------------------
+    if reaproveitados:
+        _gravar_reaproveitados(job, grupo, reaproveitados, "CONCLUIDO")
 
-            print("➡ Capturando dados da tabela de confirmação")
+    grupo["matriculas"] = restantes
 
-            resultados = []
 
-            ctx.wait_for_selector("table tbody tr", timeout=60000)
+def _reconciliar_grupo(page, job, grupo: dict, deadline: Deadline) -> None:
+    """Matrículas ENVIANDO que o portal já tem saem do grupo (e são gravadas)."""
+    if not grupo["pendentes"]:
+        return
 
-            linhas = ctx.locator("table tbody tr").all()
+    encontrados = _reconciliar(page, grupo, grupo["pendentes"], deadline)
 
-            for linha in linhas:
+    for m in grupo["pendentes"]:
+        if m not in encontrados:
+            print(f"⚠ Matrícula {m} não encontrada em lstPedidos, pedindo de novo")
 
-                colunas = linha.locator("td").all()
+    if encontrados:
+        save_pedidos_concluidos(
+            job["id"], {grupo["chaves"][m]: d for m, d in encontrados.items()}
+        )
+        _gravar_reaproveitados(job, grupo, encontrados, "RECONCILIADO")
+        grupo["matriculas"] = [m for m in grupo["matriculas"] if m not in encontrados]
+
+
+def _solicitar_grupo(
+    page,
+    context,
+    job,
+    grupo: dict,
+    finalidade: str,
+    catalogo: Catalogo,
+    localizador: _LocalizadorWizard,
+    etapas: Etapas,
+    deadline: Deadline,
+) -> tuple[list[dict], list[str]]:
+    """
+    Um pedido completo (wizard + pagamento + downloads) para um cartório.
+    Devolve (linhas da confirmação, PDFs baixados).
 
-                # tabela esperada:
-                # 0 detalhes
-                # 1 número
-                # 2 cartório
-                # 3 tipo certidão
-                # 4 tipo pedido
-                # 5 prazo
-                # 6 valor
-                # 7 excluir
-                if len(colunas) < 7:
-                    continue
+    As matrículas entram no livro (ENVIANDO) logo antes do clique em
+    Concluir Pedido; se o livro não grava, o pedido não é enviado.
+    """
+    etapas.iniciar("navegacao")
+    _abrir_novo_pedido(page, deadline)
 
-                numero = colunas[1].inner_text().strip()
-                cartorio_nome = colunas[2].inner_text().strip()
-                tipo_certidao = colunas[3].inner_text().strip()
-                tipo_pedido = colunas[4].inner_text().strip()
-                prazo = colunas[5].inner_text().strip()
-                valor = colunas[6].inner_text().strip()
+    etapas.iniciar("mapa")
+    ctx = _selecionar_estado(page, localizador, grupo["uf"], deadline)
 
-                # ignora linha total / vazias
-                if not numero:
-                    continue
+    etapas.iniciar("termo")
+    _aceitar_termo(page, ctx, deadline)
 
-                if numero.lower() == "total":
-                    continue
+    etapas.iniciar("cidade_cartorio")
+    _selecionar_cidade_cartorio(page, ctx, grupo, catalogo, deadline)
 
-                resultados.append(
-                    {
-                        "numero": numero,
-                        "cartorio": cartorio_nome,
-                        "tipo_certidao": tipo_certidao,
-                        "tipo_pedido": tipo_pedido,
-                        "prazo": prazo,
-                        "valor": valor,
-                    }
-                )
+    etapas.iniciar("tipo_certidao")
+    _selecionar_tipo_certidao(page, ctx, deadline)
 
-            print(f"✔ Itens capturados da tabela: {len(resultados)}")
+    etapas.iniciar("matricula")
+    _informar_matriculas(page, ctx, grupo["matriculas"], deadline)
 
-            # ------------------------------------------------
-            # FINALIDADE
-            # ------------------------------------------------
+    etapas.iniciar("confirmacao_leitura")
+    resultados = _ler_confirmacao(ctx, deadline)
 
-            print(f"➡ Selecionando finalidade {finalidade}")
+    _escolher_pagamento(page, ctx, finalidade, etapas, deadline)
 
-            ctx.wait_for_selector("#Confirmacao_ddlTipoFinalidade", timeout=60000)
+    save_pedidos_enviando(job["id"], job.get("user_id"), _pedidos_do_livro(grupo, finalidade))
 
-            ctx.select_option("#Confirmacao_ddlTipoFinalidade", value=finalidade)
+    _concluir_pedido(page, ctx, etapas, deadline)
 
-            # ASP.NET faz micro atualização da tela
-            page.wait_for_timeout(1500)
-            # ------------------------------------------------
-            # PAGAMENTO
-            # ------------------------------------------------
+    # pedido feito: falha ao gravar o livro não pode perder os
+    # downloads; a linha fica ENVIANDO e a retentativa reconcilia
+    try:
+        save_pedidos_concluidos(job["id"], _concluidos_do_pedido(grupo, resultados))
+    except Exception as e:
+        print(f"⚠ Falha ao atualizar livro de pedidos: {e}")
 
-            print("➡ Pagamento saldo")
+    etapas.iniciar("download")
+    arquivos_pdf = _baixar_pdfs(
+        page, context, ctx, deadline, [r["numero"] for r in resultados]
+    )
 
-            ctx.wait_for_selector("#Confirmacao_btnSaldoCreditos", timeout=60000)
+    return resultados, arquivos_pdf
 
-            ctx.click("#Confirmacao_btnSaldoCreditos")
 
-            # micro renderização após escolher forma de pagamento
-            page.wait_for_timeout(1500)
+def executar_job_ri_digital_solicitar_certidao(job, login, senha):
 
-            # aguarda botão concluir ficar habilitado
-            _wait_enabled(ctx, "#Confirmacao_btnConcluirPedido", timeout=60000)
+    payload = job["payload_json"]
 
-            # ------------------------------------------------
-            # CONCLUIR
-            # ------------------------------------------------
+    grupos = _grupos_do_payload(payload)
+    finalidade = str(payload["finalidade"])
 
-            print("➡ Concluindo pedido")
+    # cidade/cartório inexistentes são rejeitados aqui, antes do browser
+    catalogos = {}
+    for grupo in grupos:
+        if grupo["uf"] not in catalogos:
+            catalogos[grupo["uf"]] = Catalogo.carregar(grupo["uf"])
+        grupo.update(catalogos[grupo["uf"]].resolver(grupo["cidade"], grupo["cartorio"]))
+
+    project_id = job.get("project_id")
 
-            ctx.click("#Confirmacao_btnConcluirPedido")
+    # retentativa: o que já foi pedido não passa de novo pelo wizard
+    for grupo in grupos:
+        grupo["chaves"] = {
+            m: _chave_pedido(job.get("user_id"), grupo, m, finalidade)
+            for m in grupo["matriculas"]
+        }
 
-            # aguarda a tela reagir
-            page.wait_for_timeout(4000)
+    livro = fetch_pedidos_certidao([c for g in grupos for c in g["chaves"].values()])
+    concluidas = fetch_job_checkpoints(job["id"])
 
-            # tenta aguardar algum indício de finalização:
-            # protocolo ou link de download
-            try:
-                ctx.wait_for_function(
-                    """
-                    () => {
-                        return !!document.querySelector("a[href*='Download']")
-                            || !!document.body.innerText.match(/protocolo/i)
-                            || !!document.body.innerText.match(/pedido realizado/i);
-                    }
-                    """,
-                    timeout=60000
-                )
-            except Exception:
-                pass
+    for grupo in grupos:
+        _aplicar_livro(job, grupo, livro, concluidas)
 
-            # ------------------------------------------------
-            # DOWNLOAD
-            # ------------------------------------------------
+    grupos = [g for g in grupos if g["matriculas"]]
 
-            print("➡ Procurando downloads")
+    if not grupos:
+        print("✔ Todas as matrículas já foram pedidas, nada a solicitar")
+        return True
 
-            arquivos_pdf = []
+    deadline = Deadline.para_job(job)
+    debug = Depuracao.para_job(job, "solicitar", deadline)
 
-            pdf_links = ctx.locator("a[href*='Download']").all()
+    etapas = Etapas("solicitar")
+    etapas.iniciar("browser")
 
-            for link in pdf_links:
+    with sync_playwright() as p:
 
-                try:
+        browser = p.chromium.launch(
+            headless=True,
+            args=["--no-sandbox", "--disable-dev-shm-usage"],
+        )
+        registrar_browser(browser)
 
-                    with page.expect_download(timeout=30000) as download_info:
-                        link.click()
+        context = browser.new_context(accept_downloads=True)
+        page = context.new_page()
 
-                    download = download_info.value
+        page.set_default_timeout(60000)
 
-                    file_path = DOWNLOAD_DIR / download.suggested_filename
+        # LOGS
+        page.on("console", lambda msg: print(f"[PAGE CONSOLE] {msg.type}: {msg.text}"))
+        page.on("pageerror", lambda e: print(f"[PAGE ERROR] {e}"))
+        page.on("requestfailed", lambda r: print(f"[REQUEST FAILED] {r.url}"))
 
-                    download.save_as(file_path)
+        debug.iniciar_trace(context)
 
-                    arquivos_pdf.append(str(file_path))
+        try:
 
-                    print(f"✔ Download realizado: {file_path.name}")
+            print("➡ Iniciando automação RI Digital Certidão")
 
-                except Exception as e:
-                    print(f"⚠ Falha ao baixar arquivo: {e}")
+            # LOGIN (um só para todos os pedidos do lote)
+            etapas.iniciar("login")
+            _login(page, login, senha, deadline)
 
             # ------------------------------------------------
-            # SALVAR RESULTADOS
+            # UM PEDIDO POR CARTÓRIO
             # ------------------------------------------------
+            # Um grupo que falha não desfaz os anteriores (já pagos e
+            # gravados): os demais seguem e o job termina com erro
+            # listando os que faltaram.
 
-            print("➡ Salvando resultados")
+            falhas = []
+            localizador = _LocalizadorWizard()
 
-            if resultados:
+            for n, grupo in enumerate(grupos, start=1):
 
-                for i, r in enumerate(resultados):
+                debug.marco(f"pedido_{n}")
 
-                    pdf_path = arquivos_pdf[i] if i < len(arquivos_pdf) else (
-                        arquivos_pdf[0] if arquivos_pdf else None
-                    )
+                print(
+                    f"➡ Pedido {n}/{len(grupos)}: {grupo['cidade']}/{grupo['uf']} / {grupo['cartorio']} "
+                    f"({len(grupo['matriculas'])} matrícula(s))"
+                )
 
-                    relative_path = None
-
-                    if pdf_path:
-                        relative_path = f"ri-digital/{Path(pdf_path).name}"
-
-                    metadata = {
-                        "tipo_certidao": r["tipo_certidao"],
-                        "tipo_pedido": r["tipo_pedido"],
-                        "prazo": r["prazo"],
-                        "valor": r["valor"],
-                        "pdf_status": "OK" if pdf_path else "NAO_DISPONIVEL",
-                    }
-
-                    insert_result(
-                        job["id"],
-                        {
-                            "protocolo": r["numero"],
-                            "matricula": matricula,
-                            "cartorio": r["cartorio"],
-                            "data_pedido": None,
-                            "file_path": relative_path,
-                            "metadata_json": metadata,
-                        },
+                try:
+                    etapas.iniciar("reconciliacao")
+                    _reconciliar_grupo(page, job, grupo, deadline)
+
+                    if not grupo["matriculas"]:
+                        continue
+
+                    resultados, arquivos_pdf = _solicitar_grupo(
+                        page,
+                        context,
+                        job,
+                        grupo,
+                        finalidade,
+                        catalogos[grupo["uf"]],
+                        localizador,
+                        etapas,
+                        deadline,
                     )
+                except Exception as e:
+                    # pedido único: mesmo fluxo de erro de sempre
+                    if len(grupos) == 1:
+                        raise
 
-                    if pdf_path and project_id:
+                    if isinstance(e, PrazoExcedido):
+                        falhas.extend(f"{g['cartorio']}: {e}" for g in grupos[n - 1:])
+                        break
 
-                        filename = Path(pdf_path).name
+                    print(f"⚠ Falha no pedido {n}: {e}")
+                    _debug_page_info(page, f"erro_pedido_{n}")
+                    debug.snapshot(page, f"erro_pedido_{n}", falha=True)
+                    falhas.append(f"{grupo['cartorio']}: {e}")
+                    continue
 
-                        create_document(
-                            project_id,
-                            filename,
-                            relative_path,
-                        )
+                # ------------------------------------------------
+                # SALVAR RESULTADOS
+                # ------------------------------------------------
 
-            else:
+                etapas.iniciar("persistencia")
 
-                # fallback: se não conseguiu capturar tabela, ainda salva PDFs
-                for pdf_path in arquivos_pdf:
-
-                    relative_path = f"ri-digital/{Path(pdf_path).name}"
-
-                    metadata = {
-                        "pdf_status": "OK"
-                    }
-
-                    insert_result(
-                        job["id"],
-                        {
-                            "protocolo": None,
-                            "matricula": matricula,
-                            "cartorio": cartorio,
-                            "data_pedido": None,
-                            "file_path": relative_path,
-                            "metadata_json": metadata,
-                        },
-                    )
+                print("➡ Salvando resultados")
+
+                # resultados + documents do pedido numa transação só
+                persist_documents_and_results(
+                    job["id"], _itens_do_pedido(grupo, resultados, arquivos_pdf, project_id)
+                )
 
-                    if project_id:
+                for m in grupo["matriculas"]:
+                    save_job_checkpoint(job["id"], grupo["chaves"][m], {"matricula": m})
 
-                        filename = Path(pdf_path).name
+            etapas.encerrar()
 
-                        create_document(
-                            project_id,
-                            filename,
-                            relative_path,
-                        )
+            if falhas:
+                raise Exception(
+                    f"{len(falhas)} de {len(grupos)} pedido(s) falharam: " + "; ".join(falhas)
+                )
 
             print("✔ Automação finalizada com sucesso")
 
-            context.tracing.stop(path=str(DEBUG_DIR / "trace.zip"))
+            debug.finalizar_trace(erro=False)
+            debug.relatorio()
 
             browser.close()
 
@@ -717,26 +1282,18 @@ def executar_job_ri_digital_solicitar_certidao(job, login, senha):
 
         except Exception as e:
 
+            etapas.encerrar()
+
             print("⚠ ERRO NA AUTOMAÇÃO")
 
             _debug_page_info(page, "erro")
 
             _debug_frames(page, "erro")
 
-            _debug_snapshot(page, "erro_automacao")
+            debug.snapshot(page, "erro_automacao", falha=True)
 
-            try:
-                context.tracing.stop(path=str(DEBUG_DIR / "trace.zip"))
-            except Exception:
-                pass
-
-            try:
-                page.screenshot(
-                    path="/app/data/ri_digital_solicitar_certidao_erro.png",
-                    full_page=True,
-                )
-            except Exception:
-                pass
+            debug.finalizar_trace(erro=True)
+            debug.relatorio()
 
             browser.close()
 
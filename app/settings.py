@@ -23,6 +23,41 @@ BACKEND_UPLOADS_BASE = os.getenv("BACKEND_UPLOADS_BASE", "/app/app/uploads")
 RI_DIGITAL_DIR = os.path.join(DATA_DIR, "ri-digital")
 ONR_SIGRI_DIR = os.path.join(DATA_DIR, "onr-sigri")
 
+# Pasta de diagnósticos (screenshots/HTML/traces) das automações
+DEBUG_DIR = os.getenv("DEBUG_DIR", "/app/debug")
+# Política de diagnóstico (debug_policy.py): off | falha | amostra
+DEBUG_MODO = os.getenv("DEBUG_MODO", "falha").strip().lower()
+# Fração dos jobs com captura completa no modo amostra (0.05 = 5%)
+DEBUG_AMOSTRA = float(os.getenv("DEBUG_AMOSTRA", "0.05"))
+# Pedaços do trace (um por etapa) mantidos para o caso de erro
+DEBUG_TRACE_PEDACOS = int(os.getenv("DEBUG_TRACE_PEDACOS", "3"))
+# Retenção dos artefatos (artifacts.py): idade máxima, cota total e
+# intervalo da limpeza em segundo plano (0 desliga cada um)
+ARTEFATOS_MAX_HORAS = int(os.getenv("ARTEFATOS_MAX_HORAS", "72"))
+ARTEFATOS_MAX_MB = int(os.getenv("ARTEFATOS_MAX_MB", "1024"))
+ARTEFATOS_LIMPEZA_S = int(os.getenv("ARTEFATOS_LIMPEZA_S", "600"))
+
+# =========================================================
+# PORTAIS EXTERNOS
+# =========================================================
+# Sobrescrevível para apontar as automações para um stand-in local
+# (ver benchmarks/ri_digital_fake).
+RI_DIGITAL_BASE_URL = os.getenv("RI_DIGITAL_BASE_URL", "https://ridigital.org.br").rstrip("/")
+# Páginas simultâneas no mesmo login para abrir as linhas da Visualização
+# de Matrícula e os protocolos do Consultar Certidão (1 = um por vez).
+# Sobrescrito por job com payload_json["paginas_paralelas"]; limitado a
+# RI_DIGITAL_PAGINAS_MAX.
+RI_DIGITAL_PAGINAS = int(os.getenv("RI_DIGITAL_PAGINAS", "1"))
+RI_DIGITAL_PAGINAS_MAX = int(os.getenv("RI_DIGITAL_PAGINAS_MAX", "6"))
+# Validade do catálogo de cidades/cartórios do wizard de certidão
+# (cartorios.py). Vencido, o wizard relê os dropdowns e atualiza o catálogo.
+RI_DIGITAL_CATALOGO_TTL_HORAS = int(os.getenv("RI_DIGITAL_CATALOGO_TTL_HORAS", "168"))
+# Janela em que um pedido de certidão do livro (CONCLUIDO ou ENVIANDO) de
+# outro job ainda vale para a mesma matrícula. Fora dela a matrícula é
+# pedida de novo (certidões vencem); a retentativa do mesmo job sempre
+# reaproveita. 0 = só o mesmo job.
+RI_DIGITAL_PEDIDO_REUSO_HORAS = int(os.getenv("RI_DIGITAL_PEDIDO_REUSO_HORAS", "24"))
+
 # =========================================================
 # 🔴 COMPATIBILIDADE COM RI DIGITAL
 # =========================================================
@@ -37,3 +72,67 @@ DOWNLOAD_DIR = RI_DIGITAL_DIR
 # Exemplo real: /data/certs/onr_cert.pfx
 ONR_PFX_PATH = os.getenv("ONR_PFX_PATH", "")
 ONR_PFX_PASSWORD = os.getenv("ONR_PFX_PASSWORD", "")
+
+# =========================================================
+# CIRCUIT BREAKER POR PORTAL
+# =========================================================
+# Falhas consecutivas de conectividade/timeout para abrir o circuito
+# e tempo (s) até tentar o probe de meia-abertura.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_COOLDOWN_SECONDS = int(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "120"))
+CIRCUIT_PROBE_TIMEOUT_SECONDS = int(os.getenv("CIRCUIT_PROBE_TIMEOUT_SECONDS", "10"))
+
+# =========================================================
+# ORÇAMENTO DE TEMPO POR JOB (DEADLINE)
+# =========================================================
+# Tempo máximo (s) por tipo de job. Pode ser sobrescrito por job
+# com payload_json["deadline_seconds"].
+JOB_DEADLINE_SECONDS = {
+    "RI_DIGITAL_MATRICULA": int(os.getenv("DEADLINE_RI_DIGITAL_MATRICULA", "1800")),
+    "RI_DIGITAL_SOLICITAR_CERTIDAO": int(os.getenv("DEADLINE_RI_DIGITAL_SOLICITAR_CERTIDAO", "600")),
+    "RI_DIGITAL_CONSULTAR_CERTIDAO": int(os.getenv("DEADLINE_RI_DIGITAL_CONSULTAR_CERTIDAO", "1800")),
+    "OCR_DOCUMENT": int(os.getenv("DEADLINE_OCR_DOCUMENT", "600")),
+    "ONR_SIGRI_CONSULTA": int(os.getenv("DEADLINE_ONR_SIGRI_CONSULTA", "600")),
+}
+JOB_DEADLINE_DEFAULT_SECONDS = int(os.getenv("JOB_DEADLINE_DEFAULT_SECONDS", "900"))
+
+# =========================================================
+# MÉTRICAS (ENDPOINT PROMETHEUS)
+# =========================================================
+# Vazio/0 desliga o endpoint. Ex.: METRICS_PORT=9108 -> http://<host>:9108/metrics
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+# Intervalo mínimo (s) entre consultas de profundidade da fila no scrape
+METRICS_QUEUE_DEPTH_TTL_SECONDS = int(os.getenv("METRICS_QUEUE_DEPTH_TTL_SECONDS", "15"))
+
+# =========================================================
+# OCR
+# =========================================================
+# Resolução de rasterização das páginas de PDF escaneado enviadas ao Vision
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "220"))
+# Endpoint alternativo do Google Vision (ex.: stub local http://127.0.0.1:9000).
+# Vazio usa o endpoint oficial. A OpenAI já respeita OPENAI_BASE_URL.
+VISION_API_ENDPOINT = os.getenv("VISION_API_ENDPOINT", "")
+
+# =========================================================
+# CACHE EM PROCESSO (CREDENCIAIS / PROMPTS)
+# =========================================================
+# Validade (s) das entradas; o NOTIFY dos triggers invalida antes disso.
+# CACHE_TTL_SECONDS=0 desliga o cache.
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ITEMS = int(os.getenv("CACHE_MAX_ITEMS", "1024"))
+
+# =========================================================
+# ESCRITA ASSÍNCRONA NO BANCO (AUTOMAÇÕES COM BROWSER)
+# =========================================================
+# Tamanho da fila do escritor em background; cheia, a automação espera.
+# 0 grava de forma síncrona (comportamento antigo, útil para depuração).
+DB_WRITER_QUEUE_SIZE = int(os.getenv("DB_WRITER_QUEUE_SIZE", "100"))
+
+# =========================================================
+# DOWNLOADS DIRETOS (HTTP COM A SESSÃO DO BROWSER)
+# =========================================================
+# Links com href comum são baixados via HTTP (cookies do contexto do
+# Playwright), vários em paralelo; botões de postback seguem pelo clique.
+DOWNLOAD_HTTP_ENABLED = os.getenv("DOWNLOAD_HTTP_ENABLED", "1") == "1"
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))
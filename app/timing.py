@@ -0,0 +1,121 @@
+# geoincra_worker/app/timing.py
+import math
+import threading
+import time
+from contextlib import ContextDecorator
+
+
+# =========================================================
+# TIMER DO JOB
+# =========================================================
+# O worker processa um job por vez, então existe no máximo um timer
+# ativo no processo. É global (e não ContextVar) para que threads
+# auxiliares do job também registrem nele.
+
+_timer_atual = None
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    idx = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[idx]
+
+
+class JobTimer:
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.amostras: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa: str, ms: float) -> None:
+        with self._lock:
+            self.amostras.setdefault(etapa, []).append(ms)
+
+    def resumo(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                etapa: {
+                    "count": len(valores),
+                    "total_ms": round(sum(valores), 1),
+                    "p50_ms": round(_percentil(valores, 50), 1),
+                    "p95_ms": round(_percentil(valores, 95), 1),
+                }
+                for etapa, valores in self.amostras.items()
+            }
+
+
+class span(ContextDecorator):
+    """
+    Cronometra uma etapa do job atual. Uso:
+
+        with span("ri_digital.login"):
+            ...
+
+        @span("db.insert_result")
+        def insert_result(...):
+            ...
+
+    Sem job ativo é um no-op barato.
+    """
+
+    def __init__(self, etapa: str):
+        self.etapa = etapa
+        self._inicio = 0.0
+
+    def _recreate_cm(self):
+        # Como decorador, cada chamada ganha sua própria instância
+        # (chamadas concorrentes não compartilham _inicio).
+        return span(self.etapa)
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timer = _timer_atual
+        if timer is not None:
+            timer.registrar(self.etapa, (time.perf_counter() - self._inicio) * 1000)
+        return False
+
+
+class Etapas:
+    """
+    Cronômetro de etapas sequenciais, para fluxos longos (wizard, login)
+    onde envolver cada trecho num `with` exigiria reindentar tudo:
+
+        etapas = Etapas("solicitar")
+        etapas.iniciar("login")
+        ...
+        etapas.iniciar("mapa")   # encerra "login"
+        ...
+        etapas.encerrar()
+    """
+
+    def __init__(self, prefixo: str):
+        self.prefixo = prefixo
+        self._atual: span | None = None
+
+    def iniciar(self, nome: str) -> None:
+        self.encerrar()
+        self._atual = span(f"{self.prefixo}.{nome}").__enter__()
+
+    def encerrar(self) -> None:
+        if self._atual is not None:
+            self._atual.__exit__(None, None, None)
+            self._atual = None
+
+
+def iniciar_job(job_id) -> JobTimer:
+    global _timer_atual
+    _timer_atual = JobTimer(job_id)
+    return _timer_atual
+
+
+def finalizar_job() -> dict[str, dict]:
+    """
+    Encerra o timer atual e devolve o resumo por etapa
+    (count, total_ms, p50_ms, p95_ms).
+    """
+    global _timer_atual
+    timer, _timer_atual = _timer_atual, None
+    return timer.resumo() if timer else {}
@@ -0,0 +1,154 @@
+"""
+Benchmark do pipeline de OCR com Vision e OpenAI simulados.
+
+Gera um corpus sintético (PDF nativo, escaneado, misto e JPEG grande),
+sobe stubs locais com latência ajustável e mede, por documento,
+extrair_texto_documento e interpretar_texto: páginas/s, bytes enviados
+ao Vision, latência ponta a ponta e RSS de pico.
+
+    python -m benchmarks.bench_ocr --pages 10 --dpi 150,220,300 \\
+        --vision-latency-ms 300 --openai-latency-ms 800 --concurrency 1,4
+
+Cada combinação de DPI roda num subprocesso próprio (settings é lido
+no import), o que também isola o RSS medido.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (
+    AmostradorRss,
+    Cronometro,
+    imprimir_tabela,
+    preparar_ambiente,
+)
+
+
+def _rodada(args) -> list[list]:
+    """Executa dentro do subprocesso: um DPI, todas as concorrências."""
+    from benchmarks.ocr_corpus import gerar_corpus
+    from benchmarks.ocr_stubs import ConfigStub, iniciar
+
+    servidor, base_url = iniciar(
+        ConfigStub(
+            vision_latency_ms=args.vision_latency_ms,
+            vision_ms_por_mb=args.vision_ms_por_mb,
+            openai_latency_ms=args.openai_latency_ms,
+        )
+    )
+    preparar_ambiente(
+        OCR_PDF_DPI=args.dpi,
+        VISION_API_ENDPOINT=base_url,
+        OPENAI_BASE_URL=f"{base_url}/v1",
+        OPENAI_API_KEY="bench",
+    )
+
+    import ocr_worker
+
+    corpus = gerar_corpus(
+        os.path.join(tempfile.mkdtemp(prefix="geoincra_ocr_"), "corpus"),
+        args.pages,
+        dpi_scan=args.scan_dpi,
+        jpeg_dpi=args.jpeg_dpi,
+    )
+
+    contadores = servidor.contadores
+    linhas = []
+
+    def processar(caminho: str):
+        with Cronometro() as extr:
+            texto = ocr_worker.extrair_texto_documento(caminho)
+        with Cronometro() as interp:
+            ocr_worker.interpretar_texto("Extraia os dados da matrícula.", texto)
+        return extr.segundos, interp.segundos
+
+    for concorrencia in args.concurrency:
+        for nome, caminho, paginas in corpus:
+            contadores.zerar()
+
+            with AmostradorRss() as rss, Cronometro() as total:
+                with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+                    tempos = list(pool.map(processar, [caminho] * concorrencia))
+
+            extr = sum(t[0] for t in tempos) / len(tempos)
+            interp = sum(t[1] for t in tempos) / len(tempos)
+
+            linhas.append(
+                [
+                    nome,
+                    int(args.dpi),
+                    concorrencia,
+                    paginas,
+                    paginas * concorrencia / total.segundos,
+                    extr * 1000,
+                    interp * 1000,
+                    total.segundos * 1000,
+                    contadores.vision_chamadas,
+                    contadores.vision_bytes / 1024 / 1024 / concorrencia,
+                    rss.pico_proprio_kb / 1024,
+                ]
+            )
+
+    servidor.shutdown()
+    return linhas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--dpi", default="220", help="lista de DPIs de rasterização, ex.: 150,220")
+    parser.add_argument("--scan-dpi", type=int, default=200, help="DPI das páginas escaneadas geradas")
+    parser.add_argument("--jpeg-dpi", type=int, default=300)
+    parser.add_argument("--concurrency", default="1", help="documentos simultâneos, ex.: 1,4")
+    parser.add_argument("--vision-latency-ms", type=int, default=200)
+    parser.add_argument("--vision-ms-por-mb", type=int, default=0)
+    parser.add_argument("--openai-latency-ms", type=int, default=500)
+    parser.add_argument("--_rodada", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    args.concurrency = [int(c) for c in str(args.concurrency).split(",")]
+
+    if args._rodada:
+        print(json.dumps(_rodada(args)))
+        return
+
+    linhas = []
+    for dpi in [int(d) for d in args.dpi.split(",")]:
+        cmd = [
+            sys.executable, "-m", "benchmarks.bench_ocr", "--_rodada",
+            "--dpi", str(dpi),
+            "--pages", str(args.pages),
+            "--scan-dpi", str(args.scan_dpi),
+            "--jpeg-dpi", str(args.jpeg_dpi),
+            "--concurrency", ",".join(str(c) for c in args.concurrency),
+            "--vision-latency-ms", str(args.vision_latency_ms),
+            "--vision-ms-por-mb", str(args.vision_ms_por_mb),
+            "--openai-latency-ms", str(args.openai_latency_ms),
+        ]
+        saida = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        linhas.extend(json.loads(saida.strip().splitlines()[-1]))
+
+    imprimir_tabela(
+        [
+            "documento",
+            "dpi",
+            "conc",
+            "paginas",
+            "paginas_s",
+            "extrair_ms",
+            "interpretar_ms",
+            "total_ms",
+            "vision_calls",
+            "upload_mb_doc",
+            "pico_rss_mb",
+        ],
+        linhas,
+    )
+
+
+if __name__ == "__main__":
+    main()
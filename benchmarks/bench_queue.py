@@ -0,0 +1,335 @@
+"""
+Benchmark de contenção da fila automation_jobs sob vários claimers.
+
+Cria um schema isolado (padrão bench_queue) no Postgres informado,
+popula automation_jobs com volume realista (pendentes + histórico
+COMPLETED/FAILED) e roda N threads chamando db.fetch_pending_job, cada
+uma com sua conexão por chamada, como o worker faz em produção.
+
+Reporta claims/s, latência por claim, espera em lock (amostrada em
+pg_stat_activity) e o plano da query de claim antes e depois da carga.
+
+    python -m benchmarks.bench_queue --dsn postgresql://... \\
+        --pending 50000 --history 200000 --claimers 1,5,20 --claims 2000
+
+--sql aplica SQL extra depois do seed (ex.: índice candidato) para
+comparar planos e throughput antes do rollout:
+
+    python -m benchmarks.bench_queue --dsn ... \\
+        --sql "CREATE INDEX ON automation_jobs (created_at) WHERE status = 'PENDING'"
+
+O schema é removido no final, a menos que --keep seja usado.
+"""
+import argparse
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import make_dsn
+
+from benchmarks.common import Cronometro, imprimir_tabela, percentil, preparar_ambiente
+
+# Proporção aproximada dos tipos na fila (soma 1.0)
+MIX_TIPOS = (
+    ("OCR_DOCUMENT", 0.55),
+    ("RI_DIGITAL_MATRICULA", 0.2),
+    ("RI_DIGITAL_CONSULTAR_CERTIDAO", 0.15),
+    ("RI_DIGITAL_SOLICITAR_CERTIDAO", 0.1),
+)
+
+DDL = """
+CREATE TABLE automation_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    project_id INTEGER,
+    type VARCHAR(64) NOT NULL,
+    status VARCHAR(32) NOT NULL,
+    payload_json JSONB,
+    error_message TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+)
+"""
+
+
+def _case_tipo() -> str:
+    """CASE que sorteia o tipo conforme MIX_TIPOS a partir de random()."""
+    partes, acumulado = [], 0.0
+    for tipo, peso in MIX_TIPOS[:-1]:
+        acumulado += peso
+        partes.append(f"WHEN r < {acumulado} THEN '{tipo}'")
+    return f"CASE {' '.join(partes)} ELSE '{MIX_TIPOS[-1][0]}' END"
+
+
+def semear(conn, schema: str, pendentes: int, historico: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"SET search_path = {schema}")
+        cur.execute(DDL)
+
+        # histórico antigo (últimos 30 dias) + pendentes recentes (última hora)
+        cur.execute(
+            f"""
+            INSERT INTO automation_jobs
+                (user_id, project_id, type, status, payload_json, created_at, started_at, finished_at)
+            SELECT
+                1 + (g %% 500),
+                1 + (g %% 2000),
+                {_case_tipo()},
+                CASE WHEN g %% 10 = 0 THEN 'FAILED' ELSE 'COMPLETED' END,
+                jsonb_build_object('document_id', g),
+                c,
+                c + interval '5 seconds',
+                c + interval '90 seconds'
+            FROM (
+                SELECT g, random() AS r, NOW() - random() * interval '30 days' AS c
+                FROM generate_series(1, %s) g
+            ) s
+            """,
+            (historico,),
+        )
+        cur.execute(
+            f"""
+            INSERT INTO automation_jobs (user_id, project_id, type, status, payload_json, created_at)
+            SELECT
+                1 + (g %% 500),
+                1 + (g %% 2000),
+                {_case_tipo()},
+                'PENDING',
+                jsonb_build_object('document_id', g),
+                NOW() - random() * interval '1 hour'
+            FROM (
+                SELECT g, random() AS r
+                FROM generate_series(1, %s) g
+            ) s
+            """,
+            (pendentes,),
+        )
+    conn.commit()
+
+
+def aplicar_sql(conn, comandos: list[str]) -> None:
+    with conn.cursor() as cur:
+        for sql in comandos:
+            print(f"🛠️ {sql}")
+            cur.execute(sql)
+    conn.commit()
+
+
+def resetar_fila(conn) -> None:
+    """Devolve os jobs reivindicados à fila e limpa tuplas mortas entre rodadas."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE automation_jobs
+            SET status = 'PENDING', started_at = NULL
+            WHERE status = 'PROCESSING'
+            """
+        )
+    conn.commit()
+
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE automation_jobs")
+    conn.autocommit = False
+
+
+def plano_claim(conn, sql_claim: str, tipos: list[str]) -> str:
+    """EXPLAIN ANALYZE da query de claim, desfeito com rollback."""
+    with conn.cursor() as cur:
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql_claim}", (tipos,))
+        linhas = [r[0] for r in cur.fetchall()]
+    conn.rollback()
+    return "\n".join(linhas)
+
+
+# =========================================================
+# AMOSTRAGEM DE LOCKS
+# =========================================================
+
+class AmostradorLocks:
+    """
+    Amostra pg_stat_activity do banco em background e estima o tempo
+    total de espera por locks (backends aguardando × intervalo).
+    """
+
+    def __init__(self, dsn: str, intervalo: float = 0.02):
+        self.dsn = dsn
+        self.intervalo = intervalo
+        self.espera_ms = 0.0
+        self.max_aguardando = 0
+        self.amostras = 0
+        self._parar = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _loop(self) -> None:
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                while not self._parar.is_set():
+                    cur.execute(
+                        """
+                        SELECT COUNT(*)
+                        FROM pg_stat_activity
+                        WHERE datname = current_database()
+                          AND pid <> pg_backend_pid()
+                          AND wait_event_type = 'Lock'
+                        """
+                    )
+                    aguardando = cur.fetchone()[0]
+                    self.amostras += 1
+                    self.max_aguardando = max(self.max_aguardando, aguardando)
+                    self.espera_ms += aguardando * self.intervalo * 1000
+                    self._parar.wait(self.intervalo)
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+        return False
+
+
+# =========================================================
+# CLAIMERS
+# =========================================================
+
+def rodar_claimers(fetch_pending_job, tipos: list[str], claimers: int, claims: int):
+    """
+    Dispara `claimers` threads que reivindicam até `claims` jobs no total.
+    Retorna (latências em ms, claims vazios).
+    """
+    restantes = [claims]
+    lock = threading.Lock()
+    latencias: list[float] = []
+    vazios = [0]
+
+    def claimer():
+        while True:
+            with lock:
+                if restantes[0] <= 0:
+                    return
+                restantes[0] -= 1
+
+            inicio = time.perf_counter()
+            job = fetch_pending_job(tipos)
+            duracao = (time.perf_counter() - inicio) * 1000
+
+            with lock:
+                latencias.append(duracao)
+                if job is None:
+                    vazios[0] += 1
+
+    threads = [threading.Thread(target=claimer) for _ in range(claimers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return latencias, vazios[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--dsn",
+        default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"),
+        help="Postgres de teste (padrão: BENCH_DATABASE_URL/DATABASE_URL)",
+    )
+    parser.add_argument("--schema", default="bench_queue")
+    parser.add_argument("--pending", type=int, default=50000)
+    parser.add_argument("--history", type=int, default=200000)
+    parser.add_argument("--claimers", default="1,5,20", help="lista de níveis de concorrência")
+    parser.add_argument("--claims", type=int, default=2000, help="claims por rodada")
+    parser.add_argument("--types", default="", help="tipos reivindicados (padrão: JOB_TYPES)")
+    parser.add_argument("--sql", action="append", default=[], help="SQL aplicado após o seed")
+    parser.add_argument("--keep", action="store_true", help="não remover o schema no final")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error("informe --dsn ou BENCH_DATABASE_URL")
+
+    dsn = make_dsn(args.dsn, options=f"-c search_path={args.schema}")
+    preparar_ambiente(DATABASE_URL=dsn)
+
+    import db
+
+    tipos = [t for t in args.types.split(",") if t] or list(db.JOB_TYPES)
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        print(f"🌱 Semeando {args.pending} pendentes + {args.history} históricos em {args.schema}...")
+        with Cronometro() as seed:
+            semear(conn, args.schema, args.pending, args.history)
+        print(f"✅ Seed em {seed.segundos:.1f}s")
+
+        if args.sql:
+            aplicar_sql(conn, args.sql)
+
+        resetar_fila(conn)
+
+        print("\n📋 Plano da query de claim (antes da carga):")
+        print(plano_claim(conn, db.SQL_FETCH_PENDING_JOB, tipos))
+
+        linhas = []
+        for claimers in [int(c) for c in args.claimers.split(",")]:
+            with AmostradorLocks(dsn) as locks, Cronometro() as total:
+                latencias, vazios = rodar_claimers(
+                    db.fetch_pending_job, tipos, claimers, args.claims
+                )
+
+            reivindicados = len(latencias) - vazios
+            linhas.append(
+                [
+                    claimers,
+                    reivindicados,
+                    vazios,
+                    reivindicados / total.segundos,
+                    percentil(latencias, 50),
+                    percentil(latencias, 95),
+                    percentil(latencias, 99),
+                    locks.espera_ms,
+                    locks.max_aguardando,
+                ]
+            )
+
+            print(f"\n📋 Plano após {claimers} claimer(s) (fila sem VACUUM):")
+            print(plano_claim(conn, db.SQL_FETCH_PENDING_JOB, tipos))
+
+            resetar_fila(conn)
+
+        print()
+        imprimir_tabela(
+            [
+                "claimers",
+                "claims",
+                "vazios",
+                "claims_s",
+                "p50_ms",
+                "p95_ms",
+                "p99_ms",
+                "lock_wait_ms",
+                "max_em_espera",
+            ],
+            linhas,
+        )
+    finally:
+        if not args.keep:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+            conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Benchmark ponta a ponta das automações RI Digital contra o stand-in local.
+
+Sobe benchmarks/ri_digital_fake, aponta RI_DIGITAL_BASE_URL para ele e
+executa executar_ri_digital, o worker de consulta e o de solicitação
+com jobs sintéticos, reportando tempo por job, tempo por linha e RSS de
+pico do Chromium. Não precisa de credenciais.
+
+    python -m benchmarks.bench_ri_digital --rows 30 --latency-ms 80 --repeat 3
+
+Por padrão a persistência é substituída por um coletor em memória
+(mede só o fluxo de páginas). Com --db as escritas vão para o
+DATABASE_URL configurado.
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import (
+    AmostradorRss,
+    Cronometro,
+    imprimir_tabela,
+    percentil,
+    preparar_ambiente,
+)
+from benchmarks.ri_digital_fake.server import ConfigFake, iniciar
+
+FLUXOS = ("matricula", "consultar", "solicitar")
+
+# Funções de db importadas por nome nos módulos das automações
+_FUNCOES_DB = (
+    "insert_result",
+    "create_document",
+    "persist_document_and_result",
+    "persist_documents_and_results",
+    "fetch_certidao_sync",
+    "save_certidao_sync_item",
+    "save_certidao_sync_protocolo",
+    "fetch_job_checkpoints",
+    "save_job_checkpoint",
+    "fetch_pedidos_certidao",
+    "save_pedidos_enviando",
+    "save_pedidos_concluidos",
+)
+
+
+class ColetorResultados:
+    """Substitui a persistência: guarda o instante de cada resultado."""
+
+    def __init__(self, sync: tuple[dict, dict] | None = None):
+        self.instantes: list[float] = []
+        self._doc_id = 0
+        self._sync_protocolos, self._sync_itens = sync or ({}, {})
+
+    def insert_result(self, job_id, data, row_key=None):
+        self.instantes.append(time.perf_counter())
+
+    def create_document(self, *args, **kwargs):
+        self._doc_id += 1
+        return self._doc_id
+
+    def persist_document_and_result(self, job_id, data, document=None, row_key=None):
+        self.insert_result(job_id, data, row_key)
+        if document and document.get("project_id") and document.get("file_path"):
+            return self.create_document(), len(self.instantes)
+        return None, len(self.instantes)
+
+    def persist_documents_and_results(self, job_id, itens):
+        return [
+            self.persist_document_and_result(
+                job_id, item["data"], item.get("document"), item.get("row_key")
+            )
+            for item in itens
+        ]
+
+    def fetch_job_checkpoints(self, job_id):
+        return {}
+
+    def save_job_checkpoint(self, *args, **kwargs):
+        return None
+
+    # livro de pedidos vazio: toda repetição do solicitar passa pelo wizard
+    def fetch_pedidos_certidao(self, chaves):
+        return {}
+
+    def save_pedidos_enviando(self, *args, **kwargs):
+        return None
+
+    def save_pedidos_concluidos(self, *args, **kwargs):
+        return None
+
+    # estado de sincronização em memória: com --repeat, a partir da
+    # segunda execução o consultar mede o caminho incremental
+    def fetch_certidao_sync(self, user_id):
+        return dict(self._sync_protocolos), dict(self._sync_itens)
+
+    def save_certidao_sync_item(self, user_id, protocolo, item, status, file_path, file_sha256, result):
+        self._sync_itens[f"{protocolo}/{item}"] = {
+            "status": status,
+            "file_path": file_path,
+            "file_sha256": file_sha256,
+            "result_json": result,
+        }
+
+    def save_certidao_sync_protocolo(self, user_id, protocolo, status):
+        self._sync_protocolos[protocolo] = status
+
+
+def _instalar_coletor(modulos, coletor: ColetorResultados) -> None:
+    for modulo in modulos:
+        for nome in _FUNCOES_DB:
+            if hasattr(modulo, nome):
+                setattr(modulo, nome, getattr(coletor, nome))
+
+
+def _job(fluxo: str, n: int, rows: int, lote: int = 1) -> dict:
+    hoje = date.today()
+
+    if fluxo == "matricula":
+        return {
+            "id": f"bench-vm-{n}",
+            "type": "RI_DIGITAL_MATRICULA",
+            "project_id": 1,
+            "payload_json": {
+                "data_inicio": (hoje - timedelta(days=rows)).isoformat(),
+                "data_fim": hoje.isoformat(),
+            },
+        }
+
+    if fluxo == "consultar":
+        return {
+            "id": f"bench-consulta-{n}",
+            "type": "RI_DIGITAL_CONSULTAR_CERTIDAO",
+            "project_id": 1,
+            "user_id": 1,
+            "payload_json": {},
+        }
+
+    return {
+        "id": f"bench-solicitar-{n}",
+        "type": "RI_DIGITAL_SOLICITAR_CERTIDAO",
+        "project_id": 1,
+        "payload_json": {
+            "cidade": "Porto Velho",
+            "cartorio": "1",
+            "matriculas": [str(12345 + k) for k in range(lote)],
+            "finalidade": "3",
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--itens", type=int, default=2, help="itens por pedido (consultar)")
+    parser.add_argument("--page-size", type=int, default=0, help="linhas por página em lstPedidos")
+    parser.add_argument("--batch", type=int, default=1, help="matrículas por pedido (solicitar)")
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--pdf-kb", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--flows", default=",".join(FLUXOS))
+    parser.add_argument("--db", action="store_true", help="persistir no DATABASE_URL real")
+    args = parser.parse_args()
+
+    servidor, base_url = iniciar(
+        ConfigFake(
+            rows=args.rows,
+            itens_por_pedido=args.itens,
+            pagina=args.page_size,
+            latency_ms=args.latency_ms,
+            pdf_kb=args.pdf_kb,
+        )
+    )
+    base_dir = preparar_ambiente(RI_DIGITAL_BASE_URL=base_url)
+    print(f"RI Digital fake: {base_url} | artefatos em {base_dir}")
+
+    import ri_digital
+    import ri_digital_consultar_certidao_worker as consultar
+    import ri_digital_solicitar_certidao_worker as solicitar
+
+    modulos = (ri_digital, consultar, solicitar)
+
+    def executar(fluxo: str, job: dict) -> None:
+        if fluxo == "matricula":
+            ri_digital.executar_ri_digital(job, {"login": "bench", "password_encrypted": "bench"})
+        elif fluxo == "consultar":
+            consultar.executar_job_ri_digital_consultar_certidao(job, "bench", "bench")
+        else:
+            solicitar.executar_job_ri_digital_solicitar_certidao(job, "bench", "bench")
+
+    linhas = []
+
+    for fluxo in [f.strip() for f in args.flows.split(",") if f.strip()]:
+        sync = ({}, {})
+        for n in range(args.repeat):
+            coletor = ColetorResultados(sync)
+            if not args.db:
+                _instalar_coletor(modulos, coletor)
+
+            with AmostradorRss() as rss, Cronometro() as cron:
+                executar(fluxo, _job(fluxo, n, args.rows, args.batch))
+
+            instantes = coletor.instantes
+            por_linha = [
+                (b - a) * 1000 for a, b in zip(instantes, instantes[1:])
+            ]
+
+            linhas.append(
+                [
+                    fluxo,
+                    n + 1,
+                    cron.segundos,
+                    len(instantes),
+                    percentil(por_linha, 50),
+                    percentil(por_linha, 95),
+                    rss.pico_descendentes_kb / 1024,
+                    rss.pico_proprio_kb / 1024,
+                ]
+            )
+
+    print()
+    imprimir_tabela(
+        [
+            "fluxo",
+            "rep",
+            "job_s",
+            "resultados",
+            "linha_p50_ms",
+            "linha_p95_ms",
+            "browser_rss_mb",
+            "python_rss_mb",
+        ],
+        linhas,
+    )
+
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
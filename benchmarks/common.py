@@ -0,0 +1,145 @@
+"""
+Utilitários compartilhados pelos benchmarks do worker.
+
+Os benchmarks importam os módulos de app/ como o container faz
+(PYTHONPATH=/app/app), então preparar_ambiente() precisa rodar antes
+de qualquer import de app/ — settings.py lê as variáveis no import.
+"""
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app"))
+
+
+def preparar_ambiente(base_dir: str | None = None, **env) -> str:
+    """
+    Aponta DATA_DIR/BACKEND_UPLOADS_BASE/DEBUG_DIR para um diretório
+    temporário, aplica variáveis extras e coloca app/ no sys.path.
+    """
+    base_dir = base_dir or tempfile.mkdtemp(prefix="geoincra_bench_")
+
+    os.environ.setdefault("DATA_DIR", os.path.join(base_dir, "data"))
+    os.environ.setdefault("BACKEND_UPLOADS_BASE", os.path.join(base_dir, "uploads"))
+    os.environ.setdefault("DEBUG_DIR", os.path.join(base_dir, "debug"))
+
+    for chave, valor in env.items():
+        os.environ[chave] = str(valor)
+
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+
+    return base_dir
+
+
+def percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    idx = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[idx]
+
+
+def imprimir_tabela(cabecalho: list[str], linhas: list[list]) -> None:
+    texto = [[str(c) for c in cabecalho]] + [
+        [f"{c:.1f}" if isinstance(c, float) else str(c) for c in linha]
+        for linha in linhas
+    ]
+    larguras = [max(len(l[i]) for l in texto) for i in range(len(cabecalho))]
+
+    for n, linha in enumerate(texto):
+        print("  ".join(c.rjust(larguras[i]) for i, c in enumerate(linha)))
+        if n == 0:
+            print("  ".join("-" * w for w in larguras))
+
+
+# =========================================================
+# RSS (Linux /proc)
+# =========================================================
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _filhos_por_pai() -> dict[int, list[int]]:
+    filhos: dict[int, list[int]] = {}
+    for nome in os.listdir("/proc"):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nome}/stat") as f:
+                # o nome do processo pode ter espaços: ppid vem após o ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        filhos.setdefault(ppid, []).append(int(nome))
+    return filhos
+
+
+def rss_descendentes_kb(pid: int | None = None) -> int:
+    """RSS somado de todos os processos descendentes (Chromium, driver)."""
+    pid = pid or os.getpid()
+    filhos = _filhos_por_pai()
+
+    total = 0
+    pendentes = list(filhos.get(pid, []))
+    while pendentes:
+        atual = pendentes.pop()
+        total += _rss_kb(atual)
+        pendentes.extend(filhos.get(atual, []))
+    return total
+
+
+class AmostradorRss:
+    """
+    Amostra em background o RSS do próprio processo e dos descendentes
+    e guarda os picos.
+    """
+
+    def __init__(self, intervalo: float = 0.2):
+        self.intervalo = intervalo
+        self.pico_proprio_kb = 0
+        self.pico_descendentes_kb = 0
+        self._parar = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _loop(self) -> None:
+        while not self._parar.is_set():
+            self.pico_proprio_kb = max(self.pico_proprio_kb, _rss_kb(os.getpid()))
+            self.pico_descendentes_kb = max(
+                self.pico_descendentes_kb,
+                rss_descendentes_kb(),
+            )
+            self._parar.wait(self.intervalo)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+        return False
+
+
+class Cronometro:
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        self.segundos = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.segundos = time.perf_counter() - self.inicio
+        return False
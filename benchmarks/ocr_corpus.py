@@ -0,0 +1,77 @@
+"""
+Corpus sintético para o benchmark de OCR.
+
+Gera, com PyMuPDF, PDFs nativos (texto), escaneados (só imagem), mistos
+(páginas alternadas) e JPEGs grandes, com número de páginas e
+resolução configuráveis.
+"""
+import os
+
+import fitz
+
+_PARAGRAFO = (
+    "MATRÍCULA Nº {n}. IMÓVEL: lote rural denominado Fazenda Boa Vista, situado no "
+    "município de Porto Velho, Estado de Rondônia, com área de 120,5000 ha, "
+    "confrontando ao norte com a Linha C-10, ao sul com o Rio Candeias. "
+    "PROPRIETÁRIO: João da Silva, CPF 000.000.000-00. R-1: compra e venda. "
+)
+
+
+def _texto_pagina(n: int) -> str:
+    return "\n".join(_PARAGRAFO.format(n=n * 100 + i) for i in range(12))
+
+
+def _pagina_nativa(doc: fitz.Document, n: int) -> None:
+    page = doc.new_page(width=595, height=842)
+    page.insert_textbox(fitz.Rect(50, 50, 545, 800), _texto_pagina(n), fontsize=9)
+
+
+def _imagem_pagina(n: int, dpi: int) -> fitz.Pixmap:
+    origem = fitz.open()
+    _pagina_nativa(origem, n)
+    pix = origem[0].get_pixmap(dpi=dpi, alpha=False)
+    origem.close()
+    return pix
+
+
+def _pagina_escaneada(doc: fitz.Document, n: int, dpi: int) -> None:
+    pix = _imagem_pagina(n, dpi)
+    page = doc.new_page(width=595, height=842)
+    page.insert_image(page.rect, stream=pix.tobytes("jpeg"))
+
+
+def gerar_pdf(caminho: str, tipo: str, paginas: int, dpi_scan: int = 200) -> str:
+    doc = fitz.open()
+
+    for n in range(paginas):
+        if tipo == "nativo" or (tipo == "misto" and n % 2 == 0):
+            _pagina_nativa(doc, n)
+        else:
+            _pagina_escaneada(doc, n, dpi_scan)
+
+    doc.save(caminho, deflate=True)
+    doc.close()
+    return caminho
+
+
+def gerar_jpeg(caminho: str, dpi: int = 300) -> str:
+    with open(caminho, "wb") as f:
+        f.write(_imagem_pagina(0, dpi).tobytes("jpeg"))
+    return caminho
+
+
+def gerar_corpus(destino: str, paginas: int, dpi_scan: int = 200, jpeg_dpi: int = 300):
+    """
+    Retorna [(nome, caminho, paginas)] para os quatro tipos de documento.
+    """
+    os.makedirs(destino, exist_ok=True)
+
+    corpus = []
+    for tipo in ("nativo", "escaneado", "misto"):
+        caminho = os.path.join(destino, f"{tipo}_{paginas}p.pdf")
+        corpus.append((f"pdf_{tipo}", gerar_pdf(caminho, tipo, paginas, dpi_scan), paginas))
+
+    caminho = os.path.join(destino, f"imagem_{jpeg_dpi}dpi.jpg")
+    corpus.append(("jpeg_grande", gerar_jpeg(caminho, jpeg_dpi), 1))
+
+    return corpus
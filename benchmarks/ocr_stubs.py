@@ -0,0 +1,133 @@
+"""
+Stubs locais do Google Vision (REST images:annotate) e da OpenAI
+(chat/completions) com latência ajustável e contagem de bytes.
+
+O worker é apontado para eles por VISION_API_ENDPOINT e OPENAI_BASE_URL.
+"""
+import json
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+@dataclass
+class ConfigStub:
+    vision_latency_ms: int = 0
+    # latência por página do Vision proporcional ao tamanho da imagem
+    vision_ms_por_mb: int = 0
+    openai_latency_ms: int = 0
+
+
+class Contadores:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.vision_chamadas = 0
+        self.vision_bytes = 0
+        self.openai_chamadas = 0
+        self.openai_bytes = 0
+
+    def zerar(self) -> None:
+        with self._lock:
+            self.vision_chamadas = 0
+            self.vision_bytes = 0
+            self.openai_chamadas = 0
+            self.openai_bytes = 0
+
+    def somar(self, servico: str, tamanho: int) -> None:
+        with self._lock:
+            if servico == "vision":
+                self.vision_chamadas += 1
+                self.vision_bytes += tamanho
+            else:
+                self.openai_chamadas += 1
+                self.openai_bytes += tamanho
+
+
+_TEXTO_OCR = (
+    "REGISTRO DE IMÓVEIS - MATRÍCULA Nº 12.345 - IMÓVEL: lote rural denominado "
+    "Fazenda Boa Vista, situado no município de Porto Velho/RO, com área de 120,5 ha. "
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _json(self, dados) -> None:
+        corpo = json.dumps(dados).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        config: ConfigStub = self.server.config
+        contadores: Contadores = self.server.contadores
+        caminho = urlsplit(self.path).path
+
+        if caminho.endswith("images:annotate"):
+            contadores.somar("vision", len(corpo))
+            atraso = config.vision_latency_ms + config.vision_ms_por_mb * len(corpo) / 1e6
+            time.sleep(atraso / 1000)
+
+            pedidos = json.loads(corpo or b"{}").get("requests") or [{}]
+            self._json(
+                {
+                    "responses": [
+                        {
+                            "fullTextAnnotation": {"text": _TEXTO_OCR * 8},
+                            "textAnnotations": [{"description": _TEXTO_OCR * 8}],
+                        }
+                        for _ in pedidos
+                    ]
+                }
+            )
+            return
+
+        if caminho.endswith("/chat/completions"):
+            contadores.somar("openai", len(corpo))
+            time.sleep(config.openai_latency_ms / 1000)
+
+            conteudo = json.dumps(
+                {"matricula": "12.345", "municipio": "Porto Velho", "area_ha": 120.5}
+            )
+            self._json(
+                {
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": "gpt-4o-mini",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": conteudo},
+                        }
+                    ],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }
+            )
+            return
+
+        self.send_response(404)
+        self.end_headers()
+
+
+def iniciar(config: ConfigStub | None = None, host: str = "127.0.0.1", porta: int = 0):
+    """
+    Sobe o stub numa thread daemon. Retorna (servidor, base_url); o
+    mesmo servidor atende Vision (/v1/images:annotate) e OpenAI
+    (/v1/chat/completions). Contadores em servidor.contadores.
+    """
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    servidor.daemon_threads = True
+    servidor.config = config or ConfigStub()
+    servidor.contadores = Contadores()
+
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    return servidor, f"http://{host}:{servidor.server_port}"
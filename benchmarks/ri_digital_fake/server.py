@@ -0,0 +1,443 @@
+"""
+Stand-in local do RI Digital para benchmarks sem credenciais.
+
+Serve as páginas que as automações tocam (Acesso.aspx, DefaultVM.aspx,
+PedidoFinalizadoVM.aspx, lstPedidos.aspx, lstConsultaPedidos.aspx, o
+wizard CertidaoDigital/Default.aspx e os downloads de PDF) a partir das
+fixtures em fixtures/, com os mesmos ids/seletores do portal.
+
+Uso isolado:
+
+    python -m benchmarks.ri_digital_fake.server --port 8089 --rows 50 --latency-ms 80
+
+e depois RI_DIGITAL_BASE_URL=http://127.0.0.1:8089 no worker.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from string import Template
+from urllib.parse import parse_qs, unquote_plus, urlparse
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+ESTADOS = {
+    "AC": "Acre", "AL": "Alagoas", "AM": "Amazonas", "AP": "Amapá", "BA": "Bahia",
+    "CE": "Ceará", "DF": "Distrito Federal", "ES": "Espírito Santo", "GO": "Goiás",
+    "MA": "Maranhão", "MG": "Minas Gerais", "MS": "Mato Grosso do Sul",
+    "MT": "Mato Grosso", "PA": "Pará", "PB": "Paraíba", "PE": "Pernambuco",
+    "PI": "Piauí", "PR": "Paraná", "RJ": "Rio de Janeiro", "RN": "Rio Grande do Norte",
+    "RO": "Rondônia", "RR": "Roraima", "RS": "Rio Grande do Sul",
+    "SC": "Santa Catarina", "SE": "Sergipe", "SP": "São Paulo", "TO": "Tocantins",
+}
+
+CIDADES = {
+    "RO": [
+        ("1100205", "PORTO VELHO", ["01º Ofício de Registro de Imóveis", "02º Ofício de Registro de Imóveis"]),
+        ("1100122", "JI-PARANÁ", ["01º Ofício de Registro de Imóveis"]),
+        ("1100023", "ARIQUEMES", ["01º Ofício de Registro de Imóveis"]),
+        ("1100304", "VILHENA", ["01º Ofício de Registro de Imóveis"]),
+    ],
+}
+
+
+@dataclass
+class ConfigFake:
+    rows: int = 20
+    itens_por_pedido: int = 2
+    # linhas por página dos GridViews de DefaultVM e lstPedidos (0 = sem paginação)
+    pagina: int = 0
+    latency_ms: int = 0
+    pdf_kb: int = 64
+    hoje: date = field(default_factory=date.today)
+
+
+def _template(nome: str) -> Template:
+    return Template((FIXTURES_DIR / f"{nome}.html").read_text(encoding="utf-8"))
+
+
+def _pdf(titulo: str, tamanho_kb: int) -> bytes:
+    conteudo = f"BT /F1 18 Tf 72 720 Td ({titulo}) Tj ET".encode("latin-1", "replace")
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(conteudo) + conteudo + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    saida = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objetos, start=1):
+        offsets.append(len(saida))
+        saida += b"%d 0 obj\n" % n + obj + b"\nendobj\n"
+
+    # preenchimento para simular o tamanho de um PDF real
+    falta = tamanho_kb * 1024 - len(saida)
+    if falta > 0:
+        saida += b"%" + b"0" * max(0, falta - 2) + b"\n"
+
+    xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for off in offsets:
+        saida += b"%010d 00000 n \n" % off
+    saida += (
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objetos) + 1, xref)
+    )
+    return bytes(saida)
+
+
+def _br(d: date) -> str:
+    return d.strftime("%d/%m/%Y")
+
+
+def _pagina_do_postback(form: dict) -> str:
+    arg = unquote_plus(form.get("__EVENTARGUMENT", ""))
+    return arg.split("$", 1)[1] if arg.startswith("Page$") else "1"
+
+
+def _paginacao(config: "ConfigFake", qs: dict) -> tuple[range, str]:
+    """Índices da página pedida e a linha do pager (vazia sem paginação)."""
+    por_pagina = config.pagina or max(1, config.rows)
+    paginas = max(1, -(-config.rows // por_pagina))
+    atual = min(max(1, int(qs.get("pagina", 1))), paginas)
+
+    inicio = (atual - 1) * por_pagina
+    indices = range(inicio, min(inicio + por_pagina, config.rows))
+
+    if paginas == 1:
+        return indices, ""
+
+    numeros = "".join(
+        f"<td><span>{n}</span></td>" if n == atual else
+        f"<td><a href=\"javascript:__doPostBack('ctl00$MainContent$Grid','Page${n}')\">{n}</a></td>"
+        for n in range(1, paginas + 1)
+    )
+    return indices, f'    <tr class="pager"><td colspan="6"><table><tr>{numeros}</tr></table></td></tr>'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeRIDigital/1.0"
+
+    # ------------------------------------------------
+    # infraestrutura
+    # ------------------------------------------------
+
+    @property
+    def config(self) -> ConfigFake:
+        return self.server.config
+
+    def log_message(self, *args):
+        pass
+
+    def _latencia(self) -> None:
+        if self.config.latency_ms:
+            time.sleep(self.config.latency_ms / 1000)
+
+    def _logado(self) -> bool:
+        return "ASP.NET_SessionId=" in (self.headers.get("Cookie") or "")
+
+    def _enviar(self, status: int, corpo: bytes, tipo: str, extra: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _html(self, texto: str) -> None:
+        self._enviar(200, texto.encode("utf-8"), "text/html; charset=utf-8")
+
+    def _json(self, dados) -> None:
+        self._enviar(200, json.dumps(dados).encode("utf-8"), "application/json")
+
+    def _redirect(self, destino: str, cookie: str | None = None) -> None:
+        extra = {"Location": destino}
+        if cookie:
+            extra["Set-Cookie"] = cookie
+        self._enviar(302, b"", "text/plain", extra)
+
+    # ------------------------------------------------
+    # rotas
+    # ------------------------------------------------
+
+    def do_POST(self):
+        self._latencia()
+        corpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        rota = urlparse(self.path).path
+
+        # postback do GridView: __EVENTARGUMENT=Page$N
+        postbacks = {
+            "/CertidaoDigital/lstPedidos.aspx": self._lst_pedidos,
+            "/VisualizarMatricula/DefaultVM.aspx": self._default_vm,
+        }
+        if rota in postbacks and self._logado():
+            form = {k: v[0] for k, v in parse_qs(corpo.decode("utf-8")).items()}
+            postbacks[rota]({"pagina": _pagina_do_postback(form)})
+            return
+
+        if rota == "/Acesso.aspx":
+            sessao = uuid.uuid4().hex
+            self._redirect(
+                "/ServicosOnline.aspx",
+                f"ASP.NET_SessionId={sessao}; Path=/; HttpOnly",
+            )
+            return
+
+        self._enviar(404, b"not found", "text/plain")
+
+    def do_GET(self):
+        self._latencia()
+
+        url = urlparse(self.path)
+        qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+        rota = url.path
+
+        if rota == "/Acesso.aspx":
+            self._html(_template("Acesso.aspx").substitute())
+            return
+
+        if not self._logado():
+            self._redirect("/Acesso.aspx")
+            return
+
+        rotas = {
+            "/ServicosOnline.aspx": self._servicos,
+            "/VisualizarMatricula/DefaultVM.aspx": self._default_vm,
+            "/VisualizarMatricula/PedidoFinalizadoVM.aspx": self._pedido_vm,
+            "/CertidaoDigital/lstPedidos.aspx": self._lst_pedidos,
+            "/CertidaoDigital/lstConsultaPedidos.aspx": self._lst_consulta,
+            "/CertidaoDigital/Detalhes.ashx": self._detalhes,
+            "/CertidaoDigital/Default.aspx": self._wizard,
+            "/CertidaoDigital/Postback.ashx": self._postback,
+        }
+
+        if rota in rotas:
+            rotas[rota](qs)
+            return
+
+        if rota.startswith("/Download/"):
+            nome = rota.rsplit("/", 1)[-1]
+            self._enviar(
+                200,
+                _pdf(nome, self.config.pdf_kb),
+                "application/pdf",
+                {"Content-Disposition": f'attachment; filename="{nome}"'},
+            )
+            return
+
+        self._enviar(404, b"not found", "text/plain")
+
+    # ------------------------------------------------
+    # páginas
+    # ------------------------------------------------
+
+    def _servicos(self, qs):
+        self._html(_template("ServicosOnline.aspx").substitute())
+
+    def _linha_vm(self, i: int) -> dict:
+        return {
+            "id": i,
+            "protocolo": f"VMP{i:06d}",
+            "data": _br(self.config.hoje - timedelta(days=i)),
+            "matricula": str(10000 + i),
+            "cartorio": "01º Ofício de Registro de Imóveis de Porto Velho",
+        }
+
+    def _default_vm(self, qs):
+        indices, pager = _paginacao(self.config, qs)
+
+        linhas = []
+        for i in indices:
+            r = self._linha_vm(i)
+            linhas.append(
+                "    <tr>"
+                f'<td><a href="/VisualizarMatricula/PedidoFinalizadoVM.aspx?id={i}">Visualizar</a></td>'
+                f"<td>{r['protocolo']}</td><td>{r['data']}</td><td>{r['matricula']}</td>"
+                f"<td>{r['cartorio']}</td><td>Finalizado</td>"
+                "</tr>"
+            )
+        if pager:
+            linhas.append(pager)
+
+        self._html(_template("DefaultVM.aspx").substitute(linhas="\n".join(linhas)))
+
+    def _pedido_vm(self, qs):
+        r = self._linha_vm(int(qs.get("id", 0)))
+        self._html(
+            _template("PedidoFinalizadoVM.aspx").substitute(
+                numero_vm=f"VM{100000 + r['id']:07d}",
+                **r,
+            )
+        )
+
+    def _lst_pedidos(self, qs):
+        indices, pager = _paginacao(self.config, qs)
+
+        linhas = []
+        for i in indices:
+            linhas.append(
+                "    <tr>"
+                f'<td><a href="/CertidaoDigital/lstConsultaPedidos.aspx?p={i}">Abrir</a></td>'
+                f"<td>{i:08d}</td><td>{_br(self.config.hoje - timedelta(days=i))}</td>"
+                "<td>Finalizado</td>"
+                "</tr>"
+            )
+
+        if pager:
+            linhas.append(pager)
+
+        self._html(_template("lstPedidos.aspx").substitute(linhas="\n".join(linhas)))
+
+    def _lst_consulta(self, qs):
+        p = int(qs.get("p", 0))
+        linhas = []
+        for j in range(self.config.itens_por_pedido):
+            linhas.append(
+                "    <tr>"
+                f'<td><a href="#" onclick="abrirDetalhes({p}, {j}); return false;">Detalhes</a></td>'
+                f"<td>{p:08d}-{j}</td><td>01º RI de Porto Velho/RO</td><td>Matrícula</td>"
+                "<td>Respondido</td><td>5 dias</td>"
+                f'<td><a href="/Download/certidao_{p}_{j}.pdf">PDF</a></td>'
+                "</tr>"
+            )
+        self._html(
+            _template("lstConsultaPedidos.aspx").substitute(
+                numero_pedido=f"P{p:06d}A",
+                linhas="\n".join(linhas),
+            )
+        )
+
+    def _detalhes(self, qs):
+        p, i = int(qs.get("p", 0)), int(qs.get("i", 0))
+        texto = "\n".join(
+            [
+                "Nº Protocolo", f"{p:08d}-{i}",
+                "Tipo de Certidão", "Certidão de Inteiro Teor",
+                "Pedido Por", "Matrícula",
+                "Cartório / Cidade", "01º Ofício de Registro de Imóveis / Porto Velho - RO",
+                "Status", "Respondido",
+                "Resposta", "Certidão emitida.",
+                "Dados da Solicitação", f"Matrícula: {20000 + p * 10 + i}",
+                "Tipo de Finalidade", "Regularização fundiária",
+            ]
+        )
+        self._enviar(200, texto.encode("utf-8"), "text/plain; charset=utf-8")
+
+    def _wizard(self, qs):
+        estados = "\n".join(
+            f'  <a name="{nome}" href="#" onclick="escolherEstado(\'{uf}\'); return false;">{uf}</a>'
+            for uf, nome in ESTADOS.items()
+        )
+        self._html(_template("Default.aspx").substitute(estados=estados))
+
+    def _postback(self, qs):
+        etapa = qs.get("etapa")
+
+        if etapa == "contrato":
+            uf = qs.get("uf") or "RO"
+            self._json(
+                {
+                    "cidades": [
+                        {"value": cod, "label": nome}
+                        for cod, nome, _ in CIDADES.get(uf, [])
+                    ]
+                }
+            )
+            return
+
+        if etapa == "cidade":
+            for cod, nome, cartorios in (c for lista in CIDADES.values() for c in lista):
+                if cod == qs.get("cidade"):
+                    self._json(
+                        {
+                            "cartorios": [
+                                {"value": str(2663 + n), "label": f"{label} de {nome.title()}"}
+                                for n, label in enumerate(cartorios)
+                            ]
+                        }
+                    )
+                    return
+            self._json({"cartorios": []})
+            return
+
+        matriculas = [m for m in (qs.get("matriculas") or "").split(",") if m]
+
+        if etapa == "matricula":
+            self._json(
+                {
+                    "itens": [
+                        {"numero": f"{n + 1}", "prazo": "5 dias úteis", "valor": "R$ 45,00"}
+                        for n, _ in enumerate(matriculas)
+                    ]
+                }
+            )
+            return
+
+        if etapa == "concluir":
+            protocolo = f"{int(time.time()) % 10**8:08d}"
+            self._json(
+                {
+                    "protocolo": protocolo,
+                    "arquivos": [f"certidao_novo_{protocolo}_{m}.pdf" for m in matriculas],
+                }
+            )
+            return
+
+        self._json({"ok": True})
+
+
+def iniciar(config: ConfigFake | None = None, host: str = "127.0.0.1", porta: int = 0):
+    """
+    Sobe o servidor numa thread daemon. Retorna (servidor, base_url).
+    """
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    servidor.daemon_threads = True
+    servidor.config = config or ConfigFake()
+
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    return servidor, f"http://{host}:{servidor.server_port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--itens", type=int, default=2)
+    parser.add_argument("--page-size", type=int, default=0, help="linhas por página em DefaultVM e lstPedidos")
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--pdf-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    servidor, base_url = iniciar(
+        ConfigFake(
+            rows=args.rows,
+            itens_por_pedido=args.itens,
+            pagina=args.page_size,
+            latency_ms=args.latency_ms,
+            pdf_kb=args.pdf_kb,
+        ),
+        host=args.host,
+        porta=args.port,
+    )
+    print(f"RI Digital fake em {base_url} (Ctrl+C para sair)")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
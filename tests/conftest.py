@@ -0,0 +1,18 @@
+"""
+Os testes importam os módulos de app/ como o container faz
+(PYTHONPATH=/app/app); settings.py lê as variáveis no import, então o
+ambiente é preparado aqui, antes de qualquer teste.
+"""
+import os
+import sys
+import tempfile
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app"))
+
+_base = tempfile.mkdtemp(prefix="geoincra_tests_")
+os.environ.setdefault("DATA_DIR", os.path.join(_base, "data"))
+os.environ.setdefault("BACKEND_UPLOADS_BASE", os.path.join(_base, "uploads"))
+os.environ.setdefault("DEBUG_DIR", os.path.join(_base, "debug"))
+
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
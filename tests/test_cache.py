@@ -0,0 +1,135 @@
+"""CacheTTL: TTL, LRU, decorator e invalidação por NOTIFY."""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import cache
+from cache import CacheTTL, cache_ttl
+
+
+class _Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    r = _Relogio()
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=r, sleep=time.sleep))
+    return r
+
+
+@pytest.fixture(autouse=True)
+def registro_isolado(monkeypatch):
+    monkeypatch.setattr(cache, "_CACHES", {})
+
+
+def test_expira_depois_do_ttl(relogio):
+    c = CacheTTL("t", ttl=10, max_itens=5)
+    c.guardar("a", 1)
+
+    relogio.agora += 9.9
+    assert c.obter("a") == (True, 1)
+
+    relogio.agora += 0.1
+    assert c.obter("a") == (False, None)
+    assert "a" not in c._itens
+
+
+def test_lru_descarta_o_menos_usado(relogio):
+    c = CacheTTL("t", ttl=60, max_itens=2)
+    c.guardar("a", 1)
+    c.guardar("b", 2)
+    c.obter("a")  # "b" passa a ser o mais antigo
+
+    c.guardar("c", 3)
+
+    assert c.obter("b") == (False, None)
+    assert c.obter("a") == (True, 1)
+    assert c.obter("c") == (True, 3)
+
+
+@pytest.mark.parametrize("ttl, max_itens", [(0, 10), (10, 0)])
+def test_desligado_nao_guarda(ttl, max_itens):
+    c = CacheTTL("t", ttl=ttl, max_itens=max_itens)
+    c.guardar("a", 1)
+
+    assert c.obter("a") == (False, None)
+
+
+def test_decorator_le_uma_vez_e_devolve_copia(relogio):
+    chamadas = []
+
+    @cache_ttl("tabela_teste")
+    def ler(user_id):
+        chamadas.append(user_id)
+        return {"login": "x"}
+
+    primeiro = ler(7)
+    primeiro["login"] = "alterado"
+
+    assert ler("7") == {"login": "x"}  # chave normalizada com str()
+    assert chamadas == [7]
+
+
+def test_decorator_nao_guarda_none():
+    chamadas = []
+
+    @cache_ttl("tabela_teste")
+    def ler(chave):
+        chamadas.append(chave)
+        return None
+
+    ler(1)
+    ler(1)
+
+    assert chamadas == [1, 1]
+
+
+def test_notify_invalida_a_chave_ou_a_tabela(relogio):
+    @cache_ttl("tabela_teste")
+    def ler(chave):
+        return {"chave": chave}
+
+    ler(1)
+    ler(2)
+    c = ler.cache
+
+    cache._aplicar_notificacao("tabela_teste:1")
+    assert c.obter("1") == (False, None)
+    assert c.obter("2")[0]
+
+    cache._aplicar_notificacao("tabela_teste:")
+    assert c.obter("2") == (False, None)
+
+
+def test_notify_de_outra_tabela_e_ignorado(relogio):
+    @cache_ttl("tabela_teste")
+    def ler(chave):
+        return {"chave": chave}
+
+    ler(1)
+    cache._aplicar_notificacao("outra_tabela:1")
+
+    assert ler.cache.obter("1")[0]
+
+
+def test_queda_do_listen_descarta_todos(relogio):
+    @cache_ttl("tabela_a")
+    def ler_a(chave):
+        return 1
+
+    @cache_ttl("tabela_b")
+    def ler_b(chave):
+        return 2
+
+    ler_a(1)
+    ler_b(1)
+    cache._limpar_todos()
+
+    assert ler_a.cache.obter("1") == (False, None)
+    assert ler_b.cache.obter("1") == (False, None)
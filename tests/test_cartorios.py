@@ -0,0 +1,111 @@
+"""Matcher de cidades/cartórios do wizard de certidão e o catálogo."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from cartorios import Catalogo, Opcoes, nome_estado, normalizar
+
+_CIDADES = [
+    {"value": "-1", "label": "(Selecione)"},
+    {"value": "1100205", "label": "PORTO VELHO"},
+    {"value": "1100122", "label": "JI-PARANÁ"},
+    {"value": "1100023", "label": "ARIQUEMES"},
+]
+
+_CARTORIOS = [
+    {"value": "-1", "label": "(Selecione)"},
+    {"value": "2663", "label": "01º Ofício de Registro de Imóveis"},
+    {"value": "2664", "label": "02º Ofício de Registro de Imóveis"},
+    {"value": "12", "label": "Registro de Títulos e Documentos"},
+]
+
+
+def test_normalizar():
+    assert normalizar("01º Ofício - Ji-Paraná") == "01 oficio ji parana"
+    assert normalizar(None) == ""
+
+
+def test_nome_estado():
+    assert nome_estado(" ro ") == "Rondônia"
+    with pytest.raises(Exception, match="inválida"):
+        nome_estado("XX")
+
+
+def test_selecione_fica_de_fora():
+    assert len(Opcoes(_CIDADES)) == 3
+    assert Opcoes(_CIDADES).por_value("-1") is None
+
+
+def test_cidade_exata_antes_de_contida():
+    opcoes = Opcoes([{"value": "1", "label": "SÃO JOSÉ DO RIO PRETO"}, {"value": "2", "label": "São José"}])
+
+    assert opcoes.cidade("sao jose")["value"] == "2"
+    assert opcoes.cidade("rio preto")["value"] == "1"
+
+
+def test_cidade_sem_acento_e_hifen():
+    assert Opcoes(_CIDADES).cidade("Ji Parana")["value"] == "1100122"
+    assert Opcoes(_CIDADES).cidade("Vilhena") is None
+    assert Opcoes(_CIDADES).cidade("  ") is None
+
+
+def test_cartorio_por_value_antes_do_numero():
+    # "12" é o value do RTD, não o 12º ofício
+    assert Opcoes(_CARTORIOS).cartorio("12")["value"] == "12"
+    assert Opcoes(_CARTORIOS).cartorio("2663")["value"] == "2663"
+
+
+def test_cartorio_pelo_numero_do_oficio():
+    assert Opcoes(_CARTORIOS).cartorio("2")["value"] == "2664"
+    assert Opcoes(_CARTORIOS).cartorio(1)["value"] == "2663"
+
+
+def test_cartorio_por_texto():
+    assert Opcoes(_CARTORIOS).cartorio("títulos")["value"] == "12"
+    assert Opcoes(_CARTORIOS).cartorio("tabelionato") is None
+    assert Opcoes(_CARTORIOS).cartorio("") is None
+
+
+def test_opcao_unica_vale_para_qualquer_entrada():
+    unica = Opcoes([{"value": "-1", "label": "(Selecione)"}, {"value": "9", "label": "Ofício Único"}])
+
+    assert unica.cartorio("qualquer")["value"] == "9"
+
+
+def _catalogo(horas_atras: float) -> Catalogo:
+    quando = datetime.now(timezone.utc) - timedelta(hours=horas_atras)
+    cidades = [{**o, "updated_at": quando} for o in _CIDADES[1:]]
+    cartorios = {"1100205": [{**o, "updated_at": quando} for o in _CARTORIOS[1:]]}
+    return Catalogo("RO", cidades, cartorios)
+
+
+def test_catalogo_em_dia_resolve_values():
+    resolvido = _catalogo(1).resolver("Porto Velho", "2")
+
+    assert resolvido == {
+        "cidade_value": "1100205",
+        "cartorio_value": "2664",
+        "cartorio_label": "02º Ofício de Registro de Imóveis",
+    }
+
+
+def test_catalogo_em_dia_rejeita_inexistente():
+    with pytest.raises(Exception, match="Cidade"):
+        _catalogo(1).resolver("Vilhena", "1")
+    with pytest.raises(Exception, match="Cartório"):
+        _catalogo(1).resolver("Porto Velho", "tabelionato")
+
+
+def test_catalogo_sem_cartorios_da_cidade_resolve_so_a_cidade():
+    resolvido = _catalogo(1).resolver("Ariquemes", "1")
+
+    assert resolvido["cidade_value"] == "1100023"
+    assert resolvido["cartorio_value"] is None
+
+
+def test_catalogo_vencido_nao_resolve_nem_rejeita(monkeypatch):
+    monkeypatch.setattr("cartorios.RI_DIGITAL_CATALOGO_TTL_HORAS", 24)
+
+    resolvido = _catalogo(48).resolver("Vilhena", "1")
+
+    assert resolvido == {"cidade_value": None, "cartorio_value": None, "cartorio_label": None}
@@ -0,0 +1,72 @@
+"""Leitura do modal de detalhes (#popContent) de lstConsultaPedidos."""
+from certidao_modal import parse_modal_detalhes
+
+_MODAL = """
+Detalhes do Pedido
+Nº Protocolo
+  P-2026-000123
+Tipo de Certidão
+  Inteiro Teor
+Pedido Por
+  Matrícula
+Cartório / Cidade
+  1º Ofício de Registro de Imóveis / PORTO VELHO
+Status
+  Respondido
+Resposta
+  Certidão disponível. Status do envio: ok
+Dados da Solicitação
+  Matrícula: 12.345
+  Livro: 2
+Tipo de Finalidade
+  Outros
+Fechar
+"""
+
+
+def test_campos_do_modal():
+    d = parse_modal_detalhes(_MODAL)
+
+    assert d["protocolo_modal"] == "P-2026-000123"
+    assert d["tipo_certidao"] == "Inteiro Teor"
+    assert d["pedido_por"] == "Matrícula"
+    assert d["cartorio_cidade_modal"] == "1º Ofício de Registro de Imóveis / PORTO VELHO"
+    assert d["status_modal"] == "Respondido"
+    assert d["finalidade"] == "Outros Fechar"
+
+
+def test_rotulo_anterior_dentro_do_valor_faz_parte_dele():
+    # "Status" dentro da resposta não abre um campo novo
+    d = parse_modal_detalhes(_MODAL)
+
+    assert d["resposta_modal"] == "Certidão disponível. Status do envio: ok"
+
+
+def test_matricula_vem_dos_dados_da_solicitacao():
+    d = parse_modal_detalhes(_MODAL)
+
+    assert d["matricula"] == "12.345"
+    assert d["dados_solicitacao"] == "Matrícula: 12.345 Livro: 2"
+
+
+def test_rotulos_sem_diferenciar_maiusculas():
+    d = parse_modal_detalhes("nº protocolo 99 STATUS Pendente dados da solicitação Matricula - 7")
+
+    assert d["protocolo_modal"] == "99"
+    assert d["status_modal"] == "Pendente"
+    assert d["matricula"] == "7"
+
+
+def test_campo_ausente_fica_none():
+    d = parse_modal_detalhes("Nº Protocolo 1 Status Aberto")
+
+    assert d["tipo_certidao"] is None
+    assert d["resposta_modal"] is None
+    assert d["matricula"] is None
+
+
+def test_texto_vazio():
+    d = parse_modal_detalhes("")
+
+    assert set(d) >= {"matricula", "protocolo_modal", "finalidade"}
+    assert all(v is None for v in d.values())
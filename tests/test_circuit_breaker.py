@@ -0,0 +1,43 @@
+"""Classificação de falhas do circuit breaker."""
+import pytest
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from circuit_breaker import ABERTO, FECHADO, CircuitBreaker, eh_falha_de_conectividade
+
+
+def _breaker():
+    return CircuitBreaker("TESTE", "http://127.0.0.1:9", limite_falhas=1, cooldown=60)
+
+
+def test_timeout_esperando_seletor_nao_abre_o_circuito():
+    breaker = _breaker()
+    erro = PlaywrightTimeoutError(
+        "Timeout 30000ms exceeded.\n"
+        "=========================== logs ===========================\n"
+        'waiting for selector "#Contrato_btnGoNext"'
+    )
+
+    breaker.registrar_falha(erro)
+
+    assert breaker.estado == FECHADO
+
+
+def test_timeout_reembrulhado_de_wait_for_function_nao_conta():
+    erro = Exception("Falha ao solicitar certidão: Timeout 10000ms exceeded.")
+    assert not eh_falha_de_conectividade(erro)
+
+
+@pytest.mark.parametrize(
+    "mensagem",
+    [
+        "net::ERR_NAME_NOT_RESOLVED at https://ridigital.org.br/Acesso.aspx",
+        "Navigation timeout of 30000 ms exceeded",
+        'Timeout 60000ms exceeded.\nCall log:\n  - navigating to "https://ridigital.org.br/", waiting until "load"',
+    ],
+)
+def test_falha_de_navegacao_abre_o_circuito(mensagem):
+    breaker = _breaker()
+
+    breaker.registrar_falha(Exception(mensagem))
+
+    assert breaker.estado == ABERTO
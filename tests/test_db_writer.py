@@ -0,0 +1,100 @@
+"""EscritorDB: ordem FIFO, flush na saída e propagação de falhas."""
+import threading
+
+import pytest
+
+from db_writer import EscritorDB
+
+
+def test_grava_em_ordem_e_drena_na_saida():
+    gravados = []
+    liberar = threading.Event()
+
+    def gravar(n):
+        liberar.wait(1)
+        gravados.append(n)
+
+    with EscritorDB(1, tamanho=10) as escritor:
+        for n in range(5):
+            escritor.enfileirar(gravar, n)
+        # nada gravado ainda: enfileirar não espera a thread
+        assert gravados == []
+        liberar.set()
+
+    assert gravados == [0, 1, 2, 3, 4]
+    assert escritor.gravados == 5
+    assert not escritor._thread.is_alive()
+
+
+def test_kwargs_sao_repassados():
+    recebidos = []
+
+    with EscritorDB(1, tamanho=2) as escritor:
+        escritor.enfileirar(lambda a, b=None: recebidos.append((a, b)), 1, b=2)
+
+    assert recebidos == [(1, 2)]
+
+
+def test_sem_fila_grava_na_hora():
+    gravados = []
+
+    with EscritorDB(1, tamanho=0) as escritor:
+        escritor.enfileirar(gravados.append, "x")
+        assert gravados == ["x"]
+
+    assert escritor._thread is None
+
+
+def test_falha_descarta_o_resto_e_sobe_na_saida():
+    gravados = []
+
+    def falhar():
+        raise RuntimeError("banco fora")
+
+    with pytest.raises(Exception, match="banco fora") as info:
+        with EscritorDB(1, tamanho=10) as escritor:
+            escritor.enfileirar(gravados.append, "resultado")
+            escritor.enfileirar(falhar)
+            # checkpoint depois da falha não pode ser gravado
+            escritor.enfileirar(gravados.append, "checkpoint")
+            escritor._fila.join()
+
+    assert gravados == ["resultado"]
+    assert escritor.descartados == 1
+    assert isinstance(info.value.__cause__, RuntimeError)
+
+
+def test_enfileirar_depois_da_falha_levanta():
+    def falhar():
+        raise RuntimeError("banco fora")
+
+    escritor = EscritorDB(1, tamanho=10)
+    with pytest.raises(Exception):
+        with escritor:
+            escritor.enfileirar(falhar)
+            escritor._fila.join()
+            with pytest.raises(Exception, match="banco fora"):
+                escritor.enfileirar(print, "nunca")
+
+
+def test_erro_da_automacao_tem_prioridade_mas_o_coletado_e_gravado():
+    gravados = []
+
+    with pytest.raises(ValueError, match="automação"):
+        with EscritorDB(1, tamanho=10) as escritor:
+            escritor.enfileirar(gravados.append, "linha 1")
+            raise ValueError("erro da automação")
+
+    assert gravados == ["linha 1"]
+
+
+def test_falha_de_gravacao_nao_mascara_erro_da_automacao():
+    def falhar():
+        raise RuntimeError("banco fora")
+
+    with pytest.raises(ValueError):
+        with EscritorDB(1, tamanho=10) as escritor:
+            escritor.enfileirar(falhar)
+            raise ValueError("erro da automação")
+
+    assert isinstance(escritor.erro, RuntimeError)
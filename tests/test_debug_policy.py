@@ -0,0 +1,43 @@
+"""Snapshots de diagnóstico respeitam o prazo do job."""
+import pytest
+
+from deadline import Deadline
+from debug_policy import Depuracao
+
+
+class _PaginaFalsa:
+    def __init__(self):
+        self.timeouts = []
+
+    def screenshot(self, path, full_page, timeout):
+        self.timeouts.append(timeout)
+        open(path, "wb").close()
+
+    def content(self):
+        return "<html></html>"
+
+
+@pytest.fixture
+def pagina():
+    return _PaginaFalsa()
+
+
+def _debug(tmp_path, segundos):
+    debug = Depuracao("teste", "job", modo="amostra", amostrado=True, deadline=Deadline(segundos))
+    debug.pasta.dir = tmp_path / "job"
+    return debug
+
+
+def test_screenshot_limitado_pelo_restante(tmp_path, pagina):
+    _debug(tmp_path, 5).snapshot(pagina, "passo")
+
+    assert 2_000 <= pagina.timeouts[0] <= 5_000
+
+
+def test_prazo_estourado_pula_passo_normal_mas_grava_erro(tmp_path, pagina):
+    debug = _debug(tmp_path, -1)
+
+    debug.snapshot(pagina, "passo")
+    debug.snapshot(pagina, "erro", falha=True)
+
+    assert pagina.timeouts == [2_000]
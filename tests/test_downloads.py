@@ -0,0 +1,76 @@
+"""BaixadorHTTP contra um servidor HTTP local."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from downloads import BaixadorHTTP, nome_do_protocolo
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        lento = self.path.startswith("/lento")
+        corpo = self.path.encode("utf-8") * 2000
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        # o portal manda o mesmo nome para certidões diferentes
+        self.send_header("Content-Disposition", 'attachment; filename="certidao.pdf"')
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+
+        for i in range(0, len(corpo), 1024):
+            self.wfile.write(corpo[i:i + 1024])
+            self.wfile.flush()
+            if lento:
+                time.sleep(0.1)
+
+
+class _ContextoFalso:
+    def cookies(self):
+        return []
+
+
+@pytest.fixture
+def servidor():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+
+
+def test_mesmo_nome_em_paralelo_gera_arquivos_separados(servidor, tmp_path):
+    with BaixadorHTTP(_ContextoFalso(), tmp_path, max_workers=4) as baixador:
+        futuros = {
+            p: baixador.agendar(f"{servidor}/{p}", timeout_s=10, protocolo=p)
+            for p in ("P-1", "P-2", "P-3", "P-4")
+        }
+        caminhos = {p: f.result() for p, f in futuros.items()}
+
+    for p, caminho in caminhos.items():
+        assert caminho.name == f"{p}_certidao.pdf"
+        assert caminho.read_bytes() == f"/{p}".encode("utf-8") * 2000
+
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_prazo_vale_para_o_download_inteiro(servidor, tmp_path):
+    # cada leitura chega bem antes do timeout por leitura, mas o total passa
+    with BaixadorHTTP(_ContextoFalso(), tmp_path) as baixador:
+        futuro = baixador.agendar(f"{servidor}/lento", timeout_s=0.5, protocolo="P-9")
+
+        inicio = time.monotonic()
+        with pytest.raises(Exception, match="prazo"):
+            futuro.result()
+
+    assert time.monotonic() - inicio < 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_nome_do_protocolo():
+    assert nome_do_protocolo("123/4", "certidao.pdf") == "123_4_certidao.pdf"
+    assert nome_do_protocolo(None, "certidao.pdf") == "certidao.pdf"
@@ -0,0 +1,66 @@
+"""Janela de reaproveitamento do livro de pedidos (solicitar certidão)."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import ri_digital_solicitar_certidao_worker as worker
+
+
+@pytest.fixture
+def gravados(monkeypatch):
+    dados = []
+    monkeypatch.setattr(worker, "RI_DIGITAL_PEDIDO_REUSO_HORAS", 24)
+    monkeypatch.setattr(
+        worker, "_gravar_reaproveitados",
+        lambda job, grupo, d, origem: dados.append((origem, d)),
+    )
+    return dados
+
+
+def _grupo():
+    return {"matriculas": ["1234"], "chaves": {"1234": "k1"}}
+
+
+def _livro(job_id, status, horas_atras):
+    return {
+        "k1": {
+            "job_id": job_id,
+            "status": status,
+            "protocolo": "P-1",
+            "result_json": {"matricula": "1234"},
+            "updated_at": datetime.now(timezone.utc) - timedelta(hours=horas_atras),
+        }
+    }
+
+
+def test_concluido_recente_de_outro_job_e_reaproveitado(gravados):
+    grupo = _grupo()
+    worker._aplicar_livro({"id": "novo"}, grupo, _livro("antigo", "CONCLUIDO", 2), {})
+
+    assert grupo["matriculas"] == []
+    assert gravados == [("CONCLUIDO", {"1234": {"matricula": "1234"}})]
+
+
+def test_novo_job_depois_da_janela_faz_novo_pedido(gravados):
+    grupo = _grupo()
+    worker._aplicar_livro({"id": "novo"}, grupo, _livro("antigo", "CONCLUIDO", 48), {})
+
+    assert grupo["matriculas"] == ["1234"]
+    assert grupo["pendentes"] == {}
+    assert gravados == []
+
+
+def test_retentativa_do_mesmo_job_reaproveita_fora_da_janela(gravados):
+    grupo = _grupo()
+    worker._aplicar_livro({"id": "job-1"}, grupo, _livro("job-1", "CONCLUIDO", 48), {})
+
+    assert grupo["matriculas"] == []
+    assert gravados and gravados[0][0] == "CONCLUIDO"
+
+
+def test_enviando_fora_da_janela_nao_e_reconciliado(gravados):
+    grupo = _grupo()
+    worker._aplicar_livro({"id": "novo"}, grupo, _livro("antigo", "ENVIANDO", 48), {})
+
+    assert grupo["matriculas"] == ["1234"]
+    assert grupo["pendentes"] == {}
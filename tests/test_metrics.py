@@ -0,0 +1,28 @@
+"""Endpoint /metrics: profundidade da fila."""
+import db
+import metrics
+
+
+def _scrape(monkeypatch, pendentes: dict) -> str:
+    monkeypatch.setattr(db, "count_pending_jobs", lambda: pendentes)
+    monkeypatch.setattr(metrics, "_fila_consultada_em", 0.0)
+    return metrics.render()
+
+
+def test_tipo_que_esvaziou_volta_a_zero(monkeypatch):
+    antes = _scrape(monkeypatch, {"OCR_DOCUMENT": 7, "TIPO_LEGADO": 2})
+    assert 'geoincra_worker_queue_depth{type="OCR_DOCUMENT"} 7' in antes
+    assert 'geoincra_worker_queue_depth{type="TIPO_LEGADO"} 2' in antes
+
+    depois = _scrape(monkeypatch, {})
+
+    assert 'geoincra_worker_queue_depth{type="OCR_DOCUMENT"} 0' in depois
+    assert 'geoincra_worker_queue_depth{type="TIPO_LEGADO"} 0' in depois
+    assert 'geoincra_worker_queue_depth{type="OCR_DOCUMENT"} 7' not in depois
+
+
+def test_tipos_conhecidos_aparecem_mesmo_sem_fila(monkeypatch):
+    saida = _scrape(monkeypatch, {})
+
+    for job_type in db.JOB_TYPES:
+        assert f'geoincra_worker_queue_depth{{type="{job_type}"}} 0' in saida
@@ -0,0 +1,151 @@
+"""PoolDePaginas: round-robin entre abas, ordem dos resultados e erros."""
+import time
+
+import pytest
+
+from page_pool import PoolDePaginas
+
+
+class _Pagina:
+    def __init__(self, nome):
+        self.nome = nome
+        self.fechada = False
+        self.configurada = False
+
+    def close(self):
+        self.fechada = True
+
+
+class _Contexto:
+    def __init__(self):
+        self.criadas = []
+
+    def new_page(self):
+        page = _Pagina(f"p{len(self.criadas) + 1}")
+        self.criadas.append(page)
+        return page
+
+
+def _configurar(page):
+    page.configurada = True
+
+
+def test_reaproveita_a_primeira_e_fecha_so_as_criadas():
+    contexto = _Contexto()
+    login = _Pagina("login")
+
+    with PoolDePaginas(contexto, 3, primeira=login, configurar=_configurar) as pool:
+        assert [p.nome for p in pool.paginas] == ["login", "p1", "p2"]
+
+    assert not login.fechada and not login.configurada
+    assert all(p.fechada and p.configurada for p in contexto.criadas)
+
+
+def test_alterna_as_paginas_a_cada_yield():
+    passos = []
+
+    def processar(page, tarefa):
+        for n in range(3):
+            passos.append((tarefa, n))
+            yield
+        return tarefa
+
+    with PoolDePaginas(_Contexto(), 2) as pool:
+        pool.executar(["a", "b"], processar, lambda *a: None)
+
+    assert passos == [("a", 0), ("b", 0), ("a", 1), ("b", 1), ("a", 2), ("b", 2)]
+
+
+def test_ao_concluir_na_ordem_das_tarefas():
+    concluidos = []
+
+    def processar(page, tarefa):
+        # a primeira tarefa é a mais lenta
+        for _ in range(5 if tarefa == 0 else 1):
+            yield
+        return tarefa * 10
+
+    with PoolDePaginas(_Contexto(), 3) as pool:
+        pool.executar(range(5), processar, lambda t, r, e: concluidos.append((t, r, e)))
+
+    assert concluidos == [(t, t * 10, None) for t in range(5)]
+
+
+def test_erro_da_tarefa_vai_para_ao_concluir():
+    concluidos = []
+
+    def processar(page, tarefa):
+        yield
+        if tarefa == "ruim":
+            raise ValueError("falhou")
+        return "ok"
+
+    with PoolDePaginas(_Contexto(), 2) as pool:
+        pool.executar(["boa", "ruim", "outra"], processar, lambda t, r, e: concluidos.append((t, r, e)))
+
+    assert [(t, r) for t, r, _ in concluidos] == [("boa", "ok"), ("ruim", None), ("outra", "ok")]
+    assert isinstance(concluidos[1][2], ValueError)
+
+
+class _Prazo(Exception):
+    pass
+
+
+def test_propagar_interrompe_e_fecha_os_geradores():
+    fechados = []
+
+    def processar(page, tarefa):
+        try:
+            yield
+            if tarefa == 1:
+                raise _Prazo()
+            yield
+            yield
+        finally:
+            fechados.append(tarefa)
+
+    with PoolDePaginas(_Contexto(), 3) as pool:
+        with pytest.raises(_Prazo):
+            pool.executar(range(3), processar, lambda *a: None, propagar=(_Prazo,))
+
+    assert sorted(fechados) == [0, 1, 2]
+
+
+def test_tarefas_de_gerador_sao_puxadas_sob_demanda():
+    puxadas = []
+
+    def fonte():
+        for n in range(4):
+            puxadas.append(n)
+            yield n
+
+    def processar(page, tarefa):
+        # só uma página: a próxima tarefa não pode ter sido puxada ainda
+        assert puxadas[-1] == tarefa
+        yield
+        return tarefa
+
+    with PoolDePaginas(_Contexto(), 1) as pool:
+        pool.executar(fonte(), processar, lambda *a: None)
+
+    assert puxadas == [0, 1, 2, 3]
+
+
+def test_pausa_nao_bloqueia_as_outras_paginas():
+    passos = []
+
+    def processar(page, tarefa):
+        if tarefa == "lenta":
+            yield 0.2
+        else:
+            for _ in range(3):
+                yield
+        passos.append(tarefa)
+        return tarefa
+
+    inicio = time.monotonic()
+    with PoolDePaginas(_Contexto(), 2) as pool:
+        pool.executar(["lenta", "rapida"], processar, lambda *a: None)
+
+    assert passos == ["rapida", "lenta"]
+    assert time.monotonic() - inicio >= 0.2
@@ -0,0 +1,76 @@
+"""
+persist_document_and_result contra um Postgres de verdade (DATABASE_URL).
+Pulado quando o banco não está acessível ou sem as tabelas do backend.
+"""
+import pytest
+
+import db
+
+_JOB = 2_000_000_001
+
+
+@pytest.fixture
+def banco():
+    try:
+        conn = db.get_connection()
+    except Exception as e:
+        pytest.skip(f"Postgres indisponível: {e}")
+
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('documents'), to_regclass('automation_results')")
+        if None in cur.fetchone():
+            conn.close()
+            pytest.skip("tabelas documents/automation_results ausentes")
+
+    yield conn
+
+    with conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM automation_results WHERE job_id = %s", (_JOB,))
+        cur.execute("DELETE FROM documents WHERE file_path LIKE %s", (f"/teste/{_JOB}/%",))
+    conn.close()
+
+
+def _data(pdf_status: str, file_path):
+    return {
+        "protocolo": "P-1",
+        "matricula": "1234",
+        "file_path": file_path,
+        "metadata_json": {"pdf_status": pdf_status, "document_id": None},
+    }
+
+
+def _linha(conn):
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT file_path, metadata_json FROM automation_results WHERE job_id = %s",
+            (_JOB,),
+        )
+        return cur.fetchall()
+
+
+def test_retomada_com_pdf_cria_documento_apos_linha_sem_pdf(banco):
+    caminho = f"/teste/{_JOB}/1234.pdf"
+    documento = {"project_id": 1, "filename": "1234.pdf", "file_path": caminho}
+
+    # 1ª execução: PDF indisponível, checkpoint não chegou a ser gravado
+    db.persist_document_and_result(_JOB, _data("NAO_DISPONIVEL", None), None, "rk")
+    # retomada: agora com PDF
+    doc_id, _ = db.persist_document_and_result(_JOB, _data("OK", caminho), documento, "rk")
+
+    assert doc_id is not None
+    [(file_path, metadata)] = _linha(banco)
+    assert file_path == caminho
+    assert metadata["document_id"] == doc_id
+
+
+def test_retomada_com_documento_nao_duplica(banco):
+    caminho = f"/teste/{_JOB}/5678.pdf"
+    documento = {"project_id": 1, "filename": "5678.pdf", "file_path": caminho}
+
+    primeiro, _ = db.persist_document_and_result(_JOB, _data("OK", caminho), documento, "rk2")
+    segundo, _ = db.persist_document_and_result(_JOB, _data("OK", caminho), documento, "rk2")
+
+    assert primeiro == segundo
+    with banco, banco.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM documents WHERE file_path = %s", (caminho,))
+        assert cur.fetchone()[0] == 1
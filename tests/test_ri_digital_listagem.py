@@ -0,0 +1,105 @@
+"""Varredura paginada da listagem DefaultVM (executar_ri_digital)."""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import ri_digital
+
+
+class _GridFalso:
+    """Páginas de linhas (data, protocolo) no formato de GridPaginado._estado."""
+
+    def __init__(self, paginas: list[list[tuple[date, str]]]):
+        self.paginas = paginas
+        self.visitadas: list[int] = []
+
+    def __call__(self, page, deadline, **kwargs):
+        return self
+
+    def garantir_pagina(self, n: int) -> dict:
+        self.visitadas.append(n)
+        linhas = self.paginas[n - 1]
+        return {
+            "linhas": list(range(len(linhas))),
+            "celulas": [
+                ["Visualizar", protocolo, d.strftime("%d/%m/%Y"), "100", "1º RI", "Finalizado"]
+                for d, protocolo in linhas
+            ],
+            "proximo": n < len(self.paginas),
+        }
+
+    def ir_para(self, n: int) -> None:
+        pass
+
+
+def _listagem(inicio: date, dias: int, por_pagina: int, passo: int = -1):
+    datas = [(inicio + timedelta(days=passo * i), f"P{i}") for i in range(dias)]
+    return [datas[i:i + por_pagina] for i in range(0, dias, por_pagina)]
+
+
+def _ler(monkeypatch, grid, inicio: date, fim: date, concluidas=None):
+    monkeypatch.setattr(ri_digital, "GridPaginado", grid)
+    return ri_digital._ler_linhas_no_periodo(
+        None,
+        None,
+        datetime.combine(inicio, datetime.min.time()),
+        datetime.combine(fim, datetime.min.time()),
+        concluidas or {},
+    )
+
+
+def test_ordem_decrescente_para_depois_do_periodo(monkeypatch):
+    grid = _GridFalso(_listagem(date(2026, 10, 30), dias=50, por_pagina=10))
+
+    linhas, _ = _ler(monkeypatch, grid, date(2026, 10, 15), date(2026, 10, 25))
+
+    assert [l["data_pedido"].day for l in linhas] == list(range(25, 14, -1))
+    # 30..21 | 20..11: a página 2 já termina antes do início
+    assert grid.visitadas == [1, 2]
+    assert {l["pagina"] for l in linhas} == {1, 2}
+
+
+def test_ordem_crescente_para_depois_do_periodo(monkeypatch):
+    grid = _GridFalso(_listagem(date(2026, 1, 1), dias=60, por_pagina=10, passo=1))
+
+    linhas, _ = _ler(monkeypatch, grid, date(2026, 1, 5), date(2026, 1, 12))
+
+    assert len(linhas) == 8
+    assert grid.visitadas == [1, 2]
+
+
+def test_sem_ordem_le_todas_as_paginas(monkeypatch):
+    paginas = _listagem(date(2026, 10, 30), dias=30, por_pagina=10)
+    paginas[1].reverse()
+    grid = _GridFalso(paginas)
+
+    linhas, _ = _ler(monkeypatch, grid, date(2026, 10, 1), date(2026, 10, 3))
+
+    assert [l["data_pedido"].day for l in linhas] == [3, 2, 1]
+    assert grid.visitadas == [1, 2, 3]
+
+
+def test_datas_iguais_nao_definem_ordem(monkeypatch):
+    dia = date(2026, 10, 10)
+    grid = _GridFalso([[(dia, "A"), (dia, "B")], [(date(2026, 10, 20), "C")]])
+
+    linhas, _ = _ler(monkeypatch, grid, date(2026, 10, 15), date(2026, 10, 25))
+
+    assert [l["protocolo"] for l in linhas] == ["C"]
+    assert grid.visitadas == [1, 2]
+
+
+def test_linhas_ja_concluidas_sao_contadas_e_puladas(monkeypatch):
+    grid = _GridFalso(_listagem(date(2026, 10, 30), dias=5, por_pagina=10))
+
+    linhas, ja = _ler(
+        monkeypatch, grid, date(2026, 10, 1), date(2026, 10, 31), {"P0|100": {}}
+    )
+
+    assert ja == 1
+    assert [l["protocolo"] for l in linhas] == ["P1", "P2", "P3", "P4"]
+
+
+def test_listagem_vazia_falha(monkeypatch):
+    with pytest.raises(Exception, match="vazia"):
+        _ler(monkeypatch, _GridFalso([[]]), date(2026, 1, 1), date(2026, 1, 2))